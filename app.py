@@ -1,29 +1,90 @@
+import time
+
+_SCRIPT_STARTED = time.perf_counter()
+
 import streamlit as st
-import PyPDF2
-import re
+import cProfile
 from datetime import datetime, timedelta
-import pytz
-import uuid
-import pandas as pd
-import base64
-from typing import Dict, Set, Tuple, List
-import calendar
-import io
-import json
-from google.oauth2.credentials import Credentials
-import requests
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from typing import Dict, Tuple, List, Optional
+import secrets
+import threading
 import os
+from urllib.parse import urlencode
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from mcc_timetable import TimetableGenerator, parsed_from_dict
+from mcc_timetable.artifacts import ArtifactStore
+from mcc_timetable.errors import UploadRejected
+from mcc_timetable.executor import DONE, FAILED, PENDING, ParseExecutor, digest_upload_id
+from mcc_timetable.google_calendar import (
+    SCOPES,
+    TIMETABLE_CALENDAR_NAME,
+    TOKEN_URI,
+    build_calendar_service,
+    get_timetable_calendar
+)
+from mcc_timetable.fingerprint import fingerprint
+from mcc_timetable.lazy import import_timings, lazy_import
+from mcc_timetable.registry import CalendarRegistry
+from mcc_timetable.sessions import SessionRegistry, SharedCalendarStore, approx_size
+from mcc_timetable.store import StateStore
+from mcc_timetable.uploads import UploadLimits, discard, ingest
+from mcc_timetable import tracing
+from mcc_timetable.tracing import span, write_prometheus
+
+# Modules already loaded when this rerun started, to attribute new imports to it
+_IMPORTS_AT_START = set(import_timings)
 
 # Load environment variables
 load_dotenv()
 
 # Optimize Streamlit performance
 st.set_page_config(page_title="MCC Timetable Generator", page_icon="📅", layout="wide")
-st.cache_resource = st.cache_data  # Use cache_data instead of cache for better performance
+
+# Heavy dependencies (PyPDF2, pandas, the Google client libraries) are imported on
+# first use through lazy_import() so that the first paint and every rerun only pay
+# for what the user actually touches. Set MCC_IMPORT_REPORT=1 to show the budget.
+IMPORT_REPORT_ENABLED = os.getenv("MCC_IMPORT_REPORT", "").lower() in ("1", "true", "yes")
+IMPORT_BUDGET_SECONDS = float(os.getenv("MCC_IMPORT_BUDGET", "0.25"))
+
+# Public URL of the timetable API serving stored downloads; when unset, Streamlit serves them
+ARTIFACT_BASE_URL = os.getenv("MCC_ARTIFACT_BASE_URL", "").rstrip("/")
+
+# Session memory accounting: idle timeout, shared calendar store size, sidebar report
+SESSION_IDLE_SECONDS = float(os.getenv("MCC_SESSION_IDLE_SECONDS", "900"))
+CALENDAR_STORE_MB = int(os.getenv("MCC_CALENDAR_STORE_MB", "64"))
+MEMORY_REPORT_ENABLED = os.getenv("MCC_MEMORY_REPORT", "").lower() in ("1", "true", "yes")
+
+# Observability: Prometheus text file with stage histograms, and opt-in per-rerun cProfile dumps
+METRICS_FILE = os.getenv("MCC_METRICS_FILE")
+METRICS_FILE_INTERVAL = float(os.getenv("MCC_METRICS_FILE_INTERVAL", "10"))
+PROFILE_DIR = os.getenv("MCC_PROFILE_DIR")
+
+# Threads for background PDF parsing, and limits checked before an upload is parsed
+PARSE_WORKERS = int(os.getenv("MCC_PARSE_WORKERS", "2"))
+UPLOAD_LIMITS = UploadLimits.from_env()
+
+# Rows per page in the calendar overview tables
+OVERVIEW_PAGE_SIZE = int(os.getenv("MCC_OVERVIEW_PAGE_SIZE", "50"))
+
+
+def render_import_report():
+    """Sidebar report of lazy import cost, per process and for the current rerun."""
+    timings = dict(import_timings)
+    rerun_imports = {name: elapsed for name, elapsed in timings.items() if name not in _IMPORTS_AT_START}
+    script_seconds = time.perf_counter() - _SCRIPT_STARTED
+
+    with st.sidebar.expander("⏱️ Import budget", expanded=bool(rerun_imports)):
+        st.caption(f"This rerun: {script_seconds * 1000:.0f} ms total, "
+                   f"{sum(rerun_imports.values()) * 1000:.0f} ms importing")
+        if sum(rerun_imports.values()) > IMPORT_BUDGET_SECONDS:
+            st.warning(f"Imports exceeded the {IMPORT_BUDGET_SECONDS * 1000:.0f} ms budget on this rerun")
+        if not timings:
+            st.caption("No heavy dependencies loaded yet.")
+        for module_name, elapsed in sorted(timings.items(), key=lambda item: -item[1]):
+            marker = " (this rerun)" if module_name in rerun_imports else ""
+            st.text(f"{module_name}: {elapsed * 1000:.0f} ms{marker}")
 
 # Custom CSS for better styling
 st.markdown("""
@@ -114,76 +175,169 @@ st.markdown("""
     </script>
 """, unsafe_allow_html=True)
 
-SCOPES = ["openid", "https://www.googleapis.com/auth/userinfo.email", "https://www.googleapis.com/auth/userinfo.profile"]
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 REDIRECT_URI = "https://tt.madrasco.space"
 
+AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+USERINFO_URI = "https://www.googleapis.com/oauth2/v1/userinfo"
+# How long a consent URL's state stays valid for the callback
+OAUTH_STATE_TTL = 600
+
 # Initialize session state if not set
 if "google_token" not in st.session_state:
     st.session_state["google_token"] = None
     st.session_state["user_info"] = None
 
 
+@st.cache_resource
+def get_google_client_config() -> Dict:
+    """OAuth client configuration, built once per process."""
+    return {
+        "web": {
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "auth_uri": AUTH_URI,
+            "token_uri": TOKEN_URI,
+            "redirect_uris": [REDIRECT_URI],
+        }
+    }
+
+
+@st.cache_resource
+def get_exchanged_codes() -> Tuple[Dict[str, float], threading.Lock]:
+    """Authorization codes already redeemed by this process, so each is exchanged exactly once."""
+    return {}, threading.Lock()
+
+
+@st.cache_resource
+def get_issued_oauth_states() -> Tuple[Dict[str, float], threading.Lock]:
+    """OAuth state values this process put in consent URLs; the callback arrives in a new
+    session, so it is checked against these rather than the session that issued it."""
+    return {}, threading.Lock()
+
+
+def consume_oauth_state(state: Optional[str]) -> bool:
+    """True, once, for a state this process issued in the last OAUTH_STATE_TTL seconds."""
+    if not state:
+        return False
+    issued, lock = get_issued_oauth_states()
+    with lock:
+        now = time.time()
+        for stale_state in [s for s, seen in issued.items() if now - seen > OAUTH_STATE_TTL]:
+            del issued[stale_state]
+        return issued.pop(state, None) is not None
+
+
 def initialize_google_auth():
+    Flow = lazy_import("google_auth_oauthlib.flow").Flow
     return Flow.from_client_config(
-        {
-            "web": {
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "redirect_uris": [REDIRECT_URI],  # Update with a list
-            }
-        },
+        get_google_client_config(),
         scopes=SCOPES,
-        redirect_uri=REDIRECT_URI
+        redirect_uri=REDIRECT_URI,
+        autogenerate_code_verifier=False  # The callback lands in a fresh session without the verifier
     )
 
 
 def get_google_auth_url():
-    flow = initialize_google_auth()
-    auth_url, state = flow.authorization_url(prompt="consent", include_granted_scopes="true")
-    
-    # Save state to session (needed to verify callback)
-    st.session_state["oauth_state"] = state
-    return auth_url
+    """Builds the consent URL once per session without constructing a Flow."""
+    if not st.session_state.get("auth_url"):
+        state = secrets.token_urlsafe(24)
+        params = {
+            "response_type": "code",
+            "client_id": GOOGLE_CLIENT_ID,
+            "redirect_uri": REDIRECT_URI,
+            "scope": " ".join(SCOPES),
+            "state": state,
+            "access_type": "offline",
+            "prompt": "consent",
+            "include_granted_scopes": "true",
+        }
+        # Remembered by the process, which verifies it when the callback comes back
+        st.session_state["oauth_state"] = state
+        issued, lock = get_issued_oauth_states()
+        with lock:
+            issued[state] = time.time()
+        st.session_state["auth_url"] = f"{AUTH_URI}?{urlencode(params)}"
+    return st.session_state["auth_url"]
 
 
 def handle_google_callback():
-    """Extract token from URL params and fetch user info."""
-    query_params = st.query_params  # Get URL params in Streamlit
-    if "code" in query_params:
+    """Exchanges the authorization code in the URL for a token, once.
+
+    Ordinary reruns return immediately: the code is removed from the query
+    parameters as soon as it is read, and the token is stored together with
+    the user info so neither is fetched again.
+    """
+    code = st.query_params.get("code")
+    if not code:
+        return
+    state = st.query_params.get("state")
+    st.query_params.clear()
+    if not consume_oauth_state(state):
+        st.session_state.pop("auth_url", None)
+        st.error("Google sign-in failed: the sign-in link has expired or did not come from this app. "
+                 "Please log in again.")
+        return
+
+    exchanged, lock = get_exchanged_codes()
+    with lock:
+        now = time.time()
+        for stale_code in [c for c, seen in exchanged.items() if now - seen > 600]:
+            del exchanged[stale_code]
+        if code in exchanged:
+            return
+        exchanged[code] = now
+
+    try:
         flow = initialize_google_auth()
-        flow.fetch_token(code=query_params["code"])
-        
-        # Save token
-        st.session_state["google_token"] = json.loads(flow.credentials.to_json())
-        
-        # Fetch user info
-        fetch_user_info()
+        flow.fetch_token(code=code)
+    except Exception as e:
+        st.error(f"Google sign-in failed: {str(e)}")
+        return
+
+    creds = flow.credentials
+    st.session_state["google_token"] = {
+        "access_token": creds.token,
+        "refresh_token": creds.refresh_token,
+        "expiry": creds.expiry.isoformat() if creds.expiry else None
+    }
+    st.session_state["user_info"] = fetch_user_info(creds.token)
+    st.session_state.pop("auth_url", None)
 
 
-def fetch_user_info():
-    if st.session_state["google_token"]:
-        headers = {"Authorization": f"Bearer {st.session_state['google_token']['access_token']}"}
-        response = requests.get("https://www.googleapis.com/oauth2/v1/userinfo", headers=headers)
-        if response.status_code == 200:
-            st.session_state["user_info"] = response.json()
+def fetch_user_info(access_token: str):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    requests = lazy_import("requests")
+    try:
+        response = requests.get(USERINFO_URI, headers=headers, timeout=10)
+    except requests.RequestException:
+        return None
+    if response.status_code == 200:
+        return response.json()
+    return None
 
 
-# Streamlit UI
-st.title("Google OAuth Login")
+def render_google_login():
+    st.title("Google Authentication")
+
+    if not st.session_state.get("google_token"):
+        st.markdown(f"[Login with Google]({get_google_auth_url()})")
+    else:
+        user_info = st.session_state.get("user_info") or {}
+        st.success(f"Logged in as {user_info.get('email', 'your Google account')}")
+        if st.button("Logout"):
+            st.session_state["google_token"] = None
+            st.session_state["user_info"] = None
+            st.session_state.pop("timetable_calendar_id", None)
+            st.rerun()
 
-if "google_token" not in st.session_state or not st.session_state["google_token"]:
-    auth_url = get_google_auth_url()
-    st.markdown(f"[Login with Google]({auth_url})")
-else:
-    st.success("Successfully logged in!")
-    st.json(st.session_state["user_info"])
 
-# Handle OAuth callback
+# Handle OAuth callback before rendering the login state
 handle_google_callback()
+render_google_login()
+
+
 def get_google_calendar_service():
     """Returns a Google Calendar API service object if credentials are valid."""
     if 'google_token' not in st.session_state or not st.session_state["google_token"]:
@@ -191,348 +345,407 @@ def get_google_calendar_service():
         return None
 
     try:
-        creds = Credentials(
-            token=st.session_state["google_token"]["access_token"],
-            refresh_token=st.session_state["google_token"].get("refresh_token"),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=GOOGLE_CLIENT_ID,
-            client_secret=GOOGLE_CLIENT_SECRET,
-            scopes=SCOPES
+        # Refreshes the stored token in place when it has expired
+        return build_calendar_service(st.session_state["google_token"], GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET)
+    except Exception as e:
+        st.error(f"Failed to connect to Google Calendar: {str(e)}")
+        return None
+
+
+def add_to_google_calendar(generator: TimetableGenerator, special_events: Dict[str, str],
+                           dedicated_calendar: bool = False, replace_existing: bool = False) -> int:
+    service = get_google_calendar_service()
+    if not service:
+        raise Exception("Google Calendar service not initialized")
+
+    calendar_id = 'primary'
+    if dedicated_calendar:
+        calendar_id = get_timetable_calendar(
+            service,
+            recreate=replace_existing,
+            calendar_id=st.session_state.get("timetable_calendar_id")
         )
+        st.session_state["timetable_calendar_id"] = calendar_id
 
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            st.session_state["google_token"]["access_token"] = creds.token  # Update session state after refresh
+    return generator.add_to_google_calendar(service, special_events, calendar_id=calendar_id)
 
-        return build('calendar', 'v3', credentials=creds)
 
-    except Exception as e:
-        st.error(f"Failed to connect to Google Calendar: {str(e)}")
-        return None
+@st.cache_resource
+def get_parse_executor() -> ParseExecutor:
+    """One parse pool per process, shared by every session so identical uploads are parsed once."""
+    return ParseExecutor(workers=PARSE_WORKERS)
 
-# Example UI for authentication
-st.title("Google Authentication")
-
-if not st.session_state.get("user_info"):
-    auth_url = get_google_auth_url()
-    st.markdown(f"[Login with Google]({auth_url})")
-else:
-    st.success(f"Logged in as {st.session_state['user_info']['email']}")
-    if st.button("Logout"):
-        st.session_state["google_token"] = None
-        st.session_state["user_info"] = None
-        st.experimental_rerun()
-    
-class MCCCalendarParser:
-    def __init__(self, start_date=None, end_date=None):
-        self.start_date = start_date
-        self.end_date = end_date
-        self.day_orders = {}
-        self.holidays = set()
-        self.special_events = {}
-        self.months = {month.upper(): index for index, month in enumerate(calendar.month_name) if month}
-        self.special_event_patterns = [
-            r"Staff Study Circle",
-            r"ICA Test",
-            r"ESE Practicals",
-            r"Faculty Development",
-            r"Senatus Meeting",
-            r"IQAC Review Meeting",
-            r"College Scripture Examination",
-            r"Deep Woods",
-            r"Annual Staff Retreat",
-            r"Hall Day"
-        ]
-
-    def is_date_in_range(self, date_str: str) -> bool:
-        if not (self.start_date and self.end_date):
-            return True
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-        return self.start_date <= date_obj <= self.end_date
-
-    def extract_month_year(self, text: str) -> Tuple[str, str]:
-        month_pattern = r'(JANUARY|FEBRUARY|MARCH|APRIL|MAY|JUNE|JULY|AUGUST|SEPTEMBER|OCTOBER|NOVEMBER|DECEMBER)'
-        year_pattern = r'(20\d{2})'
-        
-        month_match = re.search(month_pattern, text.upper())
-        year_match = re.search(year_pattern, text)
-        
-        if month_match and year_match:
-            return month_match.group(1), year_match.group(1)
-        return None, None
 
-    def extract_date_info(self, line: str) -> Tuple[str, str, str, str]:
-        pattern = r'^\s*(\d{1,2})\s+(MON|TUE|WED|THU|FRI|SAT|SUN)(?:[^0-9]*([1-6])?)?(.*)$'
-        match = re.match(pattern, line)
-        
-        if match:
-            date, day, day_order, remaining_text = match.groups()
-            special_event = self.extract_special_event(remaining_text)
-            return date.strip(), day.strip(), day_order, special_event
-        return None, None, None, None
-
-    def extract_special_event(self, text: str) -> str:
-        if not text:
-            return None
-            
-        text = text.strip()
-        
-        holiday_patterns = [
-            r'Holiday',
-            r'- No Classes',
-            r'Pongal',
-            r'Christmas',
-            r'Diwali',
-            r'Bakrid'
-        ]
-        
-        for pattern in holiday_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return f"Holiday: {text}"
-                
-        for pattern in self.special_event_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return text.strip()
-                
-        return None
+def submit_upload(pdf_file, start_date, end_date) -> str:
+    """Hands the upload to the background parser once and returns its upload ID.
 
-    def parse_pdf(self, pdf_content) -> Tuple[Dict[str, str], Set[str], Dict[str, str]]:
-        current_month = None
-        current_year = None
-        
+    The file is streamed to a temporary file and hashed in chunks, and refused with
+    UploadRejected before any parsing if it breaks the size or page limits.
+    """
+    upload_key = (pdf_file.file_id, start_date, end_date)
+    rejected = st.session_state.get('upload_rejected')
+    if rejected and rejected[0] == upload_key:
+        raise UploadRejected(rejected[1])
+
+    parse_key = st.session_state.get('parse_key') if st.session_state.get('upload_key') == upload_key else None
+    # Also resubmits when both the executor and the shared store have since dropped the result
+    if parse_key and (get_parse_executor().status(parse_key) is not None
+                      or get_calendar_store().get(parse_key) is not None):
+        return parse_key
+
+    with span("upload_read"):
+        pdf_file.seek(0)
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_content)
-            
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                lines = text.split('\n')
-                
-                for line in lines:
-                    month, year = self.extract_month_year(line)
-                    if month and year:
-                        current_month = month
-                        current_year = year
-                        continue
-                    
-                    if current_month and current_year:
-                        date_num, day, day_order, special_event = self.extract_date_info(line)
-                        
-                        if date_num:
-                            try:
-                                date_obj = datetime(
-                                    int(current_year),
-                                    self.months[current_month.upper()],
-                                    int(date_num)
-                                )
-                                date_str = date_obj.strftime("%Y-%m-%d")
-                                
-                                # Only process dates within the selected range
-                                if self.is_date_in_range(date_str):
-                                    if day_order:
-                                        self.day_orders[date_str] = day_order
-                                    elif day in ['SAT', 'SUN']:
-                                        self.holidays.add(date_str)
-                                    
-                                    if special_event:
-                                        self.special_events[date_str] = special_event
-                                        
-                            except ValueError as e:
-                                st.warning(f"Error processing date: {line} - {str(e)}")
-                                
-        except Exception as e:
-            st.error(f"Error reading PDF: {str(e)}")
+            upload = ingest(pdf_file, UPLOAD_LIMITS, expected_size=pdf_file.size)
+        except UploadRejected as e:
+            st.session_state.upload_rejected = (upload_key, str(e))
             raise
-            
-        return self.day_orders, self.holidays, self.special_events
-
-class TimetableGenerator:
-    def __init__(self, start_date=None, end_date=None):
-        self.timezone = pytz.timezone("Asia/Kolkata")
-        self.class_timings = [
-            ("1st Hour", "13:45", "14:35"),
-            ("2nd Hour", "14:35", "15:25"),
-            ("3rd Hour", "15:25", "16:15"),
-            ("Break", "16:15", "16:35"),
-            ("4th Hour", "16:35", "17:25"),
-            ("5th Hour", "17:25", "18:15")
-        ]
-        self.timetable = {}
-        self.classroom_mapping = {}
-        self.day_orders = {}
-        self.start_date = start_date
-        self.end_date = end_date
-
-    def set_timetable(self, timetable_data: Dict[str, List[str]]):
-        self.timetable = timetable_data
-
-    def set_classroom_mapping(self, mapping: Dict[str, str]):
-        self.classroom_mapping = mapping
-
-    def set_day_orders(self, day_orders: Dict[str, str]):
-        if self.start_date and self.end_date:
-            self.day_orders = {
-                date: order for date, order in day_orders.items()
-                if self.start_date <= datetime.strptime(date, "%Y-%m-%d").date() <= self.end_date
-            }
-        else:
-            self.day_orders = day_orders
+    st.session_state.upload_key = upload_key
+    entry = get_calendar_registry().get(upload.digest)
+    if entry is not None:
+        # A registered official calendar: answered from the registry, the PDF is never opened
+        discard(upload)
+        st.session_state.parse_key = use_registered_calendar(entry.sha256, start_date, end_date)
+        return st.session_state.parse_key
+
+    parse_key = digest_upload_id(upload.digest, start_date, end_date)
+    st.session_state.parse_key = parse_key
+    if get_parse_executor().status(parse_key) is None and get_calendar_store().get(parse_key) is None:
+        get_parse_executor().submit_upload(upload, start_date, end_date)
+    else:
+        discard(upload)
+    return parse_key
+
+
+@st.cache_resource
+def get_calendar_registry() -> CalendarRegistry:
+    """Pre-parsed official calendars bundled with the package (plus MCC_CALENDAR_REGISTRY)."""
+    return CalendarRegistry.from_env()
+
+
+def use_registered_calendar(sha256: str, start_date, end_date) -> str:
+    """Puts a registered calendar, limited to the date range, in the shared store and returns its key."""
+    parse_key = digest_upload_id(sha256, start_date, end_date)
+    if get_calendar_store().get(parse_key) is None:
+        get_calendar_store().put(parse_key, get_calendar_registry().get(sha256).calendar(start_date, end_date))
+    return parse_key
+
+
+def select_registered_calendar(start_date) -> Optional[str]:
+    """The registered calendar the user picked, or None to upload a PDF instead."""
+    entries = get_calendar_registry().current(today=start_date)
+    if not entries:
+        return None
+    names = {entry.sha256: f"{entry.name} ({entry.first_date} to {entry.last_date})" for entry in entries}
+    # Default to the official calendar that covers the start date, if there is one
+    running = entries[0].last_date >= start_date.isoformat()
+    return st.selectbox("Calendar", [None] + list(names), index=1 if running else 0,
+                        format_func=lambda sha256: names.get(sha256, "Upload a calendar PDF"))
+
+
+@st.fragment(run_every=1.0)
+def render_parse_status(parse_key: str):
+    """Polls the background parse without rerunning the rest of the page."""
+    if get_parse_executor().status(parse_key) == PENDING:
+        st.info("⏳ Parsing calendar PDF in the background, you can fill in your timetable meanwhile...")
+    else:
+        st.rerun()
+
+
+def apply_parse_result(parse_key: str):
+    """Moves a finished parse into the shared calendar store; the session keeps only its key."""
+    if get_calendar_store().get(parse_key) is None:
+        result = get_parse_executor().result(parse_key)
+        day_orders, holidays, special_events = parsed_from_dict(result)
+        get_calendar_store().put(parse_key, {
+            'day_orders': day_orders,
+            'holidays': holidays,
+            'special_events': special_events
+        })
+        for warning in result.get("warnings", []):
+            st.warning(warning)
+    st.session_state.parsed_key = parse_key
+
+
+def get_parsed_data():
+    """The session's parsed calendar (read-only, shared with other sessions), or None."""
+    parse_key = st.session_state.get('parsed_key')
+    return get_calendar_store().get(parse_key) if parse_key else None
+
+
+@st.cache_resource
+def get_state_store():
+    """SQLite store shared with other app and API processes (MCC_STATE_DB), or None."""
+    return StateStore.from_env()
+
+
+@st.cache_resource
+def get_calendar_store() -> SharedCalendarStore:
+    return SharedCalendarStore(max_bytes=CALENDAR_STORE_MB * 1024 * 1024, backend=get_state_store())
+
+
+@st.cache_resource
+def get_session_registry() -> SessionRegistry:
+    return SessionRegistry(idle_seconds=SESSION_IDLE_SECONDS)
+
+
+def track_session_memory():
+    """Records this session's approximate footprint and releases calendars only idle sessions use."""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    state_bytes = approx_size(st.session_state.to_dict())
+    registry = get_session_registry()
+    registry.touch(ctx.session_id, state_bytes, st.session_state.get('parsed_key'))
+    registry.evict_idle(get_calendar_store())
+
+    if MEMORY_REPORT_ENABLED:
+        report = registry.report()
+        store_stats = get_calendar_store().stats()
+        with st.sidebar.expander("🧠 Session memory"):
+            st.text(f"This session: {state_bytes / 1024:.1f} KiB")
+            st.text(f"All sessions ({report['sessions']}): {report['total_bytes'] / 1024:.1f} KiB, "
+                    f"largest {report['max_bytes'] / 1024:.1f} KiB")
+            st.text(f"Shared calendars: {store_stats['calendars']} stored, "
+                    f"{store_stats['blob_bytes'] / 1024:.1f} KiB compressed")
+            st.text(f"Expanded in memory: {store_stats['hot_calendars']}, "
+                    f"{store_stats['hot_bytes'] / 1024:.1f} KiB")
+
+
+@st.cache_resource
+def get_artifact_store() -> ArtifactStore:
+    return ArtifactStore.from_env(state=get_state_store())
+
+
+@st.cache_resource
+def warm_startup_resources() -> None:
+    """Builds the process-wide resources once, on the first run of the script, so the calendar
+    registry is loaded and the parse pool started before any session interacts with the page."""
+    get_state_store()
+    get_calendar_store()
+    get_artifact_store()
+    get_parse_executor()
+    get_calendar_registry()
+
+
+def get_profile_owner():
+    """Saved profiles are keyed by the Google account, and need the shared state store."""
+    user_info = st.session_state.get("user_info") or {}
+    if get_state_store() is None or not user_info.get("email"):
+        return None
+    return user_info["email"]
+
+
+def restore_profile():
+    """Prefills the editors from the logged-in user's saved timetable, once per session."""
+    owner = get_profile_owner()
+    if owner is None or st.session_state.get("profile_restored") == owner:
+        return
+    st.session_state.profile_restored = owner
+    profile = get_state_store().load_profile(owner)
+    if not profile:
+        return
+    for day_order, subjects in profile.get("timetable", {}).items():
+        st.session_state.setdefault(f"day_{day_order}", "\n".join(subjects))
+    st.session_state.subject_classrooms.update(profile.get("rooms", {}))
+    st.session_state.pop("timetable_data", None)
+
+
+def save_profile():
+    owner = get_profile_owner()
+    if owner is not None:
+        get_state_store().save_profile(owner, {
+            "timetable": st.session_state.get("timetable_data", {}),
+            "rooms": st.session_state.subject_classrooms
+        })
+
+
+def render_ics_download(ics_inputs: str):
+    """Offers the stored ICS file for the current inputs, by reference rather than inline."""
+    stored_inputs, artifact_id = st.session_state.get('ics_artifact', (None, None))
+    if stored_inputs != ics_inputs:
+        return
+    artifact = get_artifact_store().get(artifact_id)
+    if artifact is None:
+        st.caption("The generated calendar has expired, please generate it again.")
+        return
+
+    if ARTIFACT_BASE_URL:
+        # Served by the timetable API (python -m mcc_timetable serve) from the same store
+        st.markdown(f"[⬇️ Download Timetable Calendar]({ARTIFACT_BASE_URL}/artifacts/{artifact_id})")
+    else:
+        with open(artifact.path, "rb") as f:
+            st.download_button(
+                "⬇️ Download Timetable Calendar",
+                data=f,
+                file_name=artifact.filename,
+                mime=artifact.content_type
+            )
+
+
+@st.cache_resource(max_entries=32)
+def get_overview_frame(table: str, parse_key: str):
+    """Day Orders or Special Events table of a parsed calendar, built once per parse key.
+
+    Cached as a resource so reruns reuse the same read-only frame instead of a copy.
+    """
+    pd = lazy_import("pandas")
+    parsed = get_calendar_store().get(parse_key) or {'day_orders': {}, 'special_events': {}}
+    if table == "day_orders":
+        return pd.DataFrame(list(parsed['day_orders'].items()), columns=['Date', 'Day Order'])
+    return pd.DataFrame(list(parsed['special_events'].items()), columns=['Date', 'Event'])
+
+
+@st.cache_resource(max_entries=32)
+def get_projected_day_orders(parse_key: str, start_date, end_date) -> Tuple[Dict[str, str], set, Optional[float]]:
+    """Day orders with the rotation continued over the selected dates after the calendar ends,
+    the dates inferred, and how consistently the parsed days follow the rotation (None if unknown)."""
+    rotation = lazy_import("mcc_timetable.rotation")
+    parsed = get_calendar_store().get(parse_key) or {'day_orders': {}, 'holidays': set()}
+    inferred = rotation.infer_rotation(parsed['day_orders'])
+    day_orders, provisional = rotation.project(parsed['day_orders'], start_date, end_date, parsed['holidays'],
+                                               rotation=inferred)
+    return day_orders, provisional, inferred.consistency if inferred else None
+
+
+@st.cache_resource(max_entries=64)
+def get_classroom_frame(rooms_fingerprint: str, _rooms: Tuple[Tuple[str, str], ...]):
+    pd = lazy_import("pandas")
+    return pd.DataFrame(list(_rooms), columns=['Subject', 'Room'])
+
+
+@st.cache_resource(max_entries=32)
+def get_subject_hours_frames(parse_key: str, timetable_fingerprint: str, _timetable: Dict[str, List[str]]):
+    """Subject-hours summary, monthly and special event tables, built once per calendar and timetable."""
+    analytics = lazy_import("mcc_timetable.analytics")
+    parsed = get_calendar_store().get(parse_key) or {'day_orders': {}, 'special_events': {}}
+    ledger = analytics.build_ledger(parsed['day_orders'], parsed['special_events'], {"": _timetable})
+    return (
+        analytics.subject_hours(ledger).drop(columns="section"),
+        analytics.monthly_hours(ledger).drop(columns="section"),
+        analytics.event_hours(ledger).drop(columns="section")
+    )
+
+
+def render_subject_hours(parse_key: str, timetable_data: Dict[str, List[str]]):
+    if not any(any(subjects) for subjects in timetable_data.values()):
+        st.info("Enter your timetable to see contact hours per subject.")
+        return
+    summary, monthly, events = get_subject_hours_frames(parse_key, fingerprint(timetable_data), timetable_data)
+    st.caption("Net hours leave out classes on special event days (ICA Test, Hall Day, ...); "
+               "holidays have no day order and are never counted.")
+    render_paged_table(summary, "subject_hours")
+    st.markdown("**Net hours per month**")
+    render_paged_table(monthly, "monthly_hours")
+    if len(events):
+        st.markdown("**Hours on special event days**")
+        render_paged_table(events, "event_hours")
+
+
+def render_paged_table(df, key: str):
+    """Shows one page of df, so only the visible rows are serialized to the browser."""
+    pages = max(1, -(-len(df) // OVERVIEW_PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * OVERVIEW_PAGE_SIZE
+    st.dataframe(df.iloc[start:start + OVERVIEW_PAGE_SIZE], use_container_width=True, hide_index=True)
+    if pages > 1:
+        st.caption(f"Rows {start + 1}–{min(start + OVERVIEW_PAGE_SIZE, len(df))} of {len(df)}")
+
+
+@st.fragment
+def render_calendar_overview(parse_key: str, subject_classrooms: Dict[str, str],
+                             timetable_data: Dict[str, List[str]]):
+    """Calendar tables; paging through them reruns only this fragment."""
+    st.subheader("📅 Calendar Overview")
+
+    # Show calendar data in tabs
+    tab1, tab2, tab3, tab4 = st.tabs(["Day Orders", "Special Events", "Classroom Summary", "Subject Hours"])
+
+    with tab1:
+        render_paged_table(get_overview_frame("day_orders", parse_key), "day_orders")
+
+    with tab2:
+        render_paged_table(get_overview_frame("special_events", parse_key), "special_events")
+
+    with tab3:
+        rooms = tuple(subject_classrooms.items())
+        render_paged_table(get_classroom_frame(fingerprint(rooms), rooms), "classrooms")
+
+    with tab4:
+        render_subject_hours(parse_key, timetable_data)
+
+
+def read_timetable_input() -> Dict[str, List[str]]:
+    """Collects the applied Day Order text areas into {day_order: [subjects]}."""
+    timetable_data = {}
+    for day_order in range(1, 7):
+        subjects = st.session_state.get(f"day_{day_order}", "")
+        subject_list = [s.strip() for s in subjects.split('\n') if s.strip()]
+        if subject_list:
+            timetable_data[str(day_order)] = subject_list
+    return timetable_data
+
+
+def render_timetable_form():
+    """Day Order editors inside a form, so typing doesn't rerun the app until Apply is pressed."""
+    st.subheader("📚 Input Timetable")
+    with st.form("timetable_form", border=False):
+        for day_order in range(1, 7):
+            with st.expander(f"Day Order {day_order}", expanded=True):
+                st.text_area(
+                    f"Subjects",
+                    height=100,
+                    key=f"day_{day_order}",
+                    help="Enter one subject per line (5 subjects)",
+                    placeholder="Example:\nCLOUD\nPYTHON\nLAB PYTHON\nPROJECT\nSET"
+                )
+        applied = st.form_submit_button("✔️ Apply Timetable")
+
+    if applied or 'timetable_data' not in st.session_state:
+        st.session_state.timetable_data = read_timetable_input()
+    if applied:
+        save_profile()
+
+
+def render_classroom_form(timetable_data: Dict[str, List[str]]):
+    """Per-subject room inputs inside a form, applied to the mapping in one step."""
+    all_subjects = sorted({subject for subjects in timetable_data.values() for subject in subjects})
+
+    st.subheader("🏛️ Classroom Mapping")
+    with st.expander("Set Classroom Locations", expanded=True):
+        if not all_subjects:
+            st.caption("Apply a timetable to set classroom locations.")
+            return
+
+        with st.form("classroom_form", border=False):
+            for subject in all_subjects:
+                st.text_input(
+                    f"Room for {subject}",
+                    value=st.session_state.subject_classrooms.get(subject, ""),
+                    key=f"room_{subject}",
+                    placeholder="Enter classroom/lab location"
+                )
+            applied = st.form_submit_button("✔️ Apply Classrooms")
+
+    if applied:
+        st.session_state.subject_classrooms = {
+            subject: st.session_state.get(f"room_{subject}", "").strip()
+            for subject in all_subjects
+        }
+        save_profile()
+    else:
+        for subject in all_subjects:
+            st.session_state.subject_classrooms.setdefault(subject, "")
 
-    def generate_event_string(self, subject: str, start_time: str, end_time: str, 
-                            date_str: str, class_name: str, special_event: str = None) -> str:
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        start_dt = datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M")
-        end_dt = datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M")
-        
-        now = datetime.now(pytz.UTC)
-        
-        start_str = start_dt.strftime("%Y%m%dT%H%M%S")
-        end_str = end_dt.strftime("%Y%m%dT%H%M%S")
-        stamp_str = now.strftime("%Y%m%dT%H%M%SZ")
-        
-        location = self.classroom_mapping.get(subject, "")
-        description = f"{class_name} - {subject}"
-        if location:
-            description += f"\nRoom: {location}"
-        if special_event:
-            description += f"\nNote: {special_event}"
-            
-        event_str = f"""BEGIN:VEVENT
-DTSTAMP:{stamp_str}
-DTSTART;TZID=Asia/Kolkata:{start_str}
-DTEND;TZID=Asia/Kolkata:{end_str}
-UID:{str(uuid.uuid4())}
-DESCRIPTION:{description}
-LOCATION:{location}
-SEQUENCE:0
-STATUS:CONFIRMED
-SUMMARY:{subject}
-TRANSP:OPAQUE
-BEGIN:VALARM
-ACTION:DISPLAY
-DESCRIPTION:Reminder for {subject}
-TRIGGER:-PT10M
-END:VALARM
-END:VEVENT\n"""
-        return event_str
-
-    def generate_holiday_event(self, date_str: str, holiday_name: str = "No Classes") -> str:
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        next_day = date_obj + timedelta(days=1)
-        
-        now = datetime.now(pytz.UTC)
-        stamp_str = now.strftime("%Y%m%dT%H%M%SZ")
-        
-        date_str_formatted = date_obj.strftime("%Y%m%d")
-        next_day_formatted = next_day.strftime("%Y%m%d")
-        
-        return f"""BEGIN:VEVENT
-DTSTAMP:{stamp_str}
-DTSTART;VALUE=DATE:{date_str_formatted}
-DTEND;VALUE=DATE:{next_day_formatted}
-UID:holiday-{date_str_formatted}@college
-DESCRIPTION:{holiday_name}
-SEQUENCE:0
-STATUS:CONFIRMED
-SUMMARY:{holiday_name}
-TRANSP:TRANSPARENT
-END:VEVENT\n"""
-
-    def generate_timetable_ics(self, special_events: Dict[str, str]) -> str:
-        ics_content = [
-            "BEGIN:VCALENDAR",
-            "VERSION:2.0",
-            "PRODID:-//MCC//Timetable Generator//EN",
-            "CALSCALE:GREGORIAN",
-            "METHOD:PUBLISH",
-            "BEGIN:VTIMEZONE",
-            "TZID:Asia/Kolkata",
-            "BEGIN:STANDARD",
-            "DTSTART:19700101T000000",
-            "TZOFFSETFROM:+0530",
-            "TZOFFSETTO:+0530",
-            "TZNAME:IST",
-            "END:STANDARD",
-            "END:VTIMEZONE"
-        ]
-        
-        for date_str, day_order in sorted(self.day_orders.items()):
-            if day_order in self.timetable:
-                subjects = self.timetable[day_order]
-                subject_index = 0
-                
-                special_event = special_events.get(date_str)
-                
-                for class_name, start_time, end_time in self.class_timings:
-                    if class_name != "Break" and subject_index < len(subjects):
-                        event_str = self.generate_event_string(
-                            subjects[subject_index],
-                            start_time,
-                            end_time,
-                            date_str,
-                            class_name,
-                            special_event
-                        )
-                        ics_content.append(event_str)
-                        subject_index += 1
-            else:
-                holiday_name = special_events.get(date_str, "No Classes")
-                holiday_event = self.generate_holiday_event(date_str, holiday_name)
-                ics_content.append(holiday_event)
-        
-        ics_content.append("END:VCALENDAR")
-        return "\n".join(ics_content)
-    
-    def add_to_google_calendar(self, special_events: Dict[str, str]):
-        service = get_google_calendar_service()
-        if not service:
-            raise Exception("Google Calendar service not initialized")
-            
-        added_events = 0
-        
-        for date_str, day_order in sorted(self.day_orders.items()):
-            if day_order in self.timetable:
-                subjects = self.timetable[day_order]
-                subject_index = 0
-                special_event = special_events.get(date_str)
-                
-                for class_name, start_time, end_time in self.class_timings:
-                    if class_name != "Break" and subject_index < len(subjects):
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                        start_dt = datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M")
-                        end_dt = datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M")
-                        
-                        event = {
-                            'summary': subjects[subject_index],
-                            'description': f"{class_name}\n{special_event if special_event else ''}",
-                            'start': {
-                                'dateTime': start_dt.isoformat(),
-                                'timeZone': 'Asia/Kolkata',
-                            },
-                            'end': {
-                                'dateTime': end_dt.isoformat(),
-                                'timeZone': 'Asia/Kolkata',
-                            },
-                            'reminders': {
-                                'useDefault': False,
-                                'overrides': [
-                                    {'method': 'popup', 'minutes': 10},
-                                ],
-                            },
-                        }
-                        
-                        service.events().insert(calendarId='primary', body=event).execute()
-                        added_events += 1
-                        subject_index += 1
-        
-        return added_events
 
 def main():
+    warm_startup_resources()
     st.title("🎓 MCC Timetable Generator")
     st.markdown("---")
     
     # Initialize session state
-    if 'parsed_data' not in st.session_state:
-        st.session_state.parsed_data = None
     if 'subject_classrooms' not in st.session_state:
         st.session_state.subject_classrooms = {}
         
@@ -544,148 +757,172 @@ def main():
         end_date = st.date_input("End Date", datetime.now() + timedelta(days=120))
         
     # Google Calendar Authentication Status
-    if 'google_creds' not in st.session_state:
-        if st.button("Connect Google Calendar"):
-            flow = initialize_google_auth()
-            authorization_url, _ = flow.authorization_url(prompt='consent')
-            st.markdown(f'<a href="{authorization_url}" target="_blank">Click here to authorize</a>', unsafe_allow_html=True)
-            auth_code = st.text_input("Enter the authorization code:")
-            if auth_code:
-                try:
-                    flow.fetch_token(code=auth_code)
-                    st.session_state.google_creds = json.loads(flow.credentials.to_json())
-                    st.success("Successfully connected to Google Calendar!")
-                except Exception as e:
-                    st.error(f"Error connecting to Google Calendar: {str(e)}")
-    else:
+    if st.session_state.get("google_token"):
         st.success("✅ Connected to Google Calendar")
-        if st.button("Disconnect Google Calendar"):
-            del st.session_state.google_creds
-            st.experimental_rerun()
+    else:
+        st.info("Log in with Google above to add the timetable to Google Calendar.")
     
     st.markdown("---")
-    pdf_file = st.file_uploader("Upload Calendar PDF", type=['pdf'])
+    registered = select_registered_calendar(start_date)
+    pdf_file = st.file_uploader("Upload Calendar PDF", type=['pdf']) if registered is None else None
     
-    if pdf_file:
-        with st.spinner("Parsing PDF..."):
-            parser = MCCCalendarParser(start_date=start_date, end_date=end_date)
-            try:
-                day_orders, holidays, special_events = parser.parse_pdf(pdf_file)
-                st.session_state.parsed_data = {
-                    'day_orders': day_orders,
-                    'holidays': holidays,
-                    'special_events': special_events
-                }
+    if registered is not None:
+        apply_parse_result(use_registered_calendar(registered, start_date, end_date))
+    elif pdf_file:
+        # Parsing runs in the background; the editors below stay usable meanwhile
+        try:
+            parse_key = submit_upload(pdf_file, start_date, end_date)
+        except UploadRejected as e:
+            st.error(f"❌ Upload rejected: {str(e)}")
+        else:
+            status = get_parse_executor().status(parse_key)
+            if status == PENDING:
+                render_parse_status(parse_key)
+            elif status == FAILED:
+                st.error(f"❌ Error parsing PDF: {str(get_parse_executor().future(parse_key).exception())}")
+            elif status == DONE or get_calendar_store().get(parse_key) is not None:
+                apply_parse_result(parse_key)
                 st.success("✅ Calendar PDF parsed successfully!")
-            except Exception as e:
-                st.error(f"❌ Error parsing PDF: {str(e)}")
     
+    parsed_data = get_parsed_data()
     st.markdown("---")
     
     # Timetable Input with Subject-Classroom Mapping
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.subheader("📚 Input Timetable")
-        timetable_data = {}
-        all_subjects = set()
-        
-        for day_order in range(1, 7):
-            with st.expander(f"Day Order {day_order}", expanded=True):
-                subjects = st.text_area(
-                    f"Subjects",
-                    height=100,
-                    key=f"day_{day_order}",
-                    help="Enter one subject per line (5 subjects)",
-                    placeholder="Example:\nCLOUD\nPYTHON\nLAB PYTHON\nPROJECT\nSET"
-                )
-                if subjects.strip():
-                    subject_list = [s.strip() for s in subjects.split('\n') if s.strip()]
-                    timetable_data[str(day_order)] = subject_list
-                    all_subjects.update(subject_list)
-        
-        # Classroom Mapping Section
-        st.subheader("🏛️ Classroom Mapping")
-        with st.expander("Set Classroom Locations", expanded=True):
-            for subject in sorted(all_subjects):
-                if subject not in st.session_state.subject_classrooms:
-                    st.session_state.subject_classrooms[subject] = ""
-                    
-                st.session_state.subject_classrooms[subject] = st.text_input(
-                    f"Room for {subject}",
-                    value=st.session_state.subject_classrooms.get(subject, ""),
-                    key=f"room_{subject}",
-                    placeholder="Enter classroom/lab location"
-                )
+        restore_profile()
+        render_timetable_form()
+        timetable_data = st.session_state.timetable_data
+        render_classroom_form(timetable_data)
     
     with col2:
-        if st.session_state.parsed_data:
-            st.subheader("📅 Calendar Overview")
-            
-            # Show calendar data in tabs
-            tab1, tab2, tab3 = st.tabs(["Day Orders", "Special Events", "Classroom Summary"])
-            
-            with tab1:
-                day_orders_df = pd.DataFrame(
-                    [(date, order) for date, order in st.session_state.parsed_data['day_orders'].items()],
-                    columns=['Date', 'Day Order']
-                )
-                st.dataframe(day_orders_df, use_container_width=True)
-            
-            with tab2:
-                events_df = pd.DataFrame(
-                    [(date, event) for date, event in st.session_state.parsed_data['special_events'].items()],
-                    columns=['Date', 'Event']
-                )
-                st.dataframe(events_df, use_container_width=True)
-                
-            with tab3:
-                classroom_df = pd.DataFrame(
-                    [(subject, room) for subject, room in st.session_state.subject_classrooms.items()],
-                    columns=['Subject', 'Room']
-                )
-                st.dataframe(classroom_df, use_container_width=True)
+        if parsed_data:
+            render_calendar_overview(st.session_state.parsed_key, st.session_state.subject_classrooms,
+                                     timetable_data)
     
     st.markdown("---")
     
     # Generate Calendar Section
-    if st.session_state.parsed_data and timetable_data:
+    if parsed_data and timetable_data:
+        compact_events = st.checkbox(
+            "Merge consecutive periods of the same subject into one event",
+            value=False,
+            help="e.g. a lab in the 1st and 2nd Hour becomes a single event; never merged across the Break"
+        )
+        day_orders, provisional, consistency = get_projected_day_orders(st.session_state.parsed_key,
+                                                                        start_date, end_date)
+        last_parsed = max(parsed_data['day_orders'], default=None)
+        if provisional and not st.checkbox(
+            f"Fill {len(provisional)} dates after the calendar ends ({min(provisional)} to {max(provisional)}) "
+            "with provisional day orders",
+            value=False,
+            help="Continues the day order rotation over working days, skipping weekends and known holidays; "
+                 "these classes are marked tentative until the next calendar is published"
+        ):
+            day_orders, provisional = parsed_data['day_orders'], set()
+        elif (not provisional and consistency is not None and last_parsed and end_date.isoformat() > last_parsed
+              and consistency < lazy_import("mcc_timetable.rotation").MIN_CONSISTENCY):
+            st.caption(f"The calendar ends on {last_parsed} and its day orders don't follow a regular rotation "
+                       f"(only {consistency:.0%} of days), so later dates have no classes.")
         col3, col4 = st.columns([1, 1])
         
         with col3:
+            ics_inputs = fingerprint(
+                st.session_state.get('parsed_key'),
+                timetable_data,
+                st.session_state.subject_classrooms,
+                start_date,
+                end_date,
+                compact_events,
+                provisional
+            )
             if st.button("📥 Download Calendar (ICS)"):
-                generator = TimetableGenerator(start_date=start_date, end_date=end_date)
+                generator = TimetableGenerator(start_date=start_date, end_date=end_date, compact=compact_events)
                 generator.set_timetable(timetable_data)
                 generator.set_classroom_mapping(st.session_state.subject_classrooms)
-                generator.set_day_orders(st.session_state.parsed_data['day_orders'])
+                generator.set_day_orders(day_orders, provisional)
                 
-                ics_content = generator.generate_timetable_ics(st.session_state.parsed_data['special_events'])
-                b64 = base64.b64encode(ics_content.encode()).decode()
-                href = f'data:text/calendar;base64,{b64}'
-                st.markdown(
-                    f'<a href="{href}" download="mcc_timetable.ics" '
-                    'class="download-button">⬇️ Download Timetable Calendar</a>',
-                    unsafe_allow_html=True
-                )
+                ics_content = generator.generate_timetable_ics(parsed_data['special_events'])
+                with span("store_artifact"):
+                    artifact_id = get_artifact_store().put(
+                        ics_content.encode(),
+                        "mcc_timetable.ics",
+                        "text/calendar; charset=utf-8"
+                    )
+                st.session_state.ics_artifact = (ics_inputs, artifact_id)
+            render_ics_download(ics_inputs)
         
         with col4:
+            use_dedicated_calendar = st.checkbox(
+                f"Use a separate \"{TIMETABLE_CALENDAR_NAME}\" calendar",
+                value=True,
+                help="Keeps timetable events out of your primary calendar so they can be removed in one step"
+            )
+            replace_existing = st.checkbox(
+                "Replace previously imported timetable",
+                value=False,
+                disabled=not use_dedicated_calendar,
+                help=f"Deletes and recreates the \"{TIMETABLE_CALENDAR_NAME}\" calendar before adding events"
+            )
             if st.button("📅 Add to Google Calendar"):
-                if 'google_creds' not in st.session_state:
+                if not st.session_state.get("google_token"):
                     st.warning("Please connect to Google Calendar first!")
                 else:
                     try:
-                        generator = TimetableGenerator(start_date=start_date, end_date=end_date)
+                        generator = TimetableGenerator(start_date=start_date, end_date=end_date,
+                                                       compact=compact_events)
                         generator.set_timetable(timetable_data)
                         generator.set_classroom_mapping(st.session_state.subject_classrooms)
-                        generator.set_day_orders(st.session_state.parsed_data['day_orders'])
+                        generator.set_day_orders(day_orders, provisional)
                         
                         with st.spinner("Adding events to Google Calendar..."):
-                            added_events = generator.add_to_google_calendar(
-                                st.session_state.parsed_data['special_events']
+                            added_events = add_to_google_calendar(
+                                generator,
+                                parsed_data['special_events'],
+                                dedicated_calendar=use_dedicated_calendar,
+                                replace_existing=use_dedicated_calendar and replace_existing
                             )
                             st.success(f"✅ Successfully added {added_events} events to Google Calendar!")
                     except Exception as e:
                         st.error(f"❌ Error adding to Google Calendar: {str(e)}")
 
+def run_profiled(fn):
+    """Runs fn under cProfile and dumps the stats to PROFILE_DIR, one file per rerun."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        fn()
+    finally:
+        profiler.disable()
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id[:8] if ctx else "bare"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        filename = f"rerun-{time.strftime('%Y%m%d-%H%M%S')}-{session_id}-{secrets.token_hex(3)}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+
+@st.cache_resource
+def get_metrics_file_state() -> Dict[str, float]:
+    return {"last_written": 0.0}
+
+
+def export_metrics():
+    """Writes the stage histograms to METRICS_FILE, at most every METRICS_FILE_INTERVAL seconds."""
+    state = get_metrics_file_state()
+    if time.time() - state["last_written"] >= METRICS_FILE_INTERVAL:
+        state["last_written"] = time.time()
+        write_prometheus(METRICS_FILE)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if PROFILE_DIR:
+        run_profiled(main)
+    else:
+        main()
+    tracing.observe("rerun_duration_seconds", time.perf_counter() - _SCRIPT_STARTED)
+    if METRICS_FILE:
+        export_metrics()
+    track_session_memory()
+    if IMPORT_REPORT_ENABLED:
+        render_import_report()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Concurrent-session load testing for the Streamlit app (python -m loadtest --help)."""
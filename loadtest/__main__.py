@@ -0,0 +1,34 @@
+import argparse
+import json
+import os
+import sys
+
+from .harness import format_report, load_scenario, run_scenario, scenario_pdf
+
+DEFAULT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="loadtest", description="Concurrent-session load test for app.py")
+    parser.add_argument("scenario", help="scenario JSON file (see loadtest/scenarios/)")
+    parser.add_argument("--app", default=DEFAULT_APP, help="Streamlit script to drive (default: app.py)")
+    parser.add_argument("--pdf", help="calendar PDF to upload instead of a generated one")
+    parser.add_argument("--sessions", type=int, nargs="+", help="override the scenario's session counts")
+    parser.add_argument("--processes", type=int, help="worker processes (default: scenario or CPU count)")
+    parser.add_argument("--report", help="write the full JSON report to this file")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    pdf_path = scenario_pdf(scenario, args.pdf)
+    report = run_scenario(scenario, os.path.abspath(args.app), pdf_path,
+                          processes=args.processes, session_counts=args.sessions)
+
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(level["errors"] for level in report["levels"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
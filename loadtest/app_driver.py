@@ -0,0 +1,38 @@
+"""Script the harness runs through AppTest in place of app.py.
+
+AppTest cannot drive st.file_uploader, so the uploader is replaced by one that
+returns the scenario's calendar PDF once the session has "uploaded" it (the
+harness sets _loadtest_upload in session state). Everything else is app.py as is.
+"""
+
+import io
+import os
+import runpy
+import sys
+
+import streamlit as st
+
+APP_PATH = os.path.abspath(os.environ.get("MCC_LOADTEST_APP", os.path.join(os.path.dirname(__file__), "..", "app.py")))
+
+
+class ScenarioUpload(io.BytesIO):
+    def __init__(self, path: str, file_id: str):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+        self.file_id = file_id
+        self.size = len(self.getbuffer())
+        self.type = "application/pdf"
+
+
+def file_uploader(label, *args, **kwargs):
+    upload = st.session_state.get("_loadtest_upload")
+    if not upload:
+        return None
+    return ScenarioUpload(upload["path"], upload["file_id"])
+
+
+st.file_uploader = file_uploader
+if os.path.dirname(APP_PATH) not in sys.path:
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+runpy.run_path(APP_PATH, run_name="__main__")
@@ -0,0 +1,65 @@
+"""Synthetic MCC-style calendar PDFs, so load tests don't depend on a real calendar file."""
+
+import calendar
+from datetime import date
+from typing import List
+
+HOLIDAYS = {(1, 14): "Holiday - Pongal", (10, 2): "Holiday - Gandhi Jayanthi", (12, 25): "Holiday - Christmas"}
+SPECIAL_EVENTS = {9: "Hall Day", 20: "ICA Test"}
+
+
+def calendar_lines(year: int, month: int, day_order: int):
+    """Lines for one month in the layout the parser expects, and the next day order."""
+    lines = [f"{calendar.month_name[month].upper()} {year}"]
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        weekday = date(year, month, day).strftime("%a").upper()
+        if weekday in ("SAT", "SUN"):
+            lines.append(f"{day} {weekday}")
+        elif (month, day) in HOLIDAYS:
+            lines.append(f"{day} {weekday} {HOLIDAYS[(month, day)]}")
+        else:
+            event = SPECIAL_EVENTS.get(day, "")
+            lines.append(f"{day} {weekday} {day_order} {event}".rstrip())
+            day_order = day_order % 6 + 1
+    return lines, day_order
+
+
+def make_calendar_pdf(first_month: date, months: int) -> bytes:
+    """A minimal PDF with one page per month, built without any PDF library."""
+    pages: List[List[str]] = []
+    year, month, day_order = first_month.year, first_month.month, 1
+    for _ in range(months):
+        lines, day_order = calendar_lines(year, month, day_order)
+        pages.append(lines)
+        month += 1
+        if month == 13:
+            year, month = year + 1, 1
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    page_refs = []
+    for lines in pages:
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 800 Td {text} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>".encode()
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b"%010d 00000 n \n" % offset
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
@@ -0,0 +1,263 @@
+"""Drives many simulated sessions of app.py headlessly and reports rerun latency, CPU and memory.
+
+Each session is a streamlit.testing AppTest running loadtest/app_driver.py. AppTest
+is not thread-safe, so within a worker process the sessions advance through the
+scenario steps in lockstep (round robin), and concurrency comes from spreading
+the sessions over several worker processes.
+
+Memory per session is measured against a baseline taken after a throwaway session
+has gone through the scenario once, so the interpreter, Streamlit, the lazily
+imported parsing and export modules and the shared parse of the calendar are not
+charged to the sessions; the marginal figure is the growth per added session
+between consecutive session counts.
+"""
+
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from .fixtures import make_calendar_pdf
+
+DRIVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_driver.py")
+
+
+def read_rss_bytes() -> int:
+    """Current resident set size of this process (Linux), falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def find_button(at, label: str):
+    for button in at.button:
+        if label in button.label:
+            return button
+    raise LookupError(f"no button labelled {label!r}")
+
+
+class SimulatedSession:
+    def __init__(self, session_number: int, pdf_path: str, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = session_number
+        self.pdf_path = pdf_path
+        self.at = AppTest.from_file(DRIVER_PATH, default_timeout=timeout)
+        self.samples: List = []
+        self.errors: List[str] = []
+
+    def rerun(self, action: str, target=None):
+        started = time.perf_counter()
+        try:
+            if target is None:
+                self.at.run()
+            else:
+                target.run()
+        except Exception as e:
+            self.errors.append(f"{action}: {e}")
+        self.samples.append((action, time.perf_counter() - started))
+        for exception in self.at.exception:
+            self.errors.append(f"{action}: {exception.value}")
+
+    def step(self, step: Dict):
+        action = step["action"]
+        if action in ("open", "rerun"):
+            for _ in range(step.get("count", 1)):
+                self.rerun(action)
+        elif action == "upload":
+            self.at.session_state["_loadtest_upload"] = {
+                "path": self.pdf_path,
+                # Every session uploads the same file, as students do with the official calendar
+                "file_id": f"loadtest-{self.number}"
+            }
+            self.rerun(action)
+        elif action == "wait_parse":
+            deadline = time.perf_counter() + step.get("timeout", 30)
+            while "parsed_key" not in self.at.session_state and time.perf_counter() < deadline:
+                time.sleep(step.get("poll", 0.2))
+                self.rerun(action)
+            if "parsed_key" not in self.at.session_state:
+                self.errors.append("wait_parse: calendar was not parsed in time")
+        elif action == "type_day_orders":
+            for day_order, subjects in step["timetable"].items():
+                self.at.text_area(key=f"day_{day_order}").input("\n".join(subjects))
+            self.rerun(action, find_button(self.at, "Apply Timetable").click())
+        elif action == "edit_rooms":
+            for subject, room in step["rooms"].items():
+                self.at.text_input(key=f"room_{subject}").input(room)
+            self.rerun(action, find_button(self.at, "Apply Classrooms").click())
+        elif action == "download":
+            self.rerun(action, find_button(self.at, "Download Calendar").click())
+        elif action == "think":
+            time.sleep(step.get("seconds", 0.5))
+        else:
+            raise ValueError(f"unknown scenario action {action!r}")
+
+
+def run_sessions(scenario: Dict, session_numbers: List[int], pdf_path: str, app_path: str) -> Dict:
+    """Worker entry point: runs the given sessions in lockstep and returns raw measurements."""
+    os.environ["MCC_LOADTEST_APP"] = app_path
+    warmup = SimulatedSession(-1, pdf_path, scenario.get("rerun_timeout", 60))
+    for step in scenario["steps"]:
+        if step["action"] != "think":
+            try:
+                warmup.step(step)
+            except Exception:
+                pass  # The measured sessions record the same failure
+    del warmup
+    gc.collect()
+    rss_start = read_rss_bytes()
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+
+    sessions = [SimulatedSession(number, pdf_path, scenario.get("rerun_timeout", 60)) for number in session_numbers]
+    for step in scenario["steps"]:
+        for session in sessions:
+            try:
+                session.step(step)
+            except Exception as e:
+                session.errors.append(f"{step['action']}: {e}")
+
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        "sessions": len(sessions),
+        "wall_seconds": time.perf_counter() - started,
+        "cpu_seconds": (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime),
+        "rss_start": rss_start,
+        "rss_end": read_rss_bytes(),
+        "samples": [sample for session in sessions for sample in session.samples],
+        "errors": [error for session in sessions for error in session.errors]
+    }
+
+
+def summarize_latencies(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {}
+    ordered = sorted(seconds)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+        "p50_ms": round(cuts[49] * 1000, 1),
+        "p90_ms": round(cuts[89] * 1000, 1),
+        "p99_ms": round(cuts[98] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1)
+    }
+
+
+def run_level(scenario: Dict, sessions: int, processes: int, pdf_path: str, app_path: str) -> Dict:
+    processes = max(1, min(processes, sessions))
+    groups = [list(range(i, sessions, processes)) for i in range(processes)]
+
+    started = time.perf_counter()
+    # spawn gives every worker a fresh interpreter, like a freshly started dyno
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = list(executor.map(run_sessions, [scenario] * processes, groups,
+                                    [pdf_path] * processes, [app_path] * processes))
+    wall_seconds = time.perf_counter() - started
+
+    samples = [sample for result in results for sample in result["samples"]]
+    by_action: Dict[str, List[float]] = {}
+    for action, seconds in samples:
+        by_action.setdefault(action, []).append(seconds)
+    cpu_seconds = sum(result["cpu_seconds"] for result in results)
+    session_rss = sum(result["rss_end"] - result["rss_start"] for result in results)
+    errors = [error for result in results for error in result["errors"]]
+
+    return {
+        "sessions": sessions,
+        "processes": processes,
+        "wall_seconds": round(wall_seconds, 2),
+        "reruns": len(samples),
+        "reruns_per_second": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+        "rerun_latency": summarize_latencies([seconds for _, seconds in samples]),
+        "actions": {action: summarize_latencies(values) for action, values in sorted(by_action.items())},
+        "cpu_seconds": round(cpu_seconds, 2),
+        "cpu_utilisation": round(cpu_seconds / (wall_seconds * processes), 3) if wall_seconds else None,
+        "rss_mb": round(sum(result["rss_end"] for result in results) / 1024 ** 2, 1),
+        "rss_baseline_mb": round(sum(result["rss_start"] for result in results) / 1024 ** 2, 1),
+        "rss_mb_per_session": round(session_rss / sessions / 1024 ** 2, 2),
+        "rss_mb_marginal": None,
+        "errors": len(errors),
+        "error_samples": errors[:10]
+    }
+
+
+def load_scenario(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        scenario = json.load(f)
+    if not scenario.get("steps"):
+        raise ValueError(f"{path}: scenario has no steps")
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    scenario.setdefault("session_counts", [1])
+    return scenario
+
+
+def scenario_pdf(scenario: Dict, override: Optional[str]) -> str:
+    """The calendar PDF to upload: --pdf, the scenario's "pdf", or a generated one."""
+    if override or scenario.get("pdf"):
+        return os.path.abspath(override or scenario["pdf"])
+
+    spec = scenario.get("calendar", {})
+    first_month = spec.get("first_month", "current")
+    if first_month == "current":
+        first_month = date.today().replace(day=1)
+    else:
+        first_month = datetime.strptime(first_month, "%Y-%m").date()
+    fd, path = tempfile.mkstemp(prefix="mcc-loadtest-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(make_calendar_pdf(first_month, spec.get("months", 6)))
+    return path
+
+
+def run_scenario(scenario: Dict, app_path: str, pdf_path: str, processes: Optional[int] = None,
+                 session_counts: Optional[List[int]] = None) -> Dict:
+    processes = processes or scenario.get("processes") or os.cpu_count() or 1
+    levels = []
+    for sessions in session_counts or scenario["session_counts"]:
+        print(f"[{scenario['name']}] {sessions} sessions ...", file=sys.stderr, flush=True)
+        levels.append(run_level(scenario, sessions, processes, pdf_path, app_path))
+    for previous, level in zip(levels, levels[1:]):
+        added = level["sessions"] - previous["sessions"]
+        if added > 0:
+            growth = (level["rss_mb"] - level["rss_baseline_mb"]) - (previous["rss_mb"] - previous["rss_baseline_mb"])
+            level["rss_mb_marginal"] = round(growth / added, 2)
+    return {
+        "scenario": scenario["name"],
+        "description": scenario.get("description", ""),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "host": {
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "levels": levels
+    }
+
+
+def format_report(report: Dict) -> str:
+    header = (f"{'sessions':>8} {'procs':>5} {'reruns':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+              f"{'max ms':>8} {'cpu %':>6} {'rss MB':>7} {'MB/sess':>7} {'MB/+1':>6} {'errors':>6}")
+    lines = [f"Scenario: {report['scenario']}  ({report['started']}, {report['host']['cpu_count']} CPUs)", header]
+    for level in report["levels"]:
+        latency = level["rerun_latency"] or {}
+        lines.append(
+            f"{level['sessions']:>8} {level['processes']:>5} {level['reruns']:>6} "
+            f"{latency.get('p50_ms', 0):>8} {latency.get('p90_ms', 0):>8} {latency.get('p99_ms', 0):>8} "
+            f"{latency.get('max_ms', 0):>8} {(level['cpu_utilisation'] or 0) * 100:>6.1f} "
+            f"{level['rss_mb']:>7} {level['rss_mb_per_session']:>7} "
+            f"{level['rss_mb_marginal'] if level['rss_mb_marginal'] is not None else '-':>6} {level['errors']:>6}"
+        )
+    return "\n".join(lines)
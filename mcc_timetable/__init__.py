@@ -0,0 +1,17 @@
+"""Headless calendar parsing and timetable generation for the MCC Timetable Generator."""
+
+from .errors import CalendarParseError, GoogleSyncError, SolverError, TimetableError, UploadRejected
+from .generator import TimetableGenerator
+from .parser import MCCCalendarParser, parsed_from_dict, parsed_to_dict
+
+__all__ = [
+    "CalendarParseError",
+    "GoogleSyncError",
+    "MCCCalendarParser",
+    "SolverError",
+    "TimetableError",
+    "TimetableGenerator",
+    "UploadRejected",
+    "parsed_from_dict",
+    "parsed_to_dict",
+]
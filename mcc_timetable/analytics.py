@@ -0,0 +1,71 @@
+"""Contact hours per subject, from the calendar and one or many section timetables.
+
+build_ledger() expands the schedule without a Python loop per class: a frame of
+dates (with their day order and special event) is merged with a frame of every
+section's (day order, hour, subject) lessons, so one row is one class. Holidays have
+no day order and so never appear; classes on special event days (ICA Test, Hall
+Day, ...) are kept but flagged, and the aggregates report them separately so the
+net hours are what is left once those days are lost.
+"""
+
+from typing import Dict, List
+
+from .generator import TimetableGenerator
+from .lazy import lazy_import
+
+LEDGER_COLUMNS = ["section", "date", "month", "day_order", "hour", "subject", "hours", "special_event"]
+
+
+def _duration_hours(start: str, end: str) -> float:
+    (start_h, start_m), (end_h, end_m) = (map(int, start.split(":")), map(int, end.split(":")))
+    return ((end_h * 60 + end_m) - (start_h * 60 + start_m)) / 60
+
+
+def build_ledger(day_orders: Dict[str, str], special_events: Dict[str, str],
+                 sections: Dict[str, Dict[str, List[str]]]):
+    """One row per class: section, date, month, day_order, hour, subject, hours, special_event."""
+    pd = lazy_import("pandas")
+    teaching = [(name, _duration_hours(start, end))
+                for name, start, end in TimetableGenerator().class_timings if name != "Break"]
+    lessons = pd.DataFrame(
+        [(section, str(day_order), teaching[slot][0], subject, teaching[slot][1])
+         for section, timetable in sections.items()
+         for day_order, subjects in timetable.items()
+         for slot, subject in enumerate(subjects[:len(teaching)])
+         if subject],
+        columns=["section", "day_order", "hour", "subject", "hours"]
+    )
+    dates = pd.DataFrame(sorted(day_orders.items()), columns=["date", "day_order"])
+    dates["special_event"] = dates["date"].map(special_events)
+    dates["month"] = dates["date"].str[:7]
+    ledger = dates.merge(lessons, on="day_order", how="inner")
+    return ledger[LEDGER_COLUMNS].sort_values(["section", "date"], kind="stable").reset_index(drop=True)
+
+
+def _with_event_hours(ledger):
+    return ledger.assign(event_hours=ledger["hours"].where(ledger["special_event"].notna(), 0.0))
+
+
+def subject_hours(ledger):
+    """Per section and subject: classes, scheduled hours, hours on special event days, net hours."""
+    summary = _with_event_hours(ledger).groupby(["section", "subject"], as_index=False).agg(
+        classes=("hours", "size"), hours=("hours", "sum"), event_hours=("event_hours", "sum"))
+    summary["net_hours"] = summary["hours"] - summary["event_hours"]
+    return summary.round(2)
+
+
+def monthly_hours(ledger):
+    """Net hours per section and subject (rows) and month (columns)."""
+    frame = _with_event_hours(ledger)
+    frame = frame.assign(net_hours=frame["hours"] - frame["event_hours"])
+    table = frame.pivot_table(index=["section", "subject"], columns="month", values="net_hours",
+                              aggfunc="sum", fill_value=0.0)
+    table.columns.name = None
+    return table.round(2).reset_index()
+
+
+def event_hours(ledger):
+    """Hours falling on each special event, per section and subject."""
+    events = ledger[ledger["special_event"].notna()]
+    return events.groupby(["special_event", "section", "subject"], as_index=False).agg(
+        dates=("date", "nunique"), hours=("hours", "sum")).round(2)
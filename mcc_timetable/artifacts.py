@@ -0,0 +1,211 @@
+"""Server-side store for generated files (ICS exports), with TTL-based eviction.
+
+Artifacts are written once to a directory shared by the Streamlit app and the HTTP
+API, so the page only has to carry a reference. Each artifact is stored next to a
+pre-compressed gzip copy and a small JSON metadata file, or a row in the shared
+StateStore when one is configured (MCC_STATE_DB), so every process sees the same
+expiry times and only one of them needs to sweep.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from .store import StateStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600
+ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Artifact(NamedTuple):
+    artifact_id: str
+    path: str
+    gzip_path: str
+    filename: str
+    content_type: str
+    size: int
+    gzip_size: int
+    created: float
+    expires: float
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS, sweep_interval: float = 60.0,
+                 state: Optional[StateStore] = None):
+        self.root = root or os.path.join(tempfile.gettempdir(), "mcc_timetable_artifacts")
+        self.ttl = ttl
+        self.state = state
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, state: Optional[StateStore] = None) -> "ArtifactStore":
+        """Store configured by MCC_ARTIFACT_DIR and MCC_ARTIFACT_TTL, shared by the app and the API."""
+        return cls(
+            root=os.getenv("MCC_ARTIFACT_DIR") or None,
+            ttl=float(os.getenv("MCC_ARTIFACT_TTL", DEFAULT_TTL_SECONDS)),
+            state=state
+        )
+
+    def _paths(self, artifact_id: str):
+        base = os.path.join(self.root, artifact_id)
+        return base + ".data", base + ".gz", base + ".json"
+
+    def put(self, content: bytes, filename: str, content_type: str = "application/octet-stream") -> str:
+        """Stores content and returns its artifact ID. Identical content is stored once."""
+        self.evict_expired()
+
+        artifact_id = hashlib.sha256(content + filename.encode()).hexdigest()[:32]
+        data_path, gzip_path, meta_path = self._paths(artifact_id)
+        now = time.time()
+        meta = {
+            "filename": filename,
+            "content_type": content_type,
+            "size": len(content),
+            "created": now,
+            "expires": now + self.ttl
+        }
+
+        if not os.path.exists(data_path):
+            self._write_atomic(data_path, content)
+            self._write_atomic(gzip_path, gzip.compress(content, compresslevel=6, mtime=0))
+        meta["gzip_size"] = os.path.getsize(gzip_path)
+        # Rewriting the metadata of existing content extends its lifetime
+        if self.state is not None:
+            self.state.put_artifact(artifact_id, meta)
+        else:
+            self._write_atomic(meta_path, json.dumps(meta).encode())
+        logger.debug("Stored artifact %s (%d bytes)", artifact_id, len(content))
+        return artifact_id
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        if not ARTIFACT_ID.match(artifact_id or ""):
+            return None
+        data_path, gzip_path, meta_path = self._paths(artifact_id)
+        meta = self._load_meta(artifact_id)
+        if meta is None:
+            return None
+        if meta["expires"] < time.time() or not os.path.exists(data_path):
+            return None
+        return Artifact(artifact_id, data_path, gzip_path, meta["filename"], meta["content_type"],
+                        meta["size"], meta["gzip_size"], meta["created"], meta["expires"])
+
+    def _load_meta(self, artifact_id: str) -> Optional[Dict]:
+        if self.state is not None:
+            return self.state.get_artifact(artifact_id)
+        try:
+            with open(self._paths(artifact_id)[2], encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read(self, artifact_id: str) -> Optional[bytes]:
+        artifact = self.get(artifact_id)
+        if artifact is None:
+            return None
+        with open(artifact.path, "rb") as f:
+            return f.read()
+
+    def evict_expired(self, force: bool = False) -> int:
+        """Deletes expired artifacts; runs at most once per sweep_interval unless forced."""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_sweep < self.sweep_interval:
+                return 0
+            self._last_sweep = now
+
+        evicted = 0
+        for artifact_id in self._expired_ids(now):
+            for path in self._paths(artifact_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            if self.state is not None:
+                self.state.delete_artifact(artifact_id)
+            evicted += 1
+        if evicted:
+            logger.info("Evicted %d expired artifacts", evicted)
+        return evicted
+
+    def _expired_ids(self, now: float) -> List[str]:
+        if self.state is not None:
+            return self.state.expired_artifacts(now)
+        expired = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            artifact_id = name[:-len(".json")]
+            try:
+                with open(self._paths(artifact_id)[2], encoding="utf-8") as f:
+                    expires = json.load(f)["expires"]
+            except (OSError, ValueError, KeyError):
+                expires = 0
+            if expires < now:
+                expired.append(artifact_id)
+        return expired
+
+    def _write_atomic(self, path: str, content: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def accepts_gzip(header: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip: listed (or x-gzip), else via "*", with q > 0."""
+    qualities = {}
+    for token in (header or "").split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Dict[str, int]]:
+    """Parses a single "bytes=start-end" Range header. Returns None if unsatisfiable."""
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = min(int(last), size)
+        if length == 0:
+            return None
+        return {"start": size - length, "end": size - 1}
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return {"start": start, "end": end}
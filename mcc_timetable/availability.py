@@ -0,0 +1,147 @@
+"""Common free slots of many students, from their sections' timetables.
+
+Every (date, class_timings slot) of the calendar is one bit: bit date_index * WIDTH +
+slot, with the Break as a slot of its own that no timetable fills. A section's busy
+bitset is built once, by spreading each day order's hour mask over the dates with
+that day order. A person is the sections they attend (a home section plus electives,
+say), so a query ORs the busy bitsets of the distinct sections involved and inverts
+that within the date window: thousands of students over a semester is a handful of
+big-integer operations.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .generator import TimetableGenerator
+
+TIMINGS: Tuple[Tuple[str, str, str], ...] = tuple(TimetableGenerator().class_timings)
+WIDTH = len(TIMINGS)
+# Position in class_timings of each entry of a day order's subject list
+TEACHING_SLOTS: Tuple[int, ...] = tuple(i for i, (name, _, _) in enumerate(TIMINGS) if name != "Break")
+
+
+class FreeWindow(NamedTuple):
+    date: str
+    day_order: str
+    slots: Tuple[str, ...]
+    start: str
+    end: str
+
+
+class AvailabilityIndex:
+    """Busy bitsets per section over one calendar.
+
+        index = AvailabilityIndex(day_orders)
+        index.add_sections(sections); index.add_people({"a@mcc.edu.in": ["II BCA A", "FRENCH"]})
+        index.common_free(["a@mcc.edu.in", ...], start, end, min_slots=2)
+    """
+
+    def __init__(self, day_orders: Dict[str, str]):
+        self.dates = sorted(day_orders)
+        self.day_orders = dict(day_orders)
+        self.section_bits: Dict[str, int] = {}
+        self.people: Dict[str, Tuple[str, ...]] = {}
+        # Bit date_index * WIDTH set for every date with the day order
+        self.date_spread: Dict[str, int] = {}
+        for position, date_str in enumerate(self.dates):
+            day_order = self.day_orders[date_str]
+            self.date_spread[day_order] = self.date_spread.get(day_order, 0) | (1 << (position * WIDTH))
+        # Bit date_index * WIDTH set for every date
+        self.date_starts = sum(self.date_spread.values())
+
+    def add_section(self, section: str, timetable: Dict[str, List[str]]):
+        bits = 0
+        for day_order, subjects in timetable.items():
+            hour_mask = 0
+            for slot, subject in zip(TEACHING_SLOTS, subjects):
+                if subject:  # An empty subject is a free hour
+                    hour_mask |= 1 << slot
+            # Hour masks are narrower than one date's stride, so the product never carries
+            bits |= self.date_spread.get(str(day_order), 0) * hour_mask
+        self.section_bits[section] = bits
+
+    def add_sections(self, sections: Dict[str, Dict]):
+        """Adds {section: {"timetable": {...}, ...}} entries, as read by the rooms command."""
+        for section, entry in sections.items():
+            self.add_section(section, entry.get("timetable", {}))
+
+    def add_people(self, people: Dict[str, Union[str, Iterable[str]]]):
+        """Maps each person to the section, or the list of sections, they attend."""
+        for person, sections in people.items():
+            self.people[person] = (sections,) if isinstance(sections, str) else tuple(sections)
+
+    def window(self, start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """Mask over every slot of the dates between start and end."""
+        first, last = 0, len(self.dates)
+        if start:
+            first = next((i for i, d in enumerate(self.dates) if d >= start.isoformat()), len(self.dates))
+        if end:
+            last = next((i for i, d in enumerate(self.dates) if d > end.isoformat()), len(self.dates))
+        if last <= first:
+            return 0
+        return ((1 << ((last - first) * WIDTH)) - 1) << (first * WIDTH)
+
+    def busy_bits(self, people: Iterable[str] = (), sections: Iterable[str] = ()) -> int:
+        wanted = set(sections)
+        unknown_people = []
+        for person in people:
+            if person in self.people:
+                wanted.update(self.people[person])
+            else:
+                unknown_people.append(person)
+        unknown_sections = sorted(wanted - set(self.section_bits))
+        if unknown_people:
+            raise ValueError(f"unknown people: {', '.join(unknown_people[:10])}")
+        if unknown_sections:
+            raise ValueError(f"unknown sections: {', '.join(unknown_sections[:10])}")
+        bits = 0
+        for section in wanted:
+            bits |= self.section_bits[section]
+        return bits
+
+    def free_bits(self, people: Iterable[str] = (), sections: Iterable[str] = (), start: Optional[date] = None,
+                  end: Optional[date] = None, min_slots: int = 1) -> int:
+        """Slots where everyone is free; with min_slots, only those in a run of at least that many."""
+        free = ~self.busy_bits(people, sections) & self.window(start, end)
+        if min_slots <= 1:
+            return free
+        if min_slots > WIDTH:
+            return 0
+        # A run may only start early enough in the day to end on the same date
+        run = free & self.date_starts * ((1 << (WIDTH - min_slots + 1)) - 1)
+        for offset in range(1, min_slots):
+            run &= free >> offset
+        # Back to every slot covered by a run
+        covered = run
+        for offset in range(1, min_slots):
+            covered |= run << offset
+        return covered
+
+    def windows(self, bits: int) -> List[FreeWindow]:
+        """Consecutive set slots of each date as (date, slots, start, end) windows."""
+        windows = []
+        run: List[int] = []
+        run_date = -1
+
+        def close():
+            if run:
+                names = tuple(TIMINGS[slot][0] for slot in run)
+                date_str = self.dates[run_date]
+                windows.append(FreeWindow(date_str, self.day_orders[date_str], names, TIMINGS[run[0]][1],
+                                          TIMINGS[run[-1]][2]))
+
+        while bits:
+            low = bits & -bits
+            position = low.bit_length() - 1
+            bits ^= low
+            date_index, slot = divmod(position, WIDTH)
+            if date_index != run_date or not run or slot != run[-1] + 1:
+                close()
+                run, run_date = [], date_index
+            run.append(slot)
+        close()
+        return windows
+
+    def common_free(self, people: Iterable[str] = (), sections: Iterable[str] = (), start: Optional[date] = None,
+                    end: Optional[date] = None, min_slots: int = 1) -> List[FreeWindow]:
+        return self.windows(self.free_bits(people, sections, start, end, min_slots))
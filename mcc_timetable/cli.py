@@ -0,0 +1,491 @@
+"""Command line interface: python -m mcc_timetable {parse,generate,diff,sync,fanout,hours,rooms,free,solve,backends,registry,serve} ..."""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import tracing
+from .errors import TimetableError
+from .generator import TimetableGenerator
+from .occupancy import SLOTS, RoomOccupancy
+from .parser import MCCCalendarParser, parsed_from_dict, parsed_to_dict
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def load_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_output(content: str, path: Optional[str]):
+    if not path or path == "-":
+        sys.stdout.write(content)
+        if not content.endswith("\n"):
+            sys.stdout.write("\n")
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+    logger.info("Wrote %s", path)
+
+
+def load_calendar(path: str, start_date=None, end_date=None) -> Tuple[Dict[str, str], Set[str], Dict[str, str]]:
+    """Loads a calendar from a PDF (parsed on the fly) or from the JSON written by `parse`."""
+    if path.lower().endswith(".pdf"):
+        parser = MCCCalendarParser(start_date=start_date, end_date=end_date)
+        with open(path, "rb") as f:
+            return parser.parse_pdf(f)
+    return parsed_from_dict(load_json(path))
+
+
+def build_generator(args) -> Tuple[TimetableGenerator, Dict[str, str]]:
+    day_orders, holidays, special_events = load_calendar(args.calendar, args.start, args.end)
+    timetable = {str(order): subjects for order, subjects in load_json(args.timetable).items()}
+    provisional = set()
+    if args.infer:
+        from .rotation import project
+
+        day_orders, provisional = project(day_orders, args.start, args.end, holidays, backward=args.infer_backward)
+        if provisional:
+            logger.info("Inferred provisional day orders for %d dates (%s to %s)", len(provisional),
+                        min(provisional), max(provisional))
+
+    generator = TimetableGenerator(start_date=args.start, end_date=args.end, compact=args.compact, name=args.name)
+    generator.set_timetable(timetable)
+    generator.set_classroom_mapping(load_json(args.rooms) if args.rooms else {})
+    generator.set_day_orders(day_orders, provisional)
+    return generator, special_events
+
+
+def cmd_parse(args) -> int:
+    parser = MCCCalendarParser(start_date=args.start, end_date=args.end)
+    with open(args.pdf, "rb") as f:
+        day_orders, holidays, special_events = parser.parse_pdf(f)
+    for warning in parser.warnings:
+        logger.warning(warning)
+    write_output(json.dumps(parsed_to_dict(day_orders, holidays, special_events), indent=2), args.output)
+    return 0
+
+
+def cmd_generate(args) -> int:
+    generator, special_events = build_generator(args)
+    if args.output_dir or args.shard or args.shard_by:
+        from .shards import generate_shard_ics, generate_sharded_ics, write_shards
+
+        by = args.shard_by or "month"
+        if args.output_dir:
+            result = write_shards(generator, special_events, args.output_dir, by=by, workers=args.workers)
+            print(f"{len(result.written)} shards written, {len(result.unchanged)} unchanged, "
+                  f"{len(result.removed)} removed in {args.output_dir}")
+        elif args.shard:
+            content = generate_shard_ics(generator, special_events, args.shard, by=by)
+            if content is None:
+                raise ValueError(f"no {by} shard {args.shard!r} in the selected dates")
+            write_output(content, args.output)
+        else:
+            write_output(generate_sharded_ics(generator, special_events, by=by, workers=args.workers), args.output)
+        return 0
+    write_output(generator.generate_timetable_ics(special_events), args.output)
+    return 0
+
+
+def cmd_diff(args) -> int:
+    from .ics import reconcile, render_changes
+
+    with open(args.old, encoding="utf-8", newline="") as old, open(args.new, encoding="utf-8", newline="") as new:
+        reconciliation = reconcile(old, new)
+    write_output(json.dumps(reconciliation.summary(), indent=2), args.output)
+    if args.changes:
+        write_output(render_changes(reconciliation), args.changes)
+    logger.info("%d new, %d changed, %d stale, %d unchanged events", len(reconciliation.new),
+                len(reconciliation.changed), len(reconciliation.stale), reconciliation.unchanged)
+    return 0
+
+
+def cmd_sync(args) -> int:
+    from .google_calendar import build_calendar_service, get_timetable_calendar
+
+    client_id = os.getenv("GOOGLE_CLIENT_ID")
+    client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
+    token = load_json(args.token)
+
+    generator, special_events = build_generator(args)
+    service = build_calendar_service(token, client_id, client_secret)
+    # Persist a refreshed access token for the next run
+    with open(args.token, "w", encoding="utf-8") as f:
+        json.dump(token, f, indent=2)
+
+    calendar_id = "primary"
+    if args.dedicated:
+        calendar_id = get_timetable_calendar(service, recreate=args.replace)
+    added_events = generator.add_to_google_calendar(service, special_events, calendar_id=calendar_id)
+    print(f"Added {added_events} events to {calendar_id}")
+    return 0
+
+
+def cmd_fanout(args) -> int:
+    from .fanout import FanoutSync, ServiceAccountProvider, StubProvider, load_roster
+
+    roster = load_roster(args.roster)
+    if args.provider == StubProvider.name:
+        provider = StubProvider(latency=args.stub_latency)
+    else:
+        key_file = args.key_file or os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE")
+        if not key_file:
+            raise ValueError("--key-file or GOOGLE_SERVICE_ACCOUNT_FILE is required for the service-account provider")
+        provider = ServiceAccountProvider(key_file)
+
+    generator, special_events = build_generator(args)
+    fanout = FanoutSync(provider, concurrency=args.concurrency, calls_per_second=args.rate,
+                        global_calls_per_second=args.global_rate, dedicated=not args.primary, replace=args.replace)
+
+    def progress(report, result):
+        status = f"failed: {result.error}" if result.error else f"{result.added_events} events"
+        logger.info("[%d/%d] %s: %s", len(report.results), report.users, result.email, status)
+
+    summary = fanout.run(generator, special_events, roster, progress=progress).summary()
+    write_output(json.dumps(summary, indent=2), args.output)
+    print(f"Synced {summary['succeeded']} of {summary['users']} users ({summary['added_events']} events, "
+          f"{summary['failed']} failed) in {summary['elapsed_seconds']:.1f} s", file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def cmd_hours(args) -> int:
+    from .analytics import build_ledger, event_hours, monthly_hours, subject_hours
+
+    if bool(args.timetable) == bool(args.sections):
+        raise ValueError("give exactly one of --timetable or --sections")
+    day_orders, _, special_events = load_calendar(args.calendar, args.start, args.end)
+    if args.sections:
+        sections = {section: entry.get("timetable", {}) for section, entry in load_json(args.sections).items()}
+    else:
+        sections = {"timetable": load_json(args.timetable)}
+
+    ledger = build_ledger(day_orders, special_events, sections)
+    report = {"subjects": subject_hours, "monthly": monthly_hours, "events": event_hours}[args.report](ledger)
+    if args.format == "csv":
+        write_output(report.to_csv(index=False), args.output)
+    else:
+        write_output(report.to_json(orient="records", indent=2), args.output)
+    return 0
+
+
+def cmd_rooms(args) -> int:
+    day_orders, _, _ = load_calendar(args.calendar, args.start, args.end)
+    if args.start or args.end:
+        day_orders = {d: order for d, order in day_orders.items()
+                      if (not args.start or d >= args.start.isoformat()) and (not args.end or d <= args.end.isoformat())}
+    index = RoomOccupancy(day_orders)
+    index.add_sections(load_json(args.sections))
+
+    report = {
+        "rooms": len(index.rooms),
+        "conflicts": [
+            {"room": c.room, "day_order": c.day_order, "hour": c.slot,
+             "sections": [{"section": b.section, "subject": b.subject} for b in c.bookings],
+             "dates": len(c.dates), "first_date": c.dates[0] if c.dates else None}
+            for c in index.conflicts()
+        ],
+        "utilization": index.utilization()
+    }
+    if args.free_on:
+        report["free_rooms"] = index.free_rooms(args.free_on.isoformat(), args.hour)
+    write_output(json.dumps(report, indent=2), args.output)
+    if report["conflicts"]:
+        logger.warning("%d double-booked room slots", len(report["conflicts"]))
+    return 0
+
+
+def load_people(path: str) -> Dict[str, List[str]]:
+    """JSON {person: section or [sections]}, or CSV lines "person,section[,section...]"."""
+    if path.lower().endswith(".json"):
+        return load_json(path)
+    people = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            person, *sections = [field.strip() for field in line.split(",")]
+            if person and not person.startswith("#") and sections:
+                people.setdefault(person, []).extend(section for section in sections if section)
+    return people
+
+
+def cmd_free(args) -> int:
+    from .availability import AvailabilityIndex
+
+    day_orders, _, _ = load_calendar(args.calendar, args.start, args.end)
+    index = AvailabilityIndex(day_orders)
+    index.add_sections(load_json(args.sections))
+    people = []
+    if args.people:
+        index.add_people(load_people(args.people))
+        people = [person.strip() for person in args.who.split(",")] if args.who else list(index.people)
+    if not people and not args.section:
+        raise ValueError("nobody to query: give --people (optionally with --who) or --section")
+
+    started = time.perf_counter()
+    windows = index.common_free(people, args.section or (), args.start, args.end, min_slots=args.min_slots)
+    elapsed = time.perf_counter() - started
+    report = {
+        "people": len(people),
+        "sections": sorted(set(args.section or ()) | {s for person in people for s in index.people[person]}),
+        "query_ms": round(elapsed * 1000, 3),
+        "free": [window._asdict() for window in windows]
+    }
+    write_output(json.dumps(report, indent=2), args.output)
+    logger.info("%d common free windows for %d people in %.2f ms", len(windows), len(people), elapsed * 1000)
+    return 0
+
+
+def cmd_solve(args) -> int:
+    from .solver import solve
+
+    solution = solve(load_json(args.problem), time_limit=args.time_limit, workers=args.workers, seed=args.seed)
+    logger.info("Solved %d sections in %.2f s (%d restarts)", len(solution.timetables), solution.seconds,
+                solution.restarts)
+    write_output(json.dumps(solution.timetables, indent=2), args.output)
+    return 0
+
+
+def cmd_backends(args) -> int:
+    from .extraction import BACKENDS, benchmark
+
+    with open(args.pdf, "rb") as f:
+        results = benchmark(f, MCCCalendarParser().count_date_rows, pages=args.pages)
+    print(f"{'backend':<10} {'ms/page':>8} {'date rows':>9}  status")
+    for result in results:
+        status = f"error: {result.error}" if result.error else ("ok" if result.date_rows else "no date rows")
+        print(f"{result.backend:<10} {result.seconds_per_page * 1000:>8.1f} {result.date_rows:>9}  {status}")
+    missing = sorted(set(BACKENDS) - {result.backend for result in results})
+    if missing:
+        print(f"not installed: {', '.join(missing)}")
+    return 0
+
+
+def cmd_registry_add(args) -> int:
+    from .registry import DATA_DIR, write_entry
+    from .uploads import CHUNK_SIZE
+
+    # Same digest the upload paths compute, so uploads of this file hit the entry
+    digest = hashlib.sha256()
+    with open(args.pdf, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        f.seek(0)
+        parser = MCCCalendarParser()
+        day_orders, holidays, special_events = parser.parse_pdf(f)
+    for warning in parser.warnings:
+        logger.warning(warning)
+    if not day_orders:
+        raise TimetableError(f"no day orders found in {args.pdf}; not registering it")
+    path = write_entry(args.dir or DATA_DIR, args.name, digest.hexdigest(), day_orders, holidays, special_events)
+    print(f"Registered {args.name!r} ({len(day_orders)} day orders, {min(day_orders)} to {max(day_orders)}) "
+          f"as {path}")
+    return 0
+
+
+def cmd_registry_list(args) -> int:
+    from .registry import DATA_DIR, CalendarRegistry
+
+    registry = CalendarRegistry.load(args.dir) if args.dir else CalendarRegistry.from_env()
+    if not registry:
+        print(f"No registered calendars in {args.dir or DATA_DIR}")
+    for entry in registry.current():
+        print(f"{entry.sha256[:16]}  {entry.first_date} to {entry.last_date}  {entry.name}")
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from .server import serve
+
+    serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size)
+    return 0
+
+
+def add_range_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--start", type=parse_date, help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_date, help="last date to include (YYYY-MM-DD)")
+
+
+def add_timetable_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--calendar", required=True,
+                        help="calendar PDF, or the JSON written by `parse`")
+    parser.add_argument("--timetable", required=True,
+                        help='JSON mapping day order to subjects, e.g. {"1": ["CLOUD", "PYTHON", ...]}')
+    parser.add_argument("--rooms", help="JSON mapping subject to classroom")
+    parser.add_argument("--compact", action="store_true",
+                        help="merge consecutive periods of the same subject into one event")
+    parser.add_argument("--infer", action="store_true",
+                        help="give dates after the calendar, up to --end, provisional day orders")
+    parser.add_argument("--infer-backward", action="store_true",
+                        help="with --infer, also fill dates from --start to the calendar's first date")
+    parser.add_argument("--name", help="section or timetable name used in event ids, so several timetables can "
+                                       "share one calendar (default: a hash of the timetable)")
+    add_range_arguments(parser)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="mcc_timetable", description="MCC Timetable Generator")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="more logging (-vv for debug)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write stage timings to FILE in Prometheus text format when done")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record memory allocated per stage (slow)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parse_cmd = commands.add_parser("parse", help="parse a calendar PDF into JSON")
+    parse_cmd.add_argument("pdf")
+    parse_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    add_range_arguments(parse_cmd)
+    parse_cmd.set_defaults(func=cmd_parse)
+
+    generate_cmd = commands.add_parser("generate", help="generate an ICS timetable")
+    add_timetable_arguments(generate_cmd)
+    generate_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    generate_cmd.add_argument("--shard-by", choices=("month", "term"),
+                              help="render month or term shards in parallel (default with --output-dir: month)")
+    generate_cmd.add_argument("--shard", metavar="KEY",
+                              help='only one shard, e.g. 2026-07 or term-2026-06, or "current"')
+    generate_cmd.add_argument("--output-dir", metavar="DIR",
+                              help="write one ICS per shard plus manifest.json; unchanged shards are not rewritten")
+    generate_cmd.add_argument("--workers", type=int,
+                              help="shard rendering processes (default: one per CPU for very long ranges, "
+                                   "else in-process)")
+    generate_cmd.set_defaults(func=cmd_generate)
+
+    diff_cmd = commands.add_parser("diff", help="compare a previously exported ICS with a new one")
+    diff_cmd.add_argument("old", help="ICS imported earlier")
+    diff_cmd.add_argument("new", help="newly generated ICS")
+    diff_cmd.add_argument("-o", "--output", help="JSON report of new, changed and stale events (default: stdout)")
+    diff_cmd.add_argument("--changes", metavar="FILE",
+                          help="also write an ICS with only the new and changed events, to import over the old one")
+    diff_cmd.set_defaults(func=cmd_diff)
+
+    sync_cmd = commands.add_parser("sync", help="add the timetable to Google Calendar")
+    add_timetable_arguments(sync_cmd)
+    sync_cmd.add_argument("--token", required=True,
+                          help="JSON file with access_token, refresh_token and expiry; updated on refresh")
+    sync_cmd.add_argument("--dedicated", action="store_true",
+                          help='write to a separate "MCC Timetable" calendar instead of primary')
+    sync_cmd.add_argument("--replace", action="store_true",
+                          help="recreate the dedicated calendar before adding events")
+    sync_cmd.set_defaults(func=cmd_sync)
+
+    fanout_cmd = commands.add_parser("fanout", help="add the timetable to every student's Google Calendar")
+    add_timetable_arguments(fanout_cmd)
+    fanout_cmd.add_argument("--roster", required=True, help="text or CSV file with one student email per line")
+    fanout_cmd.add_argument("--provider", choices=("service-account", "stub"), default="service-account",
+                            help="how to act as each student (default: service-account, via domain-wide delegation)")
+    fanout_cmd.add_argument("--key-file", help="service account key (default: GOOGLE_SERVICE_ACCOUNT_FILE)")
+    fanout_cmd.add_argument("--concurrency", type=int, default=16, help="students synced at once (default: 16)")
+    fanout_cmd.add_argument("--rate", type=float, default=5.0, help="API calls per second per student (default: 5)")
+    fanout_cmd.add_argument("--global-rate", type=float, help="API calls per second across all students")
+    fanout_cmd.add_argument("--primary", action="store_true",
+                            help='write to primary calendars instead of a separate "MCC Timetable" calendar')
+    fanout_cmd.add_argument("--replace", action="store_true",
+                            help="recreate the dedicated calendar before adding events")
+    fanout_cmd.add_argument("--stub-latency", type=float, default=0.0, help="seconds added to each stub API call")
+    fanout_cmd.add_argument("-o", "--output", help="JSON report file (default: stdout)")
+    fanout_cmd.set_defaults(func=cmd_fanout)
+
+    hours_cmd = commands.add_parser("hours", help="contact hours per subject, by month and special event")
+    hours_cmd.add_argument("--calendar", required=True, help="calendar PDF, or the JSON written by `parse`")
+    hours_cmd.add_argument("--timetable", help="one timetable: JSON mapping day order to subjects")
+    hours_cmd.add_argument("--sections", help='many: JSON mapping section to {"timetable": {...}}')
+    hours_cmd.add_argument("--report", choices=("subjects", "monthly", "events"), default="subjects",
+                           help="per subject totals, net hours per month, or hours lost to each special event")
+    hours_cmd.add_argument("--format", choices=("csv", "json"), default="csv")
+    hours_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    add_range_arguments(hours_cmd)
+    hours_cmd.set_defaults(func=cmd_hours)
+
+    rooms_cmd = commands.add_parser("rooms", help="room double-bookings and utilization across sections")
+    rooms_cmd.add_argument("--calendar", required=True,
+                           help="calendar PDF, or the JSON written by `parse`")
+    rooms_cmd.add_argument("--sections", required=True,
+                           help='JSON mapping section to {"timetable": {...}, "rooms": {...}}')
+    rooms_cmd.add_argument("--free-on", type=parse_date, metavar="DATE", help="also list rooms free on DATE")
+    rooms_cmd.add_argument("--hour", default=SLOTS[0], choices=SLOTS, help=f'hour for --free-on (default: "{SLOTS[0]}")')
+    rooms_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    add_range_arguments(rooms_cmd)
+    rooms_cmd.set_defaults(func=cmd_rooms)
+
+    free_cmd = commands.add_parser("free", help="slots when a group of students is all free")
+    free_cmd.add_argument("--calendar", required=True, help="calendar PDF, or the JSON written by `parse`")
+    free_cmd.add_argument("--sections", required=True,
+                          help='JSON mapping section to {"timetable": {...}}, e.g. the output of `solve`')
+    free_cmd.add_argument("--people", help='JSON {person: section or [sections]}, or CSV "person,section,..."')
+    free_cmd.add_argument("--who", help="comma-separated people from --people (default: all of them)")
+    free_cmd.add_argument("--section", action="append", help="include everyone in a section (repeatable)")
+    free_cmd.add_argument("--min-slots", type=int, default=1,
+                          help="only windows of at least this many consecutive slots, Break included (default: 1)")
+    free_cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    add_range_arguments(free_cmd)
+    free_cmd.set_defaults(func=cmd_free)
+
+    solve_cmd = commands.add_parser("solve", help="build day order timetables for many sections")
+    solve_cmd.add_argument("problem", help="JSON with sections, subject hours, lab blocks, faculty and rooms")
+    solve_cmd.add_argument("-o", "--output", help="output file (default: stdout); usable as `rooms --sections`")
+    solve_cmd.add_argument("--time-limit", type=float, default=10.0, help="seconds to search (default: 10)")
+    solve_cmd.add_argument("--workers", type=int, help="parallel restart processes (default: CPU count)")
+    solve_cmd.add_argument("--seed", type=int, default=0)
+    solve_cmd.set_defaults(func=cmd_solve)
+
+    backends_cmd = commands.add_parser("backends", help="benchmark the installed PDF text extractors")
+    backends_cmd.add_argument("pdf", help="calendar PDF to calibrate on")
+    backends_cmd.add_argument("--pages", type=int, default=2, help="pages to extract per backend (default: 2)")
+    backends_cmd.set_defaults(func=cmd_backends)
+
+    registry_cmd = commands.add_parser("registry", help="manage the bundled pre-parsed official calendars")
+    registry_commands = registry_cmd.add_subparsers(dest="registry_command", required=True)
+    registry_add = registry_commands.add_parser("add", help="parse a calendar PDF and register it by content hash")
+    registry_add.add_argument("pdf")
+    registry_add.add_argument("--name", required=True, help='display name, e.g. "2025-26 Odd Semester"')
+    registry_add.add_argument("--dir", help="registry directory (default: the package's data/calendars)")
+    registry_add.set_defaults(func=cmd_registry_add)
+    registry_list = registry_commands.add_parser("list", help="list registered calendars")
+    registry_list.add_argument("--dir", help="registry directory (default: package data plus MCC_CALENDAR_REGISTRY)")
+    registry_list.set_defaults(func=cmd_registry_list)
+
+    serve_cmd = commands.add_parser("serve", help="run the local JSON HTTP API")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8600)
+    serve_cmd.add_argument("--workers", type=int, help="parse/generate processes (default: CPU count)")
+    serve_cmd.add_argument("--queue-size", type=int, default=16,
+                           help="requests allowed to wait for a worker before returning 429")
+    serve_cmd.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    level = [logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)]
+    logging.basicConfig(level=level, format="%(levelname)s %(name)s: %(message)s")
+
+    if args.trace_memory:
+        tracing.enable_memory_tracking()
+
+    try:
+        return args.func(args)
+    except TimetableError as e:
+        logger.error("%s", e)
+        return 1
+    except (OSError, ValueError) as e:
+        logger.error("%s", e)
+        return 2
+    finally:
+        if args.metrics:
+            tracing.write_prometheus(args.metrics)
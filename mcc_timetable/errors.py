@@ -0,0 +1,26 @@
+class TimetableError(Exception):
+    """Base class for errors raised by the timetable engine."""
+
+
+class CalendarParseError(TimetableError):
+    """The calendar PDF could not be read or contained no usable dates."""
+
+
+class GoogleSyncError(TimetableError):
+    """A Google Calendar API call failed part-way through a sync."""
+
+    def __init__(self, message: str, added_events: int = 0):
+        super().__init__(message)
+        self.added_events = added_events
+
+
+class SolverError(TimetableError):
+    """The timetable solver found no assignment satisfying the constraints."""
+
+
+class UploadRejected(TimetableError):
+    """An uploaded calendar is not a PDF or is over the size or page limits."""
+
+    def __init__(self, message: str, too_large: bool = False):
+        super().__init__(message)
+        self.too_large = too_large
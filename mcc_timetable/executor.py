@@ -0,0 +1,107 @@
+"""Background calendar parsing shared by every session in the process."""
+
+import hashlib
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from .parser import parse_calendar_bytes, parse_calendar_file
+from .uploads import StoredUpload, discard
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def upload_id(pdf_bytes: bytes, start_date=None, end_date=None) -> str:
+    """Identifies a parse by file content and date range, so identical uploads share one parse."""
+    return digest_upload_id(hashlib.sha256(pdf_bytes).hexdigest(), start_date, end_date)
+
+
+def digest_upload_id(digest: str, start_date=None, end_date=None) -> str:
+    """upload_id() for content already hashed while it was streamed in."""
+    return f"{digest}:{start_date or ''}:{end_date or ''}"
+
+
+class ParseExecutor:
+    """Runs calendar parses in the background and hands out futures keyed by upload ID.
+
+    Submitting an upload that is already being parsed (or was parsed recently)
+    returns the existing future instead of starting another parse. At most
+    max_results finished parses are kept; the least recently used are dropped.
+
+    Parses run on threads by default. Headless callers can pass processes=True to
+    use worker processes instead; inside Streamlit that is best avoided, because
+    spawned workers re-import the running script as their main module.
+    """
+
+    def __init__(self, workers: int = 2, max_results: int = 64, processes: bool = False):
+        if processes:
+            # spawn rather than fork: the caller is usually multi-threaded
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._futures: "OrderedDict[str, Future]" = OrderedDict()
+
+    def submit(self, pdf_bytes: bytes, start_date=None, end_date=None, key: Optional[str] = None) -> str:
+        key = key or upload_id(pdf_bytes, start_date, end_date)
+        self._submit(key, parse_calendar_bytes, pdf_bytes, start_date, end_date)
+        return key
+
+    def submit_upload(self, upload: StoredUpload, start_date=None, end_date=None) -> str:
+        """Parses a stored upload from its file and deletes the file afterwards (or right away
+        if the same content is already being parsed)."""
+        key = digest_upload_id(upload.digest, start_date, end_date)
+        future = self._submit(key, parse_calendar_file, upload.path, start_date, end_date)
+        if future is None:
+            discard(upload)
+        else:
+            future.add_done_callback(lambda _: discard(upload))
+        return key
+
+    def _submit(self, key: str, fn, *args) -> Optional[Future]:
+        """Starts fn(*args) under key unless a live parse for key exists (then returns None)."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._futures.move_to_end(key)
+                return None
+
+            logger.info("Parsing upload %s in the background", key[:12])
+            future = self._futures[key] = self.executor.submit(fn, *args)
+            self._evict()
+        return future
+
+    def future(self, key: str) -> Optional[Future]:
+        with self._lock:
+            return self._futures.get(key)
+
+    def status(self, key: str) -> Optional[str]:
+        future = self.future(key)
+        if future is None:
+            return None
+        if not future.done():
+            return PENDING
+        return FAILED if future.exception() is not None else DONE
+
+    def result(self, key: str, timeout: Optional[float] = None) -> Dict:
+        """The parsed calendar dict; raises the parse error if the parse failed."""
+        future = self.future(key)
+        if future is None:
+            raise KeyError(key)
+        return future.result(timeout=timeout)
+
+    def _evict(self):
+        finished = [key for key, future in self._futures.items() if future.done()]
+        while len(self._futures) > self.max_results and finished:
+            del self._futures[finished.pop(0)]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
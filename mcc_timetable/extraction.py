@@ -0,0 +1,248 @@
+"""Pluggable PDF text extraction backends, ordered by a one-off calibration benchmark.
+
+Each backend turns a seekable binary stream into one text string per page. PyPDF2 is
+always available (it is in requirements.txt); pypdf, pdfminer.six, PyMuPDF and
+poppler's pdftotext are used when installed. The first document parsed in a process
+calibrates the order: every available backend extracts its first pages, backends
+are ranked by whether they produced date rows and then by speed, and the ranking is
+reused until another backend is registered; documents no backend can read are
+remembered by hash rather than re-benchmarked. Set MCC_PDF_BACKEND to pin a backend
+(the others are still used as fallbacks).
+"""
+
+import hashlib
+import importlib.util
+import io
+import logging
+import mmap
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from .errors import CalendarParseError
+from .lazy import lazy_import
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PAGES = 2
+
+
+class ExtractionBackend:
+    """Base class: subclasses set name and implement available() and page_texts().
+
+    page_texts() may stop after max_pages pages; callers still stop reading there.
+    """
+
+    name = ""
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def page_texts(self, source: BinaryIO, max_pages: Optional[int] = None) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class PyPDF2Backend(ExtractionBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    def page_texts(self, source: BinaryIO, max_pages: Optional[int] = None) -> Iterator[str]:
+        with span("open_pdf", backend=self.name):
+            reader = lazy_import(self.module).PdfReader(source)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+class PypdfBackend(PyPDF2Backend):
+    """pypdf is the maintained successor of PyPDF2, with the same reader API."""
+    name = "pypdf"
+    module = "pypdf"
+
+
+class PdfminerBackend(ExtractionBackend):
+    name = "pdfminer"
+
+    def available(self) -> bool:
+        return importlib.util.find_spec("pdfminer") is not None
+
+    def page_texts(self, source: BinaryIO, max_pages: Optional[int] = None) -> Iterator[str]:
+        high_level = lazy_import("pdfminer.high_level")
+        layout = lazy_import("pdfminer.layout")
+        for page in high_level.extract_pages(source, maxpages=max_pages or 0):
+            yield "".join(element.get_text() for element in page if isinstance(element, layout.LTTextContainer))
+
+
+class PyMuPDFBackend(ExtractionBackend):
+    name = "pymupdf"
+
+    def _module_name(self) -> Optional[str]:
+        for module_name in ("pymupdf", "fitz"):
+            if importlib.util.find_spec(module_name) is not None:
+                return module_name
+        return None
+
+    def available(self) -> bool:
+        return self._module_name() is not None
+
+    def page_texts(self, source: BinaryIO, max_pages: Optional[int] = None) -> Iterator[str]:
+        with span("open_pdf", backend=self.name):
+            document = lazy_import(self._module_name()).open(stream=source.read(), filetype="pdf")
+        try:
+            for page in document:
+                yield page.get_text("text", sort=True)
+        finally:
+            document.close()
+
+
+class PdftotextBackend(ExtractionBackend):
+    """poppler's pdftotext command; -layout keeps each calendar row on one line."""
+    name = "pdftotext"
+
+    def available(self) -> bool:
+        return shutil.which("pdftotext") is not None
+
+    def page_texts(self, source: BinaryIO, max_pages: Optional[int] = None) -> Iterator[str]:
+        # pdftotext converts the whole document up front, so limit it to the pages wanted
+        last_page = ["-l", str(max_pages)] if max_pages else []
+        result = subprocess.run(["pdftotext", "-layout", "-enc", "UTF-8", *last_page, "-", "-"],
+                                input=source.read(), capture_output=True, timeout=120, check=True)
+        pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+        if pages and not pages[-1].strip():
+            pages.pop()
+        yield from pages
+
+
+BACKENDS: Dict[str, ExtractionBackend] = {}
+
+
+class Calibration(NamedTuple):
+    backend: str
+    seconds_per_page: float
+    date_rows: int
+    error: Optional[str]
+
+
+# Documents no backend found date rows in (scans, not a calendar), by content hash
+UNMATCHED_CACHE_SIZE = 64
+
+_calibration: Optional[List[Calibration]] = None
+_unmatched: Dict[str, List[Calibration]] = {}
+# Bumped by register_backend, so a benchmark started before it is not published
+_generation = 0
+_calibration_lock = threading.Lock()
+
+
+def register_backend(backend: ExtractionBackend):
+    """Adds a backend; the next document parsed recalibrates so it is ranked too."""
+    global _calibration, _generation
+    with _calibration_lock:
+        BACKENDS[backend.name] = backend
+        _calibration = None
+        _unmatched.clear()
+        _generation += 1
+
+
+for _backend in (PyPDF2Backend(), PypdfBackend(), PdfminerBackend(), PyMuPDFBackend(), PdftotextBackend()):
+    register_backend(_backend)
+
+
+def seekable(source) -> BinaryIO:
+    """A stream every backend can rewind; non-seekable inputs are buffered once."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if isinstance(source, mmap.mmap):
+        return source
+    if hasattr(source, "seekable") and source.seekable():
+        return source
+    return io.BytesIO(source.read())
+
+
+def benchmark(source: BinaryIO, score: Callable[[str], int], pages: int = CALIBRATION_PAGES) -> List[Calibration]:
+    """Times every available backend on the first pages of source, best first."""
+    results = []
+    for backend in BACKENDS.values():
+        if not backend.available():
+            continue
+        source.seek(0)
+        started = time.perf_counter()
+        extracted = rows = 0
+        error = None
+        try:
+            for text in backend.page_texts(source, max_pages=pages):
+                rows += score(text)
+                extracted += 1
+                if extracted >= pages:
+                    break
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        elapsed = time.perf_counter() - started
+        results.append(Calibration(backend.name, elapsed / max(extracted, 1), rows, error))
+    source.seek(0)
+    return sorted(results, key=lambda c: (c.error is not None, c.date_rows == 0, c.seconds_per_page))
+
+
+def document_fingerprint(source: BinaryIO) -> str:
+    source.seek(0)
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _calibrate(source: BinaryIO, score: Callable[[str], int]) -> List[Calibration]:
+    """The process-wide ranking, benchmarking on this document when there is none yet.
+
+    The benchmark runs without the lock, so parses that arrive meanwhile are not
+    held up (they may benchmark too). Only a ranking from a document some backend
+    read dates from is published; a document none could read is remembered by its
+    hash, so uploading it again does not benchmark every backend again.
+    """
+    global _calibration
+    with _calibration_lock:
+        calibration, generation = _calibration, _generation
+    if calibration is not None:
+        return calibration
+
+    key = document_fingerprint(source)
+    with _calibration_lock:
+        calibration = _unmatched.get(key)
+    if calibration is not None:
+        return calibration
+
+    with span("calibrate_backends"):
+        calibration = benchmark(source, score)
+    logger.info("PDF backend calibration: %s", ", ".join(
+        f"{c.backend} {c.seconds_per_page * 1000:.0f} ms/page, {c.date_rows} rows"
+        + (f" ({c.error})" if c.error else "") for c in calibration))
+    with _calibration_lock:
+        if generation != _generation:
+            return calibration
+        # Keep the ranking only if it came from a real calendar, not a broken upload
+        if any(c.date_rows and not c.error for c in calibration):
+            if _calibration is None:
+                _calibration = calibration
+        else:
+            if len(_unmatched) >= UNMATCHED_CACHE_SIZE:
+                del _unmatched[next(iter(_unmatched))]
+            _unmatched[key] = calibration
+    return calibration
+
+
+def backend_order(source: BinaryIO, score: Callable[[str], int]) -> List[ExtractionBackend]:
+    """Backends to try for a document: the pinned one first, then the calibrated order."""
+    pinned = os.getenv("MCC_PDF_BACKEND")
+    if pinned and pinned not in BACKENDS:
+        raise CalendarParseError(f"MCC_PDF_BACKEND={pinned!r} is not one of {', '.join(sorted(BACKENDS))}")
+
+    order = [BACKENDS[c.backend] for c in _calibrate(source, score)]
+    if pinned:
+        order = [BACKENDS[pinned]] + [backend for backend in order if backend.name != pinned]
+    return order
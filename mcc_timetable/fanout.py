@@ -0,0 +1,368 @@
+"""Fan-out sync: one section's timetable pushed to every student's Google Calendar.
+
+Credentials come from a pluggable CredentialProvider, which returns a Calendar API
+service acting as a given user: ServiceAccountProvider uses Workspace domain-wide
+delegation, StubProvider an in-memory calendar for local runs and tests. Users are
+synced in parallel, at most `concurrency` at a time. Each user's API calls go through
+a token bucket (Google's quotas are per user), optionally also a shared one for the
+project quota, and rate-limit errors are retried with backoff. Progress and failures
+are collected in a FanoutReport.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from .generator import TimetableGenerator
+from .google_calendar import get_timetable_calendar
+from .lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+
+class CredentialProvider:
+    """Base class: subclasses set name and implement service_for()."""
+
+    name = ""
+
+    def service_for(self, email: str):
+        """A Calendar API service acting as the user; not shared between threads."""
+        raise NotImplementedError
+
+
+class ServiceAccountProvider(CredentialProvider):
+    """A Workspace service account with domain-wide delegation, impersonating each user."""
+
+    name = "service-account"
+
+    def __init__(self, key_file: str, scopes: List[str] = CALENDAR_SCOPES):
+        self.key_file = key_file
+        self.scopes = scopes
+        self._credentials = None
+        self._lock = threading.Lock()
+
+    def service_for(self, email: str):
+        with self._lock:
+            if self._credentials is None:
+                Credentials = lazy_import("google.oauth2.service_account").Credentials
+                self._credentials = Credentials.from_service_account_file(self.key_file, scopes=self.scopes)
+        build = lazy_import("googleapiclient.discovery").build
+        return build('calendar', 'v3', credentials=self._credentials.with_subject(email), cache_discovery=False)
+
+
+class StubHttpError(Exception):
+    """Shaped like googleapiclient's HttpError: the status is on e.resp.status."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = type("Response", (), {"status": status})()
+
+
+class _StubRequest:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class StubCalendarService:
+    """The slice of the Calendar API the sync uses, kept in memory for one user."""
+
+    def __init__(self, provider: "StubProvider", email: str):
+        self.provider = provider
+        self.email = email
+
+    def _call(self, fn):
+        def run():
+            provider = self.provider
+            if provider.latency:
+                time.sleep(provider.latency)
+            if self.email in provider.fail_users:
+                raise StubHttpError(403, f"no delegated access for {self.email}")
+            if provider.throttle_rate and provider.random.random() < provider.throttle_rate:
+                raise StubHttpError(403, "userRateLimitExceeded")
+            with provider.lock:
+                provider.calls += 1
+                return fn(provider.calendars.setdefault(self.email, {}))
+        return _StubRequest(run)
+
+    def calendarList(self):
+        service = self
+
+        class CalendarList:
+            def list(self, **kwargs):
+                return service._call(lambda calendars: {"items": [
+                    {"id": calendar_id, "summary": calendar["summary"]} for calendar_id, calendar in calendars.items()
+                ]})
+        return CalendarList()
+
+    def calendars(self):
+        service = self
+
+        class Calendars:
+            def insert(self, body):
+                def insert(calendars):
+                    calendar_id = uuid.uuid4().hex
+                    calendars[calendar_id] = {"summary": body["summary"], "events": {}}
+                    return {"id": calendar_id}
+                return service._call(insert)
+
+            def delete(self, calendarId):
+                return service._call(lambda calendars: calendars.pop(calendarId) and None)
+        return Calendars()
+
+    def events(self):
+        service = self
+
+        class Events:
+            def insert(self, calendarId, body):
+                def insert(calendars):
+                    events = calendars.setdefault(calendarId, {"summary": calendarId, "events": {}})["events"]
+                    event_id = body.get("id") or uuid.uuid4().hex
+                    if event_id in events:
+                        raise StubHttpError(409, "The requested identifier already exists.")
+                    events[event_id] = dict(body, id=event_id)
+                    return events[event_id]
+                return service._call(insert)
+
+            def update(self, calendarId, eventId, body):
+                def update(calendars):
+                    events = calendars.get(calendarId, {}).get("events", {})
+                    if eventId not in events:
+                        raise StubHttpError(404, "Not Found")
+                    events[eventId] = dict(body, id=eventId)
+                    return events[eventId]
+                return service._call(update)
+        return Events()
+
+
+class StubProvider(CredentialProvider):
+    """Local stand-in for Google: every user gets an in-memory calendar.
+
+    fail_users have no delegated access, throttle_rate is the share of calls answered
+    with a rate-limit error, and latency is added to every call.
+    """
+
+    name = "stub"
+
+    def __init__(self, fail_users: Iterable[str] = (), throttle_rate: float = 0.0, latency: float = 0.0,
+                 seed: int = 0):
+        self.fail_users = set(fail_users)
+        self.throttle_rate = throttle_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calendars: Dict[str, Dict[str, Dict]] = {}
+        self.calls = 0
+
+    def service_for(self, email: str):
+        return StubCalendarService(self, email)
+
+    def events_for(self, email: str) -> List[Dict]:
+        with self.lock:
+            return [event for calendar in self.calendars.get(email, {}).values()
+                    for event in calendar["events"].values()]
+
+
+def provider_from_env() -> Optional[CredentialProvider]:
+    """MCC_FANOUT_PROVIDER=stub, or a service account key in GOOGLE_SERVICE_ACCOUNT_FILE; None otherwise."""
+    if os.getenv("MCC_FANOUT_PROVIDER") == StubProvider.name:
+        return StubProvider(latency=float(os.getenv("MCC_FANOUT_STUB_LATENCY", "0")))
+    key_file = os.getenv("GOOGLE_SERVICE_ACCOUNT_FILE")
+    return ServiceAccountProvider(key_file) if key_file else None
+
+
+class RateLimiter:
+    """Token bucket: on average at most rate calls per second, in bursts of up to burst."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    status = getattr(getattr(error, "resp", None), "status", None)
+    return status == 429 or (status == 403 and any(reason in str(error) for reason in RATE_LIMIT_REASONS))
+
+
+class ThrottledService:
+    """Wraps a Calendar API service so every .execute() waits for the limiters.
+
+    Rate-limit errors are retried with exponential backoff and jitter; retries counts
+    them. Any other attribute access is passed through, wrapping what it returns.
+    """
+
+    def __init__(self, target, limiters: List[RateLimiter], max_retries: int = 5, backoff: float = 1.0,
+                 _counter: Optional[List[int]] = None):
+        self._target = target
+        self._limiters = limiters
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._counter = _counter if _counter is not None else [0]
+
+    @property
+    def retries(self) -> int:
+        return self._counter[0]
+
+    def _wrap(self, target):
+        return ThrottledService(target, self._limiters, self._max_retries, self._backoff, self._counter)
+
+    def execute(self, *args, **kwargs):
+        for attempt in range(self._max_retries + 1):
+            for limiter in self._limiters:
+                limiter.acquire()
+            try:
+                return self._target.execute(*args, **kwargs)
+            except Exception as e:
+                if attempt == self._max_retries or not is_rate_limited(e):
+                    raise
+                self._counter[0] += 1
+                time.sleep(self._backoff * 2 ** attempt * (0.5 + random.random() / 2))
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if callable(attr):
+            return lambda *args, **kwargs: self._wrap(attr(*args, **kwargs))
+        return attr
+
+
+def load_roster(path: str) -> List[str]:
+    """Email addresses from a text or CSV file: first column, blank lines and # comments skipped.
+
+    A first line without an address is taken as a CSV header; duplicates are dropped.
+    """
+    emails = {}
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            email = line.split(",", 1)[0].strip().strip('"').lower()
+            if not email or email.startswith("#") or (line_number == 1 and "@" not in email):
+                continue
+            if "@" not in email:
+                raise ValueError(f"{path}:{line_number}: {email!r} is not an email address")
+            emails.setdefault(email, None)
+    return list(emails)
+
+
+class UserResult(NamedTuple):
+    email: str
+    added_events: int
+    error: Optional[str]
+    seconds: float
+    retries: int
+
+
+class FanoutReport:
+    """Aggregate progress of a fan-out, safe to read while it runs."""
+
+    def __init__(self, users: int):
+        self.users = users
+        self.results: List[UserResult] = []
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, result: UserResult):
+        with self._lock:
+            self.results.append(result)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            results = list(self.results)
+        failures = [result for result in results if result.error]
+        return {
+            "users": self.users,
+            "completed": len(results),
+            "succeeded": len(results) - len(failures),
+            "failed": len(failures),
+            "added_events": sum(result.added_events for result in results),
+            "retries": sum(result.retries for result in results),
+            "elapsed_seconds": round((self.finished or time.perf_counter()) - self.started, 3),
+            "failures": [{"email": result.email, "error": result.error, "added_events": result.added_events}
+                         for result in sorted(failures)]
+        }
+
+
+class FanoutSync:
+    """Syncs one generated timetable into many users' calendars.
+
+        fanout = FanoutSync(ServiceAccountProvider("key.json"), concurrency=32)
+        report = fanout.run(generator, special_events, load_roster("roster.csv"))
+    """
+
+    def __init__(self, provider: CredentialProvider, concurrency: int = 16, calls_per_second: float = 5.0,
+                 global_calls_per_second: Optional[float] = None, dedicated: bool = True, replace: bool = False,
+                 max_retries: int = 5, backoff: float = 1.0, global_limiter: Optional[RateLimiter] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        """global_limiter and executor, when given, are shared with other fan-outs and
+        take the place of global_calls_per_second and concurrency."""
+        self.provider = provider
+        self.concurrency = concurrency
+        self.calls_per_second = calls_per_second
+        self.global_limiter = global_limiter or (RateLimiter(global_calls_per_second)
+                                                 if global_calls_per_second else None)
+        self.executor = executor
+        self.dedicated = dedicated
+        self.replace = replace
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def sync_user(self, generator: TimetableGenerator, special_events: Dict[str, str], email: str) -> UserResult:
+        started = time.perf_counter()
+        limiters = [RateLimiter(self.calls_per_second)] + ([self.global_limiter] if self.global_limiter else [])
+        service = None
+        try:
+            service = ThrottledService(self.provider.service_for(email), limiters, self.max_retries, self.backoff)
+            calendar_id = "primary"
+            if self.dedicated:
+                calendar_id = get_timetable_calendar(service, recreate=self.replace)
+            added_events = generator.add_to_google_calendar(service, special_events, calendar_id=calendar_id)
+        except Exception as e:
+            logger.warning("Fan-out sync for %s failed: %s", email, e)
+            return UserResult(email, getattr(e, "added_events", 0), str(e) or type(e).__name__,
+                              time.perf_counter() - started, service.retries if service else 0)
+        return UserResult(email, added_events, None, time.perf_counter() - started, service.retries)
+
+    def run(self, generator: TimetableGenerator, special_events: Dict[str, str], roster: List[str],
+            progress: Optional[Callable[[FanoutReport, UserResult], None]] = None) -> FanoutReport:
+        report = FanoutReport(len(roster))
+        if self.executor is not None:
+            self._collect(self.executor, generator, special_events, roster, report, progress)
+        else:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fanout") as executor:
+                self._collect(executor, generator, special_events, roster, report, progress)
+        report.finished = time.perf_counter()
+        return report
+
+    def _collect(self, executor: ThreadPoolExecutor, generator: TimetableGenerator, special_events: Dict[str, str],
+                 roster: List[str], report: FanoutReport,
+                 progress: Optional[Callable[[FanoutReport, UserResult], None]]):
+        futures = [executor.submit(self.sync_user, generator, special_events, email) for email in roster]
+        for future in as_completed(futures):
+            result = future.result()
+            report.record(result)
+            if progress:
+                progress(report, result)
@@ -0,0 +1,13 @@
+import hashlib
+import json
+
+
+def fingerprint(*parts) -> str:
+    """Stable short hash of JSON-compatible values (sets and dates are normalised)."""
+    def normalise(value):
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        return str(value)
+
+    payload = json.dumps(parts, sort_keys=True, default=normalise, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
@@ -0,0 +1,361 @@
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Union
+
+import pytz
+
+from .errors import GoogleSyncError
+from .fingerprint import fingerprint
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+PROVISIONAL_NOTE = "Provisional: day order inferred, not yet in the published calendar"
+
+ICS_HEADER = (
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "PRODID:-//MCC//Timetable Generator//EN",
+    "CALSCALE:GREGORIAN",
+    "METHOD:PUBLISH",
+    "BEGIN:VTIMEZONE",
+    "TZID:Asia/Kolkata",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0530",
+    "TZOFFSETTO:+0530",
+    "TZNAME:IST",
+    "END:STANDARD",
+    "END:VTIMEZONE"
+)
+
+
+def escape_text(value: str) -> str:
+    """Escapes a TEXT property value (RFC 5545 3.3.11) so newlines and commas stay in one property."""
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+class ClassSession(NamedTuple):
+    date: str
+    class_name: str
+    start_time: str
+    end_time: str
+    subject: str
+    special_event: Optional[str]
+    # The day order was inferred past the published calendar
+    provisional: bool = False
+
+
+class DayOff(NamedTuple):
+    date: str
+    name: str
+
+
+def compact_sessions(schedule: Iterator[Union[ClassSession, DayOff]]) -> Iterator[Union[ClassSession, DayOff]]:
+    """Merges back-to-back classes of the same subject on one date into a single session.
+
+    Rooms are mapped per subject, so the same subject is also the same room. Only
+    periods whose times touch are merged, so a class never spans the Break or a free
+    hour; the merged session is named after its first and last period.
+    """
+    pending = None
+    first_name = ""
+    for entry in schedule:
+        if (pending is not None and isinstance(entry, ClassSession) and entry.date == pending.date
+                and entry.subject == pending.subject and entry.start_time == pending.end_time):
+            pending = pending._replace(class_name=f"{first_name} to {entry.class_name}", end_time=entry.end_time)
+            continue
+        if pending is not None:
+            yield pending
+            pending = None
+        if isinstance(entry, ClassSession):
+            pending, first_name = entry, entry.class_name
+        else:
+            yield entry
+    if pending is not None:
+        yield pending
+
+
+class TimetableGenerator:
+    def __init__(self, start_date=None, end_date=None, compact: bool = False, name: Optional[str] = None):
+        self.timezone = pytz.timezone("Asia/Kolkata")
+        self.class_timings = [
+            ("1st Hour", "13:45", "14:35"),
+            ("2nd Hour", "14:35", "15:25"),
+            ("3rd Hour", "15:25", "16:15"),
+            ("Break", "16:15", "16:35"),
+            ("4th Hour", "16:35", "17:25"),
+            ("5th Hour", "17:25", "18:15")
+        ]
+        self.timetable = {}
+        self.classroom_mapping = {}
+        self.day_orders = {}
+        self.provisional: Set[str] = set()
+        self.start_date = start_date
+        self.end_date = end_date
+        # Merge consecutive periods of the same subject into one event
+        self.compact = compact
+        # Section or timetable name, keeping its event ids apart from other timetables'
+        self.name = name
+        self._namespace = None
+
+    def set_timetable(self, timetable_data: Dict[str, List[str]]):
+        self.timetable = timetable_data
+        self._namespace = None
+
+    @property
+    def namespace(self) -> str:
+        """Part of every class event's UID and Google event id, so exports of several
+        timetables (a teacher's sections, electives) can share one calendar.
+
+        The name when one is given, else a hash of the timetable; without a name,
+        editing the timetable gives its events new ids.
+        """
+        if self.name:
+            return re.sub(r"[^a-z0-9]+", "-", self.name.lower()).strip("-") or "timetable"
+        if self._namespace is None:
+            self._namespace = fingerprint(self.timetable)[:8]
+        return self._namespace
+
+    def set_classroom_mapping(self, mapping: Dict[str, str]):
+        self.classroom_mapping = mapping
+
+    def set_day_orders(self, day_orders: Dict[str, str], provisional: Optional[Set[str]] = None):
+        """provisional: dates whose day order was inferred (see rotation.project); their classes are tentative."""
+        self.provisional = set(provisional or ())
+        with span("filter_day_orders"):
+            if self.start_date and self.end_date:
+                self.day_orders = {
+                    date: order for date, order in day_orders.items()
+                    if self.start_date <= datetime.strptime(date, "%Y-%m-%d").date() <= self.end_date
+                }
+            else:
+                self.day_orders = day_orders
+
+    def generate_event_string(self, subject: str, start_time: str, end_time: str, 
+                            date_str: str, class_name: str, special_event: str = None,
+                            provisional: bool = False) -> str:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        start_dt = datetime.strptime(f"{date_str} {start_time}", "%Y-%m-%d %H:%M")
+        end_dt = datetime.strptime(f"{date_str} {end_time}", "%Y-%m-%d %H:%M")
+        
+        now = datetime.now(pytz.UTC)
+        
+        start_str = start_dt.strftime("%Y%m%dT%H%M%S")
+        end_str = end_dt.strftime("%Y%m%dT%H%M%S")
+        stamp_str = now.strftime("%Y%m%dT%H%M%SZ")
+        
+        location = self.classroom_mapping.get(subject, "")
+        description = f"{class_name} - {subject}"
+        if location:
+            description += f"\nRoom: {location}"
+        if special_event:
+            description += f"\nNote: {special_event}"
+        if provisional:
+            description += f"\n{PROVISIONAL_NOTE}"
+            
+        event_str = f"""BEGIN:VEVENT
+DTSTAMP:{stamp_str}
+DTSTART;TZID=Asia/Kolkata:{start_str}
+DTEND;TZID=Asia/Kolkata:{end_str}
+UID:class-{self.namespace}-{start_str}@college
+DESCRIPTION:{escape_text(description)}
+LOCATION:{escape_text(location)}
+SEQUENCE:0
+STATUS:{"TENTATIVE" if provisional else "CONFIRMED"}
+SUMMARY:{escape_text(subject)}
+TRANSP:OPAQUE
+BEGIN:VALARM
+ACTION:DISPLAY
+DESCRIPTION:Reminder for {escape_text(subject)}
+TRIGGER:-PT10M
+END:VALARM
+END:VEVENT\n"""
+        return event_str
+
+    def generate_holiday_event(self, date_str: str, holiday_name: str = "No Classes") -> str:
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+        next_day = date_obj + timedelta(days=1)
+        
+        now = datetime.now(pytz.UTC)
+        stamp_str = now.strftime("%Y%m%dT%H%M%SZ")
+        
+        date_str_formatted = date_obj.strftime("%Y%m%d")
+        next_day_formatted = next_day.strftime("%Y%m%d")
+        
+        return f"""BEGIN:VEVENT
+DTSTAMP:{stamp_str}
+DTSTART;VALUE=DATE:{date_str_formatted}
+DTEND;VALUE=DATE:{next_day_formatted}
+UID:holiday-{date_str_formatted}@college
+DESCRIPTION:{escape_text(holiday_name)}
+SEQUENCE:0
+STATUS:CONFIRMED
+SUMMARY:{escape_text(holiday_name)}
+TRANSP:TRANSPARENT
+END:VEVENT\n"""
+
+    def iter_schedule(self, special_events: Dict[str, str]) -> Iterator[Union[ClassSession, DayOff]]:
+        """Expands the day orders into classes, in date and period order.
+
+        Dates whose day order has no timetable entry yield a DayOff named after
+        the special event on that date, or "No Classes". With compact set,
+        consecutive periods of the same subject come out as one session.
+        """
+        schedule = self._expand_schedule(special_events)
+        return compact_sessions(schedule) if self.compact else schedule
+
+    def _expand_schedule(self, special_events: Dict[str, str]) -> Iterator[Union[ClassSession, DayOff]]:
+        for date_str, day_order in sorted(self.day_orders.items()):
+            if day_order in self.timetable:
+                subjects = self.timetable[day_order]
+                subject_index = 0
+                
+                special_event = special_events.get(date_str)
+                provisional = date_str in self.provisional
+                
+                for class_name, start_time, end_time in self.class_timings:
+                    if class_name != "Break" and subject_index < len(subjects):
+                        # An empty subject is a free hour
+                        if subjects[subject_index]:
+                            yield ClassSession(
+                                date_str,
+                                class_name,
+                                start_time,
+                                end_time,
+                                subjects[subject_index],
+                                special_event,
+                                provisional
+                            )
+                        subject_index += 1
+            else:
+                yield DayOff(date_str, special_events.get(date_str, "No Classes"))
+
+    def generate_events(self, special_events: Dict[str, str]) -> List[str]:
+        """The VEVENT blocks of the timetable, in date and period order, without the calendar wrapper."""
+        with span("expand_events"):
+            schedule = list(self.iter_schedule(special_events))
+        
+        with span("serialize_ics"):
+            events = []
+            for entry in schedule:
+                if isinstance(entry, ClassSession):
+                    events.append(self.generate_event_string(
+                        entry.subject,
+                        entry.start_time,
+                        entry.end_time,
+                        entry.date,
+                        entry.class_name,
+                        entry.special_event,
+                        entry.provisional
+                    ))
+                else:
+                    events.append(self.generate_holiday_event(entry.date, entry.name))
+            return events
+
+    def generate_timetable_ics(self, special_events: Dict[str, str]) -> str:
+        return "\n".join(list(ICS_HEADER) + self.generate_events(special_events) + ["END:VCALENDAR"])
+    
+    def generate_timetable_rows(self, special_events: Dict[str, str]) -> List[Dict[str, str]]:
+        """The timetable as one row per class (or per day without classes), for tabular output."""
+        rows = []
+        for entry in self.iter_schedule(special_events):
+            day_order = self.day_orders[entry.date]
+            if isinstance(entry, ClassSession):
+                rows.append({
+                    "date": entry.date,
+                    "day_order": day_order,
+                    "hour": entry.class_name,
+                    "start": entry.start_time,
+                    "end": entry.end_time,
+                    "subject": entry.subject,
+                    "room": self.classroom_mapping.get(entry.subject, ""),
+                    "note": "; ".join(note for note in (
+                        entry.special_event, PROVISIONAL_NOTE if entry.provisional else None) if note)
+                })
+            else:
+                rows.append({
+                    "date": entry.date,
+                    "day_order": day_order,
+                    "hour": "",
+                    "start": "",
+                    "end": "",
+                    "subject": entry.name,
+                    "room": "",
+                    "note": ""
+                })
+        return rows
+
+    def event_id(self, entry: ClassSession) -> str:
+        """Google Calendar id of a class slot of this timetable, the same on every sync.
+
+        Hex digits are valid in Google's base32hex event ids.
+        """
+        return hashlib.sha1(f"class-{self.namespace}-{entry.date}T{entry.start_time}".encode()).hexdigest()
+
+    @staticmethod
+    def _upsert_event(service, calendar_id: str, event: Dict):
+        try:
+            with span("google_api", call="events.insert"):
+                service.events().insert(calendarId=calendar_id, body=event).execute()
+        except Exception as e:
+            # 409: the slot's id exists, possibly as a deleted event, which updating restores
+            if getattr(getattr(e, "resp", None), "status", None) != 409:
+                raise
+            with span("google_api", call="events.update"):
+                service.events().update(calendarId=calendar_id, eventId=event['id'], body=event).execute()
+
+    def add_to_google_calendar(self, service, special_events: Dict[str, str], calendar_id: str = 'primary') -> int:
+        """Writes one event per class into the given calendar and returns how many were written.
+
+        Events have a fixed id per class slot: a slot that already exists (from an
+        earlier or interrupted sync) is updated, so syncing again never duplicates.
+        """
+        added_events = 0
+        
+        for entry in self.iter_schedule(special_events):
+            if not isinstance(entry, ClassSession):
+                continue
+            
+            start_dt = datetime.strptime(f"{entry.date} {entry.start_time}", "%Y-%m-%d %H:%M")
+            end_dt = datetime.strptime(f"{entry.date} {entry.end_time}", "%Y-%m-%d %H:%M")
+            
+            description = f"{entry.class_name}\n{entry.special_event if entry.special_event else ''}"
+            if entry.provisional:
+                description += f"\n{PROVISIONAL_NOTE}"
+            event = {
+                'id': self.event_id(entry),
+                'summary': entry.subject,
+                'description': description,
+                'status': 'tentative' if entry.provisional else 'confirmed',
+                'start': {
+                    'dateTime': start_dt.isoformat(),
+                    'timeZone': 'Asia/Kolkata',
+                },
+                'end': {
+                    'dateTime': end_dt.isoformat(),
+                    'timeZone': 'Asia/Kolkata',
+                },
+                'reminders': {
+                    'useDefault': False,
+                    'overrides': [
+                        {'method': 'popup', 'minutes': 10},
+                    ],
+                },
+            }
+            
+            try:
+                self._upsert_event(service, calendar_id, event)
+            except Exception as e:
+                logger.exception("Failed to insert event on %s", entry.date)
+                raise GoogleSyncError(
+                    f"Failed to add {entry.subject} on {entry.date}: {str(e)}",
+                    added_events=added_events
+                ) from e
+            added_events += 1
+        
+        logger.info("Added %d events to calendar %s", added_events, calendar_id)
+        return added_events
@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .errors import GoogleSyncError
+from .lazy import lazy_import
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+SCOPES = [
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile",
+    "https://www.googleapis.com/auth/calendar"  # Needed to create/delete the dedicated calendar
+]
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+TIMETABLE_CALENDAR_NAME = "MCC Timetable"
+
+
+def build_calendar_service(token: Dict, client_id: str, client_secret: str, scopes: List[str] = SCOPES):
+    """Returns a Google Calendar API service for a stored token.
+
+    The token dict holds access_token, refresh_token and expiry (ISO format). When the
+    access token has expired it is refreshed and the dict is updated in place.
+    """
+    Credentials = lazy_import("google.oauth2.credentials").Credentials
+    expiry = token.get("expiry")
+    creds = Credentials(
+        token=token["access_token"],
+        refresh_token=token.get("refresh_token"),
+        token_uri=TOKEN_URI,
+        client_id=client_id,
+        client_secret=client_secret,
+        scopes=scopes,
+        expiry=datetime.fromisoformat(expiry) if expiry else None
+    )
+
+    if creds.expired and creds.refresh_token:
+        logger.info("Refreshing expired Google access token")
+        with span("google_api", call="token.refresh"):
+            creds.refresh(lazy_import("google.auth.transport.requests").Request())
+        token["access_token"] = creds.token
+        token["expiry"] = creds.expiry.isoformat() if creds.expiry else None
+
+    build = lazy_import("googleapiclient.discovery").build
+    return build('calendar', 'v3', credentials=creds, cache_discovery=False)
+
+
+def find_timetable_calendar(service) -> Optional[str]:
+    """Returns the id of the user's dedicated timetable calendar, or None if it doesn't exist."""
+    page_token = None
+    while True:
+        with span("google_api", call="calendarList.list"):
+            calendar_list = service.calendarList().list(
+                minAccessRole="owner",
+                pageToken=page_token
+            ).execute()
+        for entry in calendar_list.get("items", []):
+            if entry.get("summary") == TIMETABLE_CALENDAR_NAME:
+                return entry["id"]
+        page_token = calendar_list.get("nextPageToken")
+        if not page_token:
+            return None
+
+
+def get_timetable_calendar(service, recreate: bool = False, calendar_id: Optional[str] = None) -> str:
+    """Creates or reuses the dedicated "MCC Timetable" secondary calendar.
+
+    With recreate=True the existing calendar is deleted and created again, which
+    drops every previously imported event in two calls instead of one delete per event.
+    A calendar_id remembered from an earlier call skips the calendar list lookup.
+    """
+    calendar_id = calendar_id or find_timetable_calendar(service)
+
+    if calendar_id and recreate:
+        try:
+            with span("google_api", call="calendars.delete"):
+                service.calendars().delete(calendarId=calendar_id).execute()
+            logger.info("Deleted timetable calendar %s", calendar_id)
+        except Exception as e:
+            # Already removed by the user from the Google Calendar UI
+            if getattr(getattr(e, "resp", None), "status", None) not in (404, 410):
+                raise GoogleSyncError(f"Failed to delete the {TIMETABLE_CALENDAR_NAME} calendar: {str(e)}") from e
+        calendar_id = None
+
+    if not calendar_id:
+        try:
+            with span("google_api", call="calendars.insert"):
+                created = service.calendars().insert(body={
+                    "summary": TIMETABLE_CALENDAR_NAME,
+                    "description": "Class timetable generated by the MCC Timetable Generator",
+                    "timeZone": "Asia/Kolkata"
+                }).execute()
+        except Exception as e:
+            raise GoogleSyncError(f"Failed to create the {TIMETABLE_CALENDAR_NAME} calendar: {str(e)}") from e
+        calendar_id = created["id"]
+        logger.info("Created timetable calendar %s", calendar_id)
+
+    return calendar_id
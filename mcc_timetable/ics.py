@@ -0,0 +1,257 @@
+"""Streaming ICS reader and reconciliation of a previously exported timetable.
+
+iter_events() reads an iCalendar stream line by line: folded lines are unfolded,
+each VEVENT is collected on its own (nested VALARMs are skipped) and yielded as an
+IcsEvent, so memory is bounded by the largest event, not the file. Date-times are
+resolved through their TZID (or UTC "Z", or Asia/Kolkata when floating).
+
+reconcile() compares an old export with a new one. Events are matched by their
+start, which identifies a period in the generated timetable even when the UIDs
+differ (exports before deterministic UIDs used random ones). Only a small index of
+the old file is kept in memory while the new file is streamed.
+"""
+
+import hashlib
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import pytz
+
+from .generator import ICS_HEADER
+
+DEFAULT_TZID = "Asia/Kolkata"
+TEXT_PROPERTIES = ("SUMMARY", "LOCATION", "DESCRIPTION")
+# VEVENT and VALARM properties (RFC 5545 3.8); other lines in an event are not properties
+PROPERTY_NAMES = frozenset((
+    "ACTION", "ATTACH", "ATTENDEE", "CATEGORIES", "CLASS", "COMMENT", "CONTACT", "CREATED", "DESCRIPTION",
+    "DTEND", "DTSTAMP", "DTSTART", "DURATION", "EXDATE", "EXRULE", "GEO", "LAST-MODIFIED", "LOCATION",
+    "ORGANIZER", "PRIORITY", "RDATE", "RECURRENCE-ID", "RELATED-TO", "REPEAT", "REQUEST-STATUS",
+    "RESOURCES", "RRULE", "SEQUENCE", "STATUS", "SUMMARY", "TRANSP", "TRIGGER", "UID", "URL",
+))
+
+
+class IcsEvent(NamedTuple):
+    uid: str
+    start: Union[datetime, date]
+    end: Optional[Union[datetime, date]]
+    summary: str
+    location: str
+    description: str
+    sequence: int
+    lines: Tuple[str, ...]
+
+    @property
+    def all_day(self) -> bool:
+        return not isinstance(self.start, datetime)
+
+    @property
+    def key(self) -> str:
+        """The slot an event fills: its start in UTC, or its date for all-day events."""
+        return format_key(self.start)
+
+    @property
+    def digest(self) -> str:
+        """Hash of what a user sees; DTSTAMP, UID and SEQUENCE are ignored."""
+        content = "\x1f".join((format_key(self.end) if self.end else "", self.summary, self.location,
+                               self.description))
+        return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def format_key(value: Union[datetime, date]) -> str:
+    if isinstance(value, datetime):
+        return value.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%d")
+
+
+def unescape_text(value: str) -> str:
+    """Undoes escape_text (RFC 5545 3.3.11)."""
+    out = []
+    chars = iter(value)
+    for char in chars:
+        if char == "\\":
+            char = next(chars, "")
+            out.append("\n" if char in "nN" else char)
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def unfold(stream: Iterable[str]) -> Iterator[str]:
+    """Content lines with folding undone: a line starting with a space or tab continues the previous one."""
+    pending = None
+    for raw in stream:
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def parse_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Splits "NAME;PARAM=value:content" into name, params and value; colons in quoted params are kept."""
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return "", {}, line
+
+    name, *raw_params = head.split(";")
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition("=")
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+def parse_datetime(params: Dict[str, str], value: str, default_tzid: str = DEFAULT_TZID) -> Union[datetime, date]:
+    value = value.strip()
+    if params.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d").date()
+    if value.endswith("Z"):
+        return pytz.UTC.localize(datetime.strptime(value[:-1], "%Y%m%dT%H%M%S"))
+    try:
+        tz = pytz.timezone(params.get("TZID", default_tzid))
+    except pytz.UnknownTimeZoneError:
+        tz = pytz.timezone(default_tzid)
+    return tz.localize(datetime.strptime(value, "%Y%m%dT%H%M%S"))
+
+
+def is_property(name: str) -> bool:
+    return name in PROPERTY_NAMES or name.startswith("X-")
+
+
+def iter_events(stream: Iterable[str], default_tzid: str = DEFAULT_TZID) -> Iterator[IcsEvent]:
+    """Yields the VEVENTs of an ICS text stream (a file or any iterable of lines).
+
+    Exports made before text was escaped have raw newlines in DESCRIPTION, so a
+    line that is not a property continues the text property before it:
+
+    >>> legacy = ["BEGIN:VEVENT", "DTSTART;TZID=Asia/Kolkata:20250602T090000",
+    ...           "DESCRIPTION:1st Hour - CLOUD", "Room: 101", "Note: Sports Day", "LOCATION:101",
+    ...           "END:VEVENT"]
+    >>> next(iter_events(legacy)).description
+    '1st Hour - CLOUD\\nRoom: 101\\nNote: Sports Day'
+    """
+    fields: Optional[Dict] = None
+    lines: List[str] = []
+    nested = 0
+    continued: Optional[str] = None
+    for line in unfold(stream):
+        if fields is None:
+            if line.upper() == "BEGIN:VEVENT":
+                fields, lines, nested, continued = {}, [line], 0, None
+            continue
+
+        lines.append(line)
+        upper = line.upper()
+        if upper.startswith("BEGIN:"):
+            nested += 1
+        elif upper.startswith("END:") and nested:
+            nested -= 1
+        elif upper == "END:VEVENT":
+            if "DTSTART" in fields:
+                yield IcsEvent(
+                    fields.get("UID", ""),
+                    fields["DTSTART"],
+                    fields.get("DTEND"),
+                    fields.get("SUMMARY", ""),
+                    fields.get("LOCATION", ""),
+                    fields.get("DESCRIPTION", ""),
+                    int(fields.get("SEQUENCE") or 0),
+                    tuple(lines)
+                )
+            fields = None
+        elif not nested:
+            name, params, value = parse_property(line)
+            if not is_property(name):
+                if continued:
+                    fields[continued] += "\n" + unescape_text(line)
+                continue
+            continued = name if name in TEXT_PROPERTIES else None
+            if name in ("DTSTART", "DTEND"):
+                fields[name] = parse_datetime(params, value, default_tzid)
+            elif name in TEXT_PROPERTIES:
+                fields[name] = unescape_text(value)
+            elif name in ("UID", "SEQUENCE"):
+                fields[name] = value.strip()
+
+
+class IndexedEvent(NamedTuple):
+    uid: str
+    sequence: int
+    digest: str
+    summary: str
+
+
+class Reconciliation(NamedTuple):
+    new: List[IcsEvent]
+    changed: List[Tuple[IndexedEvent, IcsEvent]]
+    stale: List[Tuple[str, IndexedEvent]]
+    unchanged: int
+
+    def summary(self) -> Dict:
+        return {
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "stale": len(self.stale),
+            "unchanged": self.unchanged,
+            "new_events": [{"start": event.key, "summary": event.summary} for event in self.new],
+            "changed_events": [{"start": event.key, "old_summary": old.summary, "summary": event.summary}
+                               for old, event in self.changed],
+            "stale_events": [{"start": key, "uid": old.uid, "summary": old.summary} for key, old in self.stale]
+        }
+
+
+def reconcile(old: Iterable[str], new: Iterable[str]) -> Reconciliation:
+    """Compares two exports: events only in new, in both with different content, and only in old."""
+    index: Dict[str, IndexedEvent] = {}
+    for event in iter_events(old):
+        index[event.key] = IndexedEvent(event.uid, event.sequence, event.digest, event.summary)
+
+    added, changed = [], []
+    unchanged = 0
+    for event in iter_events(new):
+        previous = index.pop(event.key, None)
+        if previous is None:
+            added.append(event)
+        elif previous.digest != event.digest:
+            changed.append((previous, event))
+        else:
+            unchanged += 1
+    return Reconciliation(added, changed, sorted(index.items()), unchanged)
+
+
+def _with_identity(event: IcsEvent, uid: str, sequence: int) -> List[str]:
+    lines = []
+    for line in event.lines:
+        name = parse_property(line)[0]
+        if name == "UID":
+            line = f"UID:{uid}"
+        elif name == "SEQUENCE":
+            line = f"SEQUENCE:{sequence}"
+        lines.append(line)
+    return lines
+
+
+def render_changes(reconciliation: Reconciliation) -> str:
+    """An ICS with only the new and changed events, for importing on top of the old export.
+
+    Changed events keep the UID they were imported with and get a higher SEQUENCE,
+    so calendar apps update them in place instead of adding duplicates.
+    """
+    ics_content = list(ICS_HEADER)
+    for event in reconciliation.new:
+        ics_content.extend(event.lines)
+    for old, event in reconciliation.changed:
+        ics_content.extend(_with_identity(event, old.uid or event.uid, max(old.sequence, event.sequence) + 1))
+    ics_content.append("END:VCALENDAR")
+    return "\n".join(ics_content) + "\n"
+
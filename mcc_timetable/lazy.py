@@ -0,0 +1,19 @@
+import importlib
+import sys
+import time
+from typing import Dict
+
+# Seconds spent importing each lazily loaded module, for the lifetime of the process
+import_timings: Dict[str, float] = {}
+
+
+def lazy_import(module_name: str):
+    """Imports a heavy dependency on first use and records how long it took."""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_timings[module_name] = time.perf_counter() - started
+    return module
@@ -0,0 +1,148 @@
+"""Campus-wide room occupancy built from many section timetables.
+
+Every section follows the same day order calendar and class timings, so a room's
+week is fully described by which (day order, hour) slots are taken. The index keeps
+those as integer bitsets:
+
+    by_slot[(day_order, slot)]   bit per room: which rooms are taken in that slot
+    room_masks[room][day_order]  bit per teaching hour: when that room is taken
+
+Per-date questions go through the calendar (date -> day order), and semester-wide
+utilization multiplies each day order's hour mask into a bitset over all (date, hour)
+positions, so lookups cost the same with ten sections or ten thousand.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from .generator import TimetableGenerator
+
+SLOTS: Tuple[str, ...] = tuple(name for name, _, _ in TimetableGenerator().class_timings if name != "Break")
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+class Booking(NamedTuple):
+    section: str
+    subject: str
+
+
+class Conflict(NamedTuple):
+    room: str
+    day_order: str
+    slot: str
+    bookings: Tuple[Booking, ...]
+    dates: Tuple[str, ...]
+
+
+class RoomOccupancy:
+    """Occupancy index over a set of section timetables and one calendar.
+
+        index = RoomOccupancy(day_orders)
+        index.add_section("II BCA A", timetable, rooms)
+        index.conflicts(); index.free_rooms("2025-07-14", "2nd Hour")
+    """
+
+    def __init__(self, day_orders: Dict[str, str]):
+        self.dates = sorted(day_orders)
+        self.day_orders = dict(day_orders)
+        self.rooms: List[str] = []
+        self.room_index: Dict[str, int] = {}
+        self.by_slot: Dict[Tuple[str, int], int] = {}
+        self.room_masks: Dict[str, Dict[str, int]] = {}
+        self.clashes: Set[Tuple[str, str, int]] = set()
+        self.bookings: Dict[Tuple[str, str, int], List[Booking]] = {}
+        # Bit date_index * len(SLOTS) set for every date with the day order
+        self.date_spread: Dict[str, int] = {}
+        self.dates_by_order: Dict[str, List[str]] = {}
+        for position, date_str in enumerate(self.dates):
+            day_order = self.day_orders[date_str]
+            self.date_spread[day_order] = self.date_spread.get(day_order, 0) | (1 << (position * len(SLOTS)))
+            self.dates_by_order.setdefault(day_order, []).append(date_str)
+
+    def _room_bit(self, room: str) -> int:
+        if room not in self.room_index:
+            self.room_index[room] = len(self.rooms)
+            self.rooms.append(room)
+            self.room_masks[room] = {}
+        return 1 << self.room_index[room]
+
+    def add_section(self, section: str, timetable: Dict[str, List[str]], rooms: Dict[str, str]):
+        """Books the rooms of one section's timetable; subjects without a room are skipped."""
+        for day_order, subjects in timetable.items():
+            day_order = str(day_order)
+            for slot, subject in enumerate(subjects[:len(SLOTS)]):
+                room = (rooms.get(subject) or "").strip()
+                if not room:
+                    continue
+                room_bit = self._room_bit(room)
+                key = (room, day_order, slot)
+                self.bookings.setdefault(key, []).append(Booking(section, subject))
+
+                hour_bit = 1 << slot
+                masks = self.room_masks[room]
+                if masks.get(day_order, 0) & hour_bit:
+                    self.clashes.add(key)
+                masks[day_order] = masks.get(day_order, 0) | hour_bit
+                self.by_slot[(day_order, slot)] = self.by_slot.get((day_order, slot), 0) | room_bit
+
+    def add_sections(self, sections: Dict[str, Dict]):
+        """Adds {section: {"timetable": {...}, "rooms": {...}}} entries."""
+        for section, entry in sections.items():
+            self.add_section(section, entry.get("timetable", {}), entry.get("rooms", {}))
+
+    def conflicts(self) -> List[Conflict]:
+        """Rooms booked by more than one section in the same day order and hour."""
+        return [
+            Conflict(room, day_order, SLOTS[slot], tuple(self.bookings[(room, day_order, slot)]),
+                     tuple(self.dates_by_order.get(day_order, ())))
+            for room, day_order, slot in sorted(self.clashes)
+        ]
+
+    def _rooms_in(self, bits: int) -> List[str]:
+        return sorted(room for room, i in self.room_index.items() if bits >> i & 1)
+
+    def occupied_rooms(self, date_str: str, slot: str) -> List[str]:
+        day_order = self.day_orders.get(date_str)
+        if day_order is None:
+            return []
+        return self._rooms_in(self.by_slot.get((day_order, SLOTS.index(slot)), 0))
+
+    def free_rooms(self, date_str: str, slot: str, rooms: Optional[Iterable[str]] = None) -> List[str]:
+        """Known rooms (or the given ones) with no class on that date and hour."""
+        day_order = self.day_orders.get(date_str)
+        taken = self.by_slot.get((day_order, SLOTS.index(slot)), 0) if day_order is not None else 0
+        if rooms is None:
+            return self._rooms_in(~taken & ((1 << len(self.rooms)) - 1))
+        return sorted(room for room in rooms
+                      if room not in self.room_index or not taken >> self.room_index[room] & 1)
+
+    def _date_range_bits(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        """Mask over the (date, hour) positions between start and end, and how many dates it covers."""
+        first, last = 0, len(self.dates)
+        if start:
+            first = next((i for i, d in enumerate(self.dates) if d >= start.isoformat()), len(self.dates))
+        if end:
+            last = next((i for i, d in enumerate(self.dates) if d > end.isoformat()), len(self.dates))
+        if last <= first:
+            return 0, 0
+        width = len(SLOTS)
+        return ((1 << ((last - first) * width)) - 1) << (first * width), last - first
+
+    def room_bits(self, room: str) -> int:
+        """Bitset over every (date, hour) of the calendar in which the room is taken."""
+        bits = 0
+        for day_order, hour_mask in self.room_masks.get(room, {}).items():
+            # Hour masks are narrower than one date's stride, so the product never carries
+            bits |= self.date_spread.get(day_order, 0) * hour_mask
+        return bits
+
+    def utilization(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, float]:
+        """Share of teaching hours each room is booked, over the calendar or a date range."""
+        window, days = self._date_range_bits(start, end)
+        if not days:
+            return {room: 0.0 for room in sorted(self.rooms)}
+        capacity = days * len(SLOTS)
+        return {room: round(popcount(self.room_bits(room) & window) / capacity, 4) for room in sorted(self.rooms)}
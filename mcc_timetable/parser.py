@@ -0,0 +1,230 @@
+import calendar
+import io
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Set, Tuple
+
+from .errors import CalendarParseError
+from .extraction import ExtractionBackend, backend_order, seekable
+from .tracing import span
+from .uploads import mapped
+
+logger = logging.getLogger(__name__)
+
+DATE_ROW = re.compile(r'^\s*(\d{1,2})\s+(MON|TUE|WED|THU|FRI|SAT|SUN)\b')
+
+
+class MCCCalendarParser:
+    def __init__(self, start_date=None, end_date=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.day_orders = {}
+        self.holidays = set()
+        self.special_events = {}
+        self.date_rows = 0
+        self.warnings = []
+        self.months = {month.upper(): index for index, month in enumerate(calendar.month_name) if month}
+        self.special_event_patterns = [
+            r"Staff Study Circle",
+            r"ICA Test",
+            r"ESE Practicals",
+            r"Faculty Development",
+            r"Senatus Meeting",
+            r"IQAC Review Meeting",
+            r"College Scripture Examination",
+            r"Deep Woods",
+            r"Annual Staff Retreat",
+            r"Hall Day"
+        ]
+
+    def is_date_in_range(self, date_str: str) -> bool:
+        if not (self.start_date and self.end_date):
+            return True
+        date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+        return self.start_date <= date_obj <= self.end_date
+
+    def extract_month_year(self, text: str) -> Tuple[str, str]:
+        month_pattern = r'(JANUARY|FEBRUARY|MARCH|APRIL|MAY|JUNE|JULY|AUGUST|SEPTEMBER|OCTOBER|NOVEMBER|DECEMBER)'
+        year_pattern = r'(20\d{2})'
+        
+        month_match = re.search(month_pattern, text.upper())
+        year_match = re.search(year_pattern, text)
+        
+        if month_match and year_match:
+            return month_match.group(1), year_match.group(1)
+        return None, None
+
+    def extract_date_info(self, line: str) -> Tuple[str, str, str, str]:
+        pattern = r'^\s*(\d{1,2})\s+(MON|TUE|WED|THU|FRI|SAT|SUN)(?:[^0-9]*([1-6])?)?(.*)$'
+        match = re.match(pattern, line)
+        
+        if match:
+            date, day, day_order, remaining_text = match.groups()
+            special_event = self.extract_special_event(remaining_text)
+            return date.strip(), day.strip(), day_order, special_event
+        return None, None, None, None
+
+    def extract_special_event(self, text: str) -> str:
+        if not text:
+            return None
+            
+        text = text.strip()
+        
+        holiday_patterns = [
+            r'Holiday',
+            r'- No Classes',
+            r'Pongal',
+            r'Christmas',
+            r'Diwali',
+            r'Bakrid'
+        ]
+        
+        for pattern in holiday_patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return f"Holiday: {text}"
+                
+        for pattern in self.special_event_patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return text.strip()
+                
+        return None
+
+    def count_date_rows(self, text: str) -> int:
+        """How many lines of a page look like calendar date rows (for backend calibration)."""
+        return sum(1 for line in text.split('\n') if DATE_ROW.match(line))
+
+    def reset(self):
+        self.day_orders = {}
+        self.holidays = set()
+        self.special_events = {}
+        self.date_rows = 0
+
+    def classify_page(self, text: str, current_month: str, current_year: str) -> Tuple[str, str]:
+        """Records the dates on one page of text; returns the month and year in effect after it."""
+        lines = text.split('\n')
+        
+        for line in lines:
+            month, year = self.extract_month_year(line)
+            if month and year:
+                current_month = month
+                current_year = year
+                continue
+        
+            if current_month and current_year:
+                date_num, day, day_order, special_event = self.extract_date_info(line)
+            
+                if date_num:
+                    self.date_rows += 1
+                    try:
+                        date_obj = datetime(
+                            int(current_year),
+                            self.months[current_month.upper()],
+                            int(date_num)
+                        )
+                        date_str = date_obj.strftime("%Y-%m-%d")
+                    
+                        # Only process dates within the selected range
+                        if self.is_date_in_range(date_str):
+                            if day_order:
+                                self.day_orders[date_str] = day_order
+                            elif day in ['SAT', 'SUN']:
+                                self.holidays.add(date_str)
+                        
+                            if special_event:
+                                self.special_events[date_str] = special_event
+                            
+                    except ValueError as e:
+                        logger.warning("Error processing date: %s - %s", line, e)
+                        self.warnings.append(f"Error processing date: {line} - {str(e)}")
+        return current_month, current_year
+
+    def extract_with(self, backend: ExtractionBackend, source):
+        current_month = None
+        current_year = None
+        pages = backend.page_texts(source)
+        while True:
+            with span("extract_text", backend=backend.name):
+                text = next(pages, None)
+            if text is None:
+                break
+            with span("classify_lines"):
+                current_month, current_year = self.classify_page(text, current_month, current_year)
+
+    def parse_pdf(self, pdf_content) -> Tuple[Dict[str, str], Set[str], Dict[str, str]]:
+        """Parses with the fastest calibrated backend, falling back to the next one
+        when a backend fails or finds no date rows."""
+        source = seekable(pdf_content)
+        backends = backend_order(source, self.count_date_rows)
+        if not backends:
+            raise CalendarParseError("No PDF text extraction backend is installed")
+
+        errors = []
+        extracted = False
+        for backend in backends:
+            self.reset()
+            source.seek(0)
+            try:
+                self.extract_with(backend, source)
+            except Exception as e:
+                logger.warning("PDF backend %s failed: %s", backend.name, e)
+                errors.append(f"{backend.name}: {e}")
+                continue
+            extracted = True
+            # Rows outside the selected date range still show the backend read the calendar
+            if self.date_rows:
+                if errors:
+                    self.warnings.append(f"Used the {backend.name} text extractor after: {'; '.join(errors)}")
+                break
+            logger.warning("PDF backend %s found no date rows", backend.name)
+            errors.append(f"{backend.name}: no date rows found")
+
+        if not extracted:
+            logger.error("Error reading PDF: %s", "; ".join(errors))
+            raise CalendarParseError(f"Error reading PDF: {'; '.join(errors)}")
+
+        logger.info("Parsed %d day orders, %d holidays and %d special events",
+                    len(self.day_orders), len(self.holidays), len(self.special_events))
+
+        return self.day_orders, self.holidays, self.special_events
+
+
+def parse_calendar_bytes(pdf_bytes: bytes, start_date=None, end_date=None) -> Dict:
+    """Parses a calendar PDF held in memory into its JSON form (see parsed_to_dict).
+
+    A top-level function so it can be shipped to worker processes. Per-line
+    problems are returned under "warnings".
+    """
+    parser = MCCCalendarParser(start_date=start_date, end_date=end_date)
+    day_orders, holidays, special_events = parser.parse_pdf(io.BytesIO(pdf_bytes))
+    result = parsed_to_dict(day_orders, holidays, special_events)
+    result["warnings"] = parser.warnings
+    return result
+
+
+def parse_calendar_file(path: str, start_date=None, end_date=None) -> Dict:
+    """Like parse_calendar_bytes(), reading a stored upload through a memory map instead of a copy."""
+    parser = MCCCalendarParser(start_date=start_date, end_date=end_date)
+    with mapped(path) as view:
+        day_orders, holidays, special_events = parser.parse_pdf(view)
+    result = parsed_to_dict(day_orders, holidays, special_events)
+    result["warnings"] = parser.warnings
+    return result
+
+
+def parsed_to_dict(day_orders: Dict[str, str], holidays: Set[str], special_events: Dict[str, str]) -> Dict:
+    """JSON-serializable form of a parse result."""
+    return {
+        "day_orders": dict(sorted(day_orders.items())),
+        "holidays": sorted(holidays),
+        "special_events": dict(sorted(special_events.items()))
+    }
+
+
+def parsed_from_dict(data: Dict) -> Tuple[Dict[str, str], Set[str], Dict[str, str]]:
+    """Inverse of parsed_to_dict()."""
+    return (
+        {date: str(order) for date, order in data.get("day_orders", {}).items()},
+        set(data.get("holidays", [])),
+        dict(data.get("special_events", {}))
+    )
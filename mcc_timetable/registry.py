@@ -0,0 +1,111 @@
+"""Registry of pre-parsed official calendars, looked up by the SHA-256 of the PDF.
+
+Almost every user uploads the same official calendar, so its parse is shipped with
+the package: one gzip-compressed JSON file per calendar in mcc_timetable/data/calendars
+(plus any directories listed in MCC_CALENDAR_REGISTRY, separated by os.pathsep).
+The registry is loaded once per process. An upload whose hash is registered is
+answered from it without opening the PDF, and users can pick a registered calendar
+without uploading at all. Add entries with `python -m mcc_timetable registry add`.
+"""
+
+import gzip
+import json
+import logging
+import os
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from .parser import parsed_from_dict, parsed_to_dict
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "calendars")
+SUFFIX = ".json.gz"
+
+
+class RegistryEntry(NamedTuple):
+    sha256: str
+    name: str
+    day_orders: Dict[str, str]
+    holidays: Set[str]
+    special_events: Dict[str, str]
+
+    @property
+    def first_date(self) -> str:
+        return min(self.day_orders, default="")
+
+    @property
+    def last_date(self) -> str:
+        return max(self.day_orders, default="")
+
+    def calendar(self, start_date=None, end_date=None) -> Dict:
+        """The parsed calendar limited to a date range, as the parser would have returned it."""
+        if not (start_date and end_date):
+            return {'day_orders': dict(self.day_orders), 'holidays': set(self.holidays),
+                    'special_events': dict(self.special_events)}
+        first, last = start_date.isoformat(), end_date.isoformat()
+        return {
+            'day_orders': {d: order for d, order in self.day_orders.items() if first <= d <= last},
+            'holidays': {d for d in self.holidays if first <= d <= last},
+            'special_events': {d: event for d, event in self.special_events.items() if first <= d <= last}
+        }
+
+
+class CalendarRegistry:
+    def __init__(self, entries: Optional[List[RegistryEntry]] = None):
+        self.entries: Dict[str, RegistryEntry] = {entry.sha256: entry for entry in entries or []}
+
+    @classmethod
+    def load(cls, *directories: str) -> "CalendarRegistry":
+        entries = []
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(SUFFIX):
+                    continue
+                try:
+                    entries.append(read_entry(os.path.join(directory, name)))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Skipping calendar registry file %s: %s", name, e)
+        logger.info("Loaded %d registered calendars", len(entries))
+        return cls(entries)
+
+    @classmethod
+    def from_env(cls) -> "CalendarRegistry":
+        extra = [path for path in os.getenv("MCC_CALENDAR_REGISTRY", "").split(os.pathsep) if path]
+        return cls.load(DATA_DIR, *extra)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, sha256: str) -> Optional[RegistryEntry]:
+        return self.entries.get(sha256)
+
+    def current(self, today: Optional[date] = None) -> List[RegistryEntry]:
+        """Entries still running today first (newest first), then past ones."""
+        today_str = (today or date.today()).isoformat()
+        return sorted(self.entries.values(), key=lambda entry: (entry.last_date >= today_str, entry.first_date),
+                      reverse=True)
+
+
+def read_entry(path: str) -> RegistryEntry:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    day_orders, holidays, special_events = parsed_from_dict(data["calendar"])
+    return RegistryEntry(data["sha256"], data["name"], day_orders, holidays, special_events)
+
+
+def write_entry(directory: str, name: str, sha256: str, day_orders: Dict[str, str], holidays: Set[str],
+                special_events: Dict[str, str]) -> str:
+    """Writes a registry file; gzip with a fixed mtime so the same calendar gives the same bytes."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, sha256[:16] + SUFFIX)
+    payload = json.dumps({
+        "name": name,
+        "sha256": sha256,
+        "calendar": parsed_to_dict(day_orders, holidays, special_events)
+    }, separators=(",", ":"))
+    with open(path, "wb") as f:
+        f.write(gzip.compress(payload.encode(), compresslevel=9, mtime=0))
+    return path
@@ -0,0 +1,100 @@
+"""Provisional day orders for dates the calendar PDF does not cover.
+
+Day orders rotate 1, 2, ..., N over working days, so the rotation can be learned
+from the parsed dates: N is the largest day order, the working weekdays are those
+that regularly carry one, and consistency is the share of consecutive parsed days
+that follow the rotation. project() continues it past the first or last parsed
+date with numpy's business-day arrays, skipping weekends, the parsed holidays and
+FIXED_HOLIDAYS, and returns the inferred dates separately so they can be marked
+provisional until the next calendar is published. A calendar whose day orders
+follow the rotation less than MIN_CONSISTENCY of the time is not projected, and
+dates before the calendar (often pre-semester weeks) are only filled on request.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from .lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# National holidays on fixed dates (MM-DD), closed every year
+FIXED_HOLIDAYS = ("01-01", "01-26", "05-01", "08-15", "10-02", "12-25")
+# A weekday counts as working if it carries at least this share of the busiest weekday's day orders
+WORKING_WEEKDAY_SHARE = 0.25
+# Share of consecutive parsed days that must follow the rotation for it to be projected
+MIN_CONSISTENCY = 0.9
+
+
+class Rotation(NamedTuple):
+    cycle: int
+    weekmask: str
+    consistency: float
+
+
+def infer_rotation(day_orders: Dict[str, str]) -> Optional[Rotation]:
+    """The rotation behind the parsed day orders, or None if there are too few to tell."""
+    dated = sorted((d, int(order)) for d, order in day_orders.items() if str(order).isdigit())
+    if len(dated) < 2:
+        return None
+    cycle = max(order for _, order in dated)
+    follows = sum(1 for (_, a), (_, b) in zip(dated, dated[1:]) if b == a % cycle + 1)
+
+    counts = [0] * 7
+    for d, _ in dated:
+        counts[datetime.strptime(d, "%Y-%m-%d").weekday()] += 1
+    weekmask = " ".join(day for day, count in zip(WEEKDAYS, counts)
+                        if count and count >= WORKING_WEEKDAY_SHARE * max(counts))
+    return Rotation(cycle, weekmask, follows / (len(dated) - 1))
+
+
+def _fixed_holidays(first: date, last: date) -> Set[str]:
+    return {f"{year}-{month_day}" for year in range(first.year, last.year + 1) for month_day in FIXED_HOLIDAYS}
+
+
+def project(day_orders: Dict[str, str], start: Optional[date], end: Optional[date], holidays: Iterable[str] = (),
+            rotation: Optional[Rotation] = None, backward: bool = False,
+            min_consistency: float = MIN_CONSISTENCY) -> Tuple[Dict[str, str], Set[str]]:
+    """Day orders extended to cover start..end, and the set of dates that were inferred.
+
+    Only dates after the last parsed date, and with backward=True before the first,
+    are filled in; gaps inside the published calendar are real holidays and stay
+    empty. A missing start or end means not projecting in that direction. Nothing is
+    inferred when the rotation's consistency is below min_consistency.
+    """
+    rotation = rotation or infer_rotation(day_orders)
+    numbered = {d: int(order) for d, order in day_orders.items() if str(order).isdigit()}
+    if rotation is None or not numbered or not rotation.weekmask:
+        return dict(day_orders), set()
+    if rotation.consistency < min_consistency:
+        logger.warning("Day orders follow a %d-day rotation on only %.0f%% of days; not inferring any",
+                       rotation.cycle, rotation.consistency * 100)
+        return dict(day_orders), set()
+    np = lazy_import("numpy")
+
+    first, last = min(numbered), max(numbered)
+    if not backward:
+        start = None
+    start = start or datetime.strptime(first, "%Y-%m-%d").date()
+    end = end or datetime.strptime(last, "%Y-%m-%d").date()
+    closed = sorted(set(holidays) | _fixed_holidays(start, end))
+    calendar = np.busdaycalendar(weekmask=rotation.weekmask, holidays=np.array(closed, dtype="datetime64[D]"))
+    projected = dict(day_orders)
+    inferred: Set[str] = set()
+
+    # Forward from the day after the last parsed date
+    after = np.arange(np.datetime64(last) + 1, np.datetime64(end) + 1, dtype="datetime64[D]")
+    after = after[np.is_busday(after, busdaycal=calendar)]
+    orders = (numbered[last] + np.arange(len(after))) % rotation.cycle + 1
+    # Backward from the day before the first parsed date, nearest first
+    before = np.arange(np.datetime64(first) - 1, np.datetime64(start) - 1, -1, dtype="datetime64[D]")
+    before = before[np.is_busday(before, busdaycal=calendar)]
+    orders_before = (numbered[first] - 2 - np.arange(len(before))) % rotation.cycle + 1
+
+    for dates, values in ((after, orders), (before, orders_before)):
+        for date_str, order in zip(dates.astype(str).tolist(), values.tolist()):
+            projected[date_str] = str(order)
+            inferred.add(date_str)
+    return projected, inferred
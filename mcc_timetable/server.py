@@ -0,0 +1,598 @@
+"""Local JSON HTTP API for parsing calendars and generating timetables.
+
+Endpoints:
+    POST /parse              calendar PDF (raw body or multipart field "file") -> parsed calendar JSON
+    GET  /calendars          registered official calendars (hash, name, first and last date)
+    GET  /calendars/<sha256> a registered calendar's parse, optionally limited by ?start=&end=
+    POST /generate           {"calendar", "timetable", "rooms", "start", "end", "format", "store", "compact",
+                             "shard_by", "shard", "infer", "infer_backward", "name"}; "name" (a section,
+                             say) keeps event ids apart from other timetables'; "infer" fills dates past
+                             the calendar with provisional day orders ("infer_backward" also those before
+                             it) unless its day orders follow no regular rotation; with "shard" ("2026-07", "term-2026-06" or "current")
+                             only that month or term is rendered
+                             -> ICS or rows; with "store": true, a reference to a stored artifact
+    GET  /artifacts/<id>     stored download, with Content-Length, gzip and Range support
+    POST /sync-jobs          generate request plus {"token", "dedicated", "replace"} -> job id
+    POST /fanout-jobs        generate request plus {"roster", "dedicated", "replace"} -> job id; syncs
+                             every roster email through the configured credential provider, at most
+                             MCC_FANOUT_CONCURRENCY users and MCC_FANOUT_GLOBAL_RATE calls per second
+                             across all jobs; running it again updates events instead of duplicating them
+    GET  /sync-jobs/<id>     sync or fan-out job status (fan-out jobs report per-user progress); finished
+                             jobs can be polled for MCC_JOB_TTL seconds (default 3600)
+    GET  /metrics            per-endpoint request counts and latency (JSON)
+    GET  /metrics/prometheus request and stage histograms in Prometheus text format
+    GET  /health             liveness and pool utilisation
+
+Parse and generate run in a bounded process pool. When every worker is busy and the
+queue is full the request is rejected with 429 instead of piling up. Uploads of a
+registered official calendar are answered from the registry without a worker. With MCC_STATE_DB
+set, parsed calendars, artifact metadata and sync job status are shared with the
+other API and app processes through the SQLite state store.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .artifacts import ArtifactStore, accepts_gzip, parse_range
+from .errors import TimetableError, UploadRejected
+from .executor import digest_upload_id
+from .fanout import FanoutSync, RateLimiter, provider_from_env
+from .generator import TimetableGenerator
+from .parser import parse_calendar_file, parsed_from_dict, parsed_to_dict
+from .registry import CalendarRegistry
+from .rotation import project
+from .sessions import compact_calendar, expand_calendar
+from .store import StateStore
+from .uploads import MULTIPART_OVERHEAD, MultipartField, UploadLimits, discard, ingest
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+# Users synced at once across every fan-out job of this server
+FANOUT_CONCURRENCY = int(os.getenv("MCC_FANOUT_CONCURRENCY", "16"))
+FANOUT_RATE = float(os.getenv("MCC_FANOUT_RATE", "5"))  # API calls per second per user
+# API calls per second across every fan-out job of this server (the project quota)
+FANOUT_GLOBAL_RATE = float(os.getenv("MCC_FANOUT_GLOBAL_RATE", "50"))
+JOB_TTL_SECONDS = float(os.getenv("MCC_JOB_TTL", "3600"))  # How long finished jobs can be polled
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolSaturated(Exception):
+    """Every worker is busy and the request queue is full."""
+
+
+class BadRequest(Exception):
+    """The request body or parameters are invalid."""
+
+
+def parse_date_param(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise BadRequest(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def build_generator(request: Dict) -> TimetableGenerator:
+    try:
+        day_orders, holidays, _ = parsed_from_dict(request["calendar"])
+        timetable = {str(order): list(subjects) for order, subjects in request["timetable"].items()}
+    except (KeyError, AttributeError, TypeError) as e:
+        raise BadRequest(f"calendar and timetable are required: {str(e)}")
+    if request.get("shard_by", "month") not in ("month", "term"):
+        raise BadRequest('shard_by must be "month" or "term"')
+
+    start_date = parse_date_param(request.get("start"))
+    end_date = parse_date_param(request.get("end"))
+    provisional = set()
+    if request.get("infer"):
+        day_orders, provisional = project(day_orders, start_date, end_date, holidays,
+                                          backward=bool(request.get("infer_backward")))
+
+    name = request.get("name")
+    if name is not None and not isinstance(name, str):
+        raise BadRequest("name must be a string")
+    generator = TimetableGenerator(start_date=start_date, end_date=end_date, compact=bool(request.get("compact")),
+                                   name=name)
+    generator.set_timetable(timetable)
+    generator.set_classroom_mapping(request.get("rooms") or {})
+    generator.set_day_orders(day_orders, provisional)
+    return generator
+
+
+def generate_timetable_job(request: Dict):
+    """Worker entry point: renders a timetable as ICS text or as a list of rows."""
+    generator = build_generator(request)
+    special_events = request["calendar"].get("special_events", {})
+    if request.get("format", "ics") == "table":
+        return generator.generate_timetable_rows(special_events)
+    if request.get("shard"):
+        from .shards import generate_shard_ics
+
+        content = generate_shard_ics(generator, special_events, request["shard"], by=request.get("shard_by", "month"))
+        if content is None:
+            raise TimetableError(f"no shard {request['shard']!r} in the selected dates")
+        return content
+    return generator.generate_timetable_ics(special_events)
+
+
+def sync_timetable_job(request: Dict) -> int:
+    from .google_calendar import build_calendar_service, get_timetable_calendar
+
+    generator = build_generator(request)
+    service = build_calendar_service(request["token"], os.getenv("GOOGLE_CLIENT_ID"), os.getenv("GOOGLE_CLIENT_SECRET"))
+    calendar_id = "primary"
+    if request.get("dedicated"):
+        calendar_id = get_timetable_calendar(service, recreate=bool(request.get("replace")))
+    return generator.add_to_google_calendar(service, request["calendar"].get("special_events", {}), calendar_id)
+
+
+class WorkerPool:
+    """A process pool that admits at most workers + queue_size jobs at a time."""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        # spawn rather than fork: the HTTP server handles requests on many threads
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def run(self, fn, *args, timeout: Optional[float] = None):
+        """Runs fn in a worker and merges the stage timings it recorded into this process."""
+        result, spans = self.submit(tracing.traced_call, fn, *args).result(timeout=timeout)
+        tracing.registry.merge(spans)
+        return result
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class EndpointMetrics:
+    """Request counts, status codes and latency histograms per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: Dict[str, Dict] = {}
+
+    def observe(self, endpoint: str, status: int, seconds: float):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "count": 0,
+                "seconds_total": 0.0,
+                "seconds_max": 0.0,
+                "statuses": {},
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+            })
+            stats["count"] += 1
+            stats["seconds_total"] += seconds
+            stats["seconds_max"] = max(stats["seconds_max"], seconds)
+            stats["statuses"][str(status)] = stats["statuses"].get(str(status), 0) + 1
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            stats["buckets"][bucket] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            result = {}
+            for endpoint, stats in self.endpoints.items():
+                result[endpoint] = {
+                    "count": stats["count"],
+                    "mean_seconds": stats["seconds_total"] / stats["count"],
+                    "max_seconds": stats["seconds_max"],
+                    "p50_seconds": self._quantile(stats["buckets"], stats["count"], 0.50),
+                    "p95_seconds": self._quantile(stats["buckets"], stats["count"], 0.95),
+                    "p99_seconds": self._quantile(stats["buckets"], stats["count"], 0.99),
+                    "statuses": dict(stats["statuses"])
+                }
+            return result
+
+    @staticmethod
+    def _quantile(buckets: List[int], count: int, q: float) -> Optional[float]:
+        """Upper bound of the histogram bucket holding the q-th quantile."""
+        target = q * count
+        seen = 0
+        for i, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else None
+        return None
+
+
+class SyncJobs:
+    """Google Calendar sync jobs, run on a small thread pool since they are network bound."""
+
+    def __init__(self, workers: int = 4, state: Optional[StateStore] = None, ttl: float = JOB_TTL_SECONDS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync")
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Dict] = {}
+        self.state = state
+        self.ttl = ttl
+        # Shared by every fan-out job, so concurrent jobs don't multiply the caps
+        self.fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_CONCURRENCY, thread_name_prefix="fanout")
+        self.fanout_limiter = RateLimiter(FANOUT_GLOBAL_RATE)
+
+    def shutdown(self):
+        """Stops both pools; queued fan-out calls are dropped rather than sent after the server closes."""
+        self.executor.shutdown(wait=False)
+        self.fanout_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _expire(self):
+        """Forgets jobs that finished more than ttl seconds ago. Call with the lock held."""
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job["status"] in ("done", "failed") and job.get("updated", job["created"]) < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, request: Dict) -> str:
+        if not isinstance(request.get("token"), dict) or "access_token" not in request["token"]:
+            raise BadRequest("token with access_token is required")
+        build_generator(request)  # Validate before queuing
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self.jobs[job_id] = {"id": job_id, "status": "queued", "added_events": None, "error": None,
+                                 "created": time.time()}
+        self._checkpoint(job_id)
+        self.executor.submit(self._run, job_id, request)
+        return job_id
+
+    def _run(self, job_id: str, request: Dict):
+        self._update(job_id, status="running")
+        try:
+            added_events = sync_timetable_job(request)
+        except Exception as e:
+            logger.exception("Sync job %s failed", job_id)
+            self._update(job_id, status="failed", error=str(e),
+                         added_events=getattr(e, "added_events", None))
+        else:
+            self._update(job_id, status="done", added_events=added_events)
+
+    def submit_fanout(self, request: Dict, provider) -> str:
+        roster = request.get("roster")
+        if not isinstance(roster, list) or not roster or not all(isinstance(email, str) and "@" in email
+                                                                 for email in roster):
+            raise BadRequest("roster must be a non-empty list of email addresses")
+        build_generator(request)
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            self.jobs[job_id] = {"id": job_id, "status": "queued", "users": len(roster), "completed": 0,
+                                 "failed": 0, "added_events": None, "error": None, "created": time.time()}
+        self._checkpoint(job_id)
+        self.executor.submit(self._run_fanout, job_id, request, provider)
+        return job_id
+
+    def _run_fanout(self, job_id: str, request: Dict, provider):
+        self._update(job_id, status="running")
+        fanout = FanoutSync(provider, calls_per_second=FANOUT_RATE, dedicated=request.get("dedicated", True),
+                            replace=bool(request.get("replace")), global_limiter=self.fanout_limiter,
+                            executor=self.fanout_executor)
+        try:
+            report = fanout.run(build_generator(request), request["calendar"].get("special_events", {}),
+                                list(dict.fromkeys(email.strip().lower() for email in request["roster"])),
+                                progress=lambda report, result: self._update(job_id, **report.summary()))
+        except Exception as e:
+            logger.exception("Fan-out job %s failed", job_id)
+            self._update(job_id, status="failed", error=str(e))
+        else:
+            self._update(job_id, status="done", **report.summary())
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self.jobs[job_id].update(fields, updated=time.time())
+        self._checkpoint(job_id)
+
+    def _checkpoint(self, job_id: str):
+        """Saves the job status so any process behind the load balancer can answer for it."""
+        if self.state is not None:
+            self.state.save_job(job_id, self.get(job_id))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._expire()
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self.state.get_job(job_id) if self.state is not None else None
+
+
+class TimetableRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MCCTimetable/1.0"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_HEAD(self):
+        self.dispatch("HEAD")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method: str):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        endpoint, handler = self.route(method, url.path)
+        headers = []
+        try:
+            if handler is None:
+                status, body, content_type = HTTPStatus.NOT_FOUND, {"error": "not found"}, None
+            else:
+                status, body, content_type, *headers = handler(url)
+        except PoolSaturated:
+            status, body, content_type = HTTPStatus.TOO_MANY_REQUESTS, {"error": "server busy, retry later"}, None
+        except BadRequest as e:
+            status, body, content_type = HTTPStatus.BAD_REQUEST, {"error": str(e)}, None
+        except UploadRejected as e:
+            status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE if e.too_large else HTTPStatus.BAD_REQUEST
+            body, content_type = {"error": str(e)}, None
+        except TimetableError as e:
+            status, body, content_type = HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e)}, None
+        except Exception as e:
+            logger.exception("Unhandled error on %s %s", method, url.path)
+            status, body, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}, None
+
+        self.respond(status, body, content_type, headers[0] if headers else None, send_body=method != "HEAD")
+        elapsed = time.perf_counter() - started
+        self.server.metrics.observe(endpoint, int(status), elapsed)
+        tracing.observe("http_request_duration_seconds", elapsed, endpoint=endpoint, status=int(status))
+
+    def route(self, method: str, path: str):
+        if method == "GET" and path == "/health":
+            return "health", self.handle_health
+        if method == "GET" and path == "/metrics":
+            return "metrics", self.handle_metrics
+        if method == "GET" and path == "/metrics/prometheus":
+            return "metrics_prometheus", self.handle_metrics_prometheus
+        if method == "POST" and path == "/parse":
+            return "parse", self.handle_parse
+        if method == "GET" and path == "/calendars":
+            return "calendars", self.handle_calendars
+        if method == "GET" and path.startswith("/calendars/"):
+            return "calendar", self.handle_calendar
+        if method == "POST" and path == "/generate":
+            return "generate", self.handle_generate
+        if method == "POST" and path == "/sync-jobs":
+            return "sync_submit", self.handle_sync_submit
+        if method in ("GET", "HEAD") and path.startswith("/artifacts/"):
+            return "artifact", self.handle_artifact
+        if method == "POST" and path == "/fanout-jobs":
+            return "fanout_submit", self.handle_fanout_submit
+        if method == "GET" and path.startswith("/sync-jobs/"):
+            return "sync_status", self.handle_sync_status
+        return "unknown", None
+
+    def content_length(self) -> int:
+        value = self.headers.get("Content-Length") or "0"
+        try:
+            length = int(value)
+        except ValueError:
+            raise BadRequest(f"invalid Content-Length: {value!r}")
+        if length < 0:
+            raise BadRequest(f"invalid Content-Length: {value!r}")
+        return length
+
+    def read_body(self) -> bytes:
+        length = self.content_length()
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(f"request body larger than {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length)
+
+    def read_json(self) -> Dict:
+        try:
+            data = json.loads(self.read_body() or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"invalid JSON: {str(e)}")
+        if not isinstance(data, dict):
+            raise BadRequest("expected a JSON object")
+        return data
+
+    def respond(self, status: int, body, content_type: Optional[str] = None, headers: Optional[Dict] = None,
+                send_body: bool = True):
+        if content_type is None:
+            payload = json.dumps(body).encode()
+            content_type = "application/json"
+        else:
+            payload = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if status == HTTPStatus.TOO_MANY_REQUESTS:
+            self.send_header("Retry-After", "1")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(payload)
+
+    def handle_health(self, url):
+        pool = self.server.pool
+        return HTTPStatus.OK, {"status": "ok", "workers": pool.workers, "in_flight": pool.in_flight,
+                               "capacity": pool.capacity}, None
+
+    def handle_metrics(self, url):
+        return HTTPStatus.OK, self.server.metrics.snapshot(), None
+
+    def handle_metrics_prometheus(self, url):
+        return HTTPStatus.OK, tracing.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8"
+
+    def handle_parse(self, url):
+        params = parse_qs(url.query)
+        start_date = parse_date_param(params.get("start", [None])[0])
+        end_date = parse_date_param(params.get("end", [None])[0])
+        content_type = self.headers.get("Content-Type", "")
+        limits = self.server.upload_limits
+        # Uploads are streamed to disk and hashed without buffering them in memory
+        if content_type.startswith("multipart/form-data"):
+            length = self.content_length()
+            if length > limits.max_bytes + MULTIPART_OVERHEAD:
+                raise UploadRejected(f"upload of {length} bytes exceeds the {limits.max_bytes} byte limit",
+                                     too_large=True)
+            upload = ingest(MultipartField(self.rfile, content_type, length, "file"), limits)
+        else:
+            upload = ingest(self.rfile, limits, expected_size=self.content_length())
+
+        try:
+            entry = self.server.registry.get(upload.digest)
+            if entry is not None:
+                return HTTPStatus.OK, dict(parsed_to_dict(**entry.calendar(start_date, end_date)), warnings=[]), None
+
+            state = self.server.state
+            parse_key = digest_upload_id(upload.digest, start_date, end_date)
+            blob = state.get_calendar(parse_key) if state is not None else None
+            if blob is not None:
+                return HTTPStatus.OK, dict(parsed_to_dict(**expand_calendar(blob)), warnings=[]), None
+
+            result = self.server.pool.run(parse_calendar_file, upload.path, start_date, end_date,
+                                          timeout=self.server.job_timeout)
+        finally:
+            discard(upload)
+        if state is not None:
+            state.put_calendar(parse_key, compact_calendar(*parsed_from_dict(result)))
+        return HTTPStatus.OK, result, None
+
+    def handle_calendars(self, url):
+        return HTTPStatus.OK, {"calendars": [
+            {"sha256": entry.sha256, "name": entry.name, "first_date": entry.first_date, "last_date": entry.last_date}
+            for entry in self.server.registry.current()
+        ]}, None
+
+    def handle_calendar(self, url):
+        entry = self.server.registry.get(url.path.rsplit("/", 1)[-1])
+        if entry is None:
+            return HTTPStatus.NOT_FOUND, {"error": "unknown calendar"}, None
+        params = parse_qs(url.query)
+        calendar = entry.calendar(parse_date_param(params.get("start", [None])[0]),
+                                  parse_date_param(params.get("end", [None])[0]))
+        return HTTPStatus.OK, dict(parsed_to_dict(**calendar), name=entry.name), None
+
+    def handle_generate(self, url):
+        request = self.read_json()
+        build_generator(request)  # Reject malformed requests before they take a worker slot
+        result = self.server.pool.run(generate_timetable_job, request, timeout=self.server.job_timeout)
+        if isinstance(result, str) and request.get("store"):
+            artifact_id = self.server.artifacts.put(result.encode(), "mcc_timetable.ics", "text/calendar; charset=utf-8")
+            artifact = self.server.artifacts.get(artifact_id)
+            return HTTPStatus.CREATED, {"artifact_id": artifact_id, "url": f"/artifacts/{artifact_id}",
+                                        "size": artifact.size, "expires": artifact.expires}, None
+        if isinstance(result, str):
+            return HTTPStatus.OK, result, "text/calendar; charset=utf-8"
+        return HTTPStatus.OK, {"rows": result}, None
+
+    def handle_artifact(self, url):
+        artifact = self.server.artifacts.get(url.path.rsplit("/", 1)[-1])
+        if artifact is None:
+            return HTTPStatus.NOT_FOUND, {"error": "unknown or expired artifact"}, None
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="{artifact.filename}"',
+            "Accept-Ranges": "bytes",
+            "ETag": f'"{artifact.artifact_id}"',
+            "Cache-Control": f"private, max-age={max(0, int(artifact.expires - time.time()))}",
+            "Vary": "Accept-Encoding"
+        }
+        range_header = self.headers.get("Range")
+        if range_header:
+            byte_range = parse_range(range_header, artifact.size)
+            if byte_range is None:
+                headers["Content-Range"] = f"bytes */{artifact.size}"
+                return HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, b"", artifact.content_type, headers
+            with open(artifact.path, "rb") as f:
+                f.seek(byte_range["start"])
+                payload = f.read(byte_range["end"] - byte_range["start"] + 1)
+            headers["Content-Range"] = f"bytes {byte_range['start']}-{byte_range['end']}/{artifact.size}"
+            return HTTPStatus.PARTIAL_CONTENT, payload, artifact.content_type, headers
+
+        # Ranges refer to the identity encoding, so gzip is only offered for full responses
+        path = artifact.path
+        if accepts_gzip(self.headers.get("Accept-Encoding")):
+            path = artifact.gzip_path
+            headers["Content-Encoding"] = "gzip"
+        with open(path, "rb") as f:
+            return HTTPStatus.OK, f.read(), artifact.content_type, headers
+
+    def handle_sync_submit(self, url):
+        job_id = self.server.sync_jobs.submit(self.read_json())
+        return HTTPStatus.ACCEPTED, {"id": job_id, "status_url": f"/sync-jobs/{job_id}"}, None
+
+    def handle_fanout_submit(self, url):
+        provider = self.server.fanout_provider
+        if provider is None:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {
+                "error": "fan-out sync needs GOOGLE_SERVICE_ACCOUNT_FILE (or MCC_FANOUT_PROVIDER=stub)"}, None
+        job_id = self.server.sync_jobs.submit_fanout(self.read_json(), provider)
+        return HTTPStatus.ACCEPTED, {"id": job_id, "status_url": f"/sync-jobs/{job_id}"}, None
+
+    def handle_sync_status(self, url):
+        job = self.server.sync_jobs.get(url.path.rsplit("/", 1)[-1])
+        if job is None:
+            return HTTPStatus.NOT_FOUND, {"error": "unknown job"}, None
+        return HTTPStatus.OK, job, None
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class TimetableServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = None, queue_size: int = 16, job_timeout: float = 120.0):
+        super().__init__(address, TimetableRequestHandler)
+        self.pool = WorkerPool(workers or os.cpu_count() or 1, queue_size)
+        self.state = StateStore.from_env()
+        self.registry = CalendarRegistry.from_env()
+        self.sync_jobs = SyncJobs(state=self.state)
+        self.fanout_provider = provider_from_env()
+        self.metrics = EndpointMetrics()
+        self.artifacts = ArtifactStore.from_env(state=self.state)
+        self.upload_limits = UploadLimits.from_env()
+        self.job_timeout = job_timeout
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+        self.sync_jobs.shutdown()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8600, workers: int = None, queue_size: int = 16):
+    server = TimetableServer((host, port), workers=workers, queue_size=queue_size)
+    print(f"Serving timetable API on http://{host}:{port} with {server.pool.workers} workers", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
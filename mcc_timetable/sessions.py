@@ -0,0 +1,179 @@
+"""Memory accounting for UI sessions and a shared store for parsed calendars.
+
+Sessions keep only the key of their parsed calendar. The calendar itself lives once
+per process in SharedCalendarStore: as a zlib-compressed JSON blob, plus an expanded
+copy while some active session is using it. Expanded copies that only idle sessions
+refer to are dropped and rebuilt from the blob on demand. With a StateStore backend
+the blobs are also written to SQLite, so calendars parsed by another process (or
+evicted from this one) are found there instead of being parsed again.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from .parser import parsed_from_dict, parsed_to_dict
+from .store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+def approx_size(obj, _seen: Optional[Set[int]] = None) -> int:
+    """Approximate deep size in bytes of plain containers, strings and numbers."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen)
+    return size
+
+
+def compact_calendar(day_orders: Dict[str, str], holidays: Set[str], special_events: Dict[str, str]) -> bytes:
+    payload = json.dumps(parsed_to_dict(day_orders, holidays, special_events), separators=(",", ":"))
+    return zlib.compress(payload.encode(), 6)
+
+
+def expand_calendar(blob: bytes) -> Dict:
+    day_orders, holidays, special_events = parsed_from_dict(json.loads(zlib.decompress(blob)))
+    return {'day_orders': day_orders, 'holidays': holidays, 'special_events': special_events}
+
+
+class SharedCalendarStore:
+    """Parsed calendars keyed by parse key, shared by every session in the process.
+
+    Compressed blobs are kept up to max_bytes (least recently used first out).
+    Expanded copies are kept for keys pinned by active sessions and up to
+    max_hot unpinned ones. Callers must treat the returned dicts as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_hot: int = 8, backend: Optional[StateStore] = None):
+        self.max_bytes = max_bytes
+        self.max_hot = max_hot
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._hot: "OrderedDict[str, Dict]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self.blob_bytes = 0
+
+    def put(self, key: str, parsed: Dict) -> Dict:
+        blob = compact_calendar(parsed['day_orders'], parsed['holidays'], parsed['special_events'])
+        with self._lock:
+            if key in self._blobs:
+                self.blob_bytes -= len(self._blobs.pop(key))
+            self._blobs[key] = blob
+            self.blob_bytes += len(blob)
+            self._hot[key] = parsed
+            self._hot.move_to_end(key)
+            self._evict()
+        if self.backend is not None:
+            self.backend.put_calendar(key, blob)
+        return parsed
+
+    def get(self, key: str) -> Optional[Dict]:
+        """The expanded calendar, rehydrated from its blob if needed; None if evicted."""
+        with self._lock:
+            parsed = self._hot.get(key)
+            if parsed is not None:
+                self._hot.move_to_end(key)
+                self._blobs.move_to_end(key)
+                return parsed
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+
+        from_backend = blob is None and self.backend is not None
+        if from_backend:
+            blob = self.backend.get_calendar(key)
+        if blob is None:
+            return None
+
+        parsed = expand_calendar(blob)
+        with self._lock:
+            if from_backend and key not in self._blobs:
+                self._blobs[key] = blob
+                self.blob_bytes += len(blob)
+            self._hot[key] = parsed
+            self._evict()
+        return parsed
+
+    def pin(self, keys: Set[str]):
+        """Marks the keys used by active sessions; other expanded copies may be dropped."""
+        with self._lock:
+            self._pinned = set(keys)
+            self._evict()
+
+    def _evict(self):
+        while self.blob_bytes > self.max_bytes and len(self._blobs) > 1:
+            key, blob = self._blobs.popitem(last=False)
+            self.blob_bytes -= len(blob)
+            self._hot.pop(key, None)
+            logger.info("Evicted parsed calendar %s from the shared store", key[:12])
+        unpinned = [key for key in self._hot if key not in self._pinned]
+        while len(unpinned) > self.max_hot:
+            del self._hot[unpinned.pop(0)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calendars": len(self._blobs),
+                "blob_bytes": self.blob_bytes,
+                "hot_calendars": len(self._hot),
+                "hot_bytes": sum(approx_size(parsed) for parsed in self._hot.values())
+            }
+
+
+class SessionRegistry:
+    """Tracks approximate memory and last activity of each UI session."""
+
+    def __init__(self, idle_seconds: float = 900.0):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self.sessions: Dict[str, Dict] = {}
+
+    def touch(self, session_id: str, state_bytes: int, parse_key: Optional[str] = None):
+        with self._lock:
+            self.sessions[session_id] = {
+                "last_seen": time.time(),
+                "bytes": state_bytes,
+                "parse_key": parse_key
+            }
+
+    def evict_idle(self, store: Optional[SharedCalendarStore] = None) -> Tuple[int, Set[str]]:
+        """Forgets idle sessions and unpins the calendars only they were using.
+
+        Returns the number of sessions evicted and the parse keys still in use.
+        """
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            idle = [session_id for session_id, entry in self.sessions.items() if entry["last_seen"] < cutoff]
+            for session_id in idle:
+                del self.sessions[session_id]
+            active_keys = {entry["parse_key"] for entry in self.sessions.values() if entry["parse_key"]}
+        if idle:
+            logger.info("Evicted %d idle sessions", len(idle))
+        if store is not None:
+            store.pin(active_keys)
+        return len(idle), active_keys
+
+    def report(self) -> Dict:
+        with self._lock:
+            sizes = [entry["bytes"] for entry in self.sessions.values()]
+        return {
+            "sessions": len(sizes),
+            "total_bytes": sum(sizes),
+            "max_bytes": max(sizes, default=0),
+            "mean_bytes": sum(sizes) // len(sizes) if sizes else 0
+        }
@@ -0,0 +1,207 @@
+"""ICS output split into month or term shards, generated in parallel when that pays.
+
+Each shard is a complete calendar with the same VCALENDAR/VTIMEZONE header, holding
+the events of its dates in date and period order; shards are ordered by key, so the
+concatenated stream is the same as the single-file export. Terms are the runs of
+teaching days between breaks of more than TERM_GAP_DAYS days, keyed by the month
+they start in.
+
+write_shards() keeps a manifest of each shard's input fingerprint, so regenerating
+after a change rewrites only the shards whose dates, timetable or rooms changed and
+subscribers to an unchanged shard see an unchanged file.
+
+Rendering costs about 45 µs per event while a spawned worker pool takes about 0.4 s
+to start, so shards are rendered in-process unless there are PARALLEL_MIN_EVENTS
+events or more (about five years of one section) or workers is given explicitly.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .fingerprint import fingerprint
+from .generator import ICS_HEADER, TimetableGenerator
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+SHARD_BY = ("month", "term")
+TERM_GAP_DAYS = 21
+MANIFEST = "manifest.json"
+# Bump when the ICS serialisation changes, so every shard is rewritten once
+FORMAT_VERSION = 3
+# Fewest events for which a process pool beats rendering in-process
+PARALLEL_MIN_EVENTS = 20000
+
+
+def partition(day_orders: Dict[str, str], by: str = "month") -> Dict[str, List[str]]:
+    """Shard key -> the sorted dates in that shard."""
+    if by not in SHARD_BY:
+        raise ValueError(f"shard by must be one of {', '.join(SHARD_BY)}, got {by!r}")
+    shards: Dict[str, List[str]] = {}
+    key = None
+    previous = None
+    for date_str in sorted(day_orders):
+        if by == "month":
+            key = date_str[:7]
+        else:
+            current = datetime.strptime(date_str, "%Y-%m-%d").date()
+            if previous is None or (current - previous).days > TERM_GAP_DAYS:
+                key = f"term-{date_str[:7]}"
+            previous = current
+        shards.setdefault(key, []).append(date_str)
+    return shards
+
+
+def current_shard(shards: Dict[str, List[str]], today: Optional[date] = None) -> Optional[str]:
+    """The shard covering today, else the next one to start, else the last one."""
+    today_str = (today or date.today()).isoformat()
+    for key in sorted(shards):
+        if shards[key][-1] >= today_str:
+            return key
+    return max(shards, default=None)
+
+
+class ShardJob(NamedTuple):
+    key: str
+    timetable: Dict[str, List[str]]
+    rooms: Dict[str, str]
+    day_orders: Dict[str, str]
+    special_events: Dict[str, str]
+    compact: bool
+    provisional: Tuple[str, ...] = ()
+    name: Optional[str] = None
+
+    @property
+    def estimated_events(self) -> int:
+        """Classes in the shard, ignoring merged periods; holidays are not counted."""
+        per_day = {order: sum(1 for subject in subjects if subject) for order, subjects in self.timetable.items()}
+        return sum(per_day.get(order, 0) for order in self.day_orders.values())
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(FORMAT_VERSION, self.timetable, self.rooms, self.day_orders, self.special_events,
+                           self.compact, self.provisional, self.name)
+
+
+def render_shard(job: ShardJob) -> Tuple[str, List[str]]:
+    """Worker entry point: the shard's events. Top level so process pools can pickle it."""
+    generator = TimetableGenerator(compact=job.compact, name=job.name)
+    generator.set_timetable(job.timetable)
+    generator.set_classroom_mapping(job.rooms)
+    generator.set_day_orders(job.day_orders, set(job.provisional))
+    return job.key, generator.generate_events(job.special_events)
+
+
+def shard_jobs(generator: TimetableGenerator, special_events: Dict[str, str], by: str = "month") -> List[ShardJob]:
+    jobs = []
+    for key, dates in sorted(partition(generator.day_orders, by).items()):
+        jobs.append(ShardJob(
+            key,
+            generator.timetable,
+            generator.classroom_mapping,
+            {d: generator.day_orders[d] for d in dates},
+            {d: special_events[d] for d in dates if d in special_events},
+            generator.compact,
+            tuple(d for d in dates if d in generator.provisional),
+            generator.name
+        ))
+    return jobs
+
+
+def render_all(jobs: List[ShardJob], workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """Events per shard; in spawned worker processes when workers is given or the shards
+    hold PARALLEL_MIN_EVENTS events or more, else in-process."""
+    if workers is None:
+        big = sum(job.estimated_events for job in jobs) >= PARALLEL_MIN_EVENTS
+        workers = (os.cpu_count() or 1) if big else 1
+    workers = min(workers, len(jobs))
+    with span("render_shards", shards=len(jobs)):
+        if workers <= 1:
+            return dict(render_shard(job) for job in jobs)
+        # spawn rather than fork: the caller may be multi-threaded
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            return dict(executor.map(render_shard, jobs))
+
+
+def wrap(events: List[str]) -> str:
+    return "\n".join(list(ICS_HEADER) + events + ["END:VCALENDAR"])
+
+
+def generate_sharded_ics(generator: TimetableGenerator, special_events: Dict[str, str], by: str = "month",
+                         workers: Optional[int] = None) -> str:
+    """One calendar with every shard's events in shard order, rendered in parallel."""
+    rendered = render_all(shard_jobs(generator, special_events, by), workers)
+    return wrap([event for key in sorted(rendered) for event in rendered[key]])
+
+
+def generate_shard_ics(generator: TimetableGenerator, special_events: Dict[str, str], shard: str,
+                       by: str = "month") -> Optional[str]:
+    """Only one shard ("current" for the one covering today), or None if there is no such shard."""
+    jobs = {job.key: job for job in shard_jobs(generator, special_events, by)}
+    if shard == "current":
+        shard = current_shard({key: sorted(job.day_orders) for key, job in jobs.items()})
+    if shard not in jobs:
+        return None
+    return wrap(render_shard(jobs[shard])[1])
+
+
+class ShardResult(NamedTuple):
+    written: List[str]
+    unchanged: List[str]
+    removed: List[str]
+
+
+def shard_filename(prefix: str, key: str) -> str:
+    return f"{prefix}-{key}.ics"
+
+
+def write_shards(generator: TimetableGenerator, special_events: Dict[str, str], directory: str, by: str = "month",
+                 workers: Optional[int] = None, prefix: str = "mcc_timetable") -> ShardResult:
+    """Writes one ICS per shard plus manifest.json, regenerating only shards whose inputs changed."""
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f).get("shards", {})
+    except (OSError, ValueError):
+        previous = {}
+
+    jobs = shard_jobs(generator, special_events, by)
+    stale, unchanged = [], []
+    for job in jobs:
+        entry = previous.get(job.key)
+        if (entry and entry.get("fingerprint") == job.fingerprint
+                and os.path.exists(os.path.join(directory, entry["file"]))):
+            unchanged.append(job.key)
+        else:
+            stale.append(job)
+
+    rendered = render_all(stale, workers) if stale else {}
+    shards = {key: previous[key] for key in unchanged}
+    for job in stale:
+        filename = shard_filename(prefix, job.key)
+        path = os.path.join(directory, filename)
+        with open(path + ".tmp", "w", encoding="utf-8", newline="") as f:
+            f.write(wrap(rendered[job.key]))
+        os.replace(path + ".tmp", path)
+        dates = sorted(job.day_orders)
+        shards[job.key] = {"file": filename, "fingerprint": job.fingerprint, "first_date": dates[0],
+                           "last_date": dates[-1], "events": len(rendered[job.key])}
+
+    removed = sorted(set(previous) - set(shards))
+    for key in removed:
+        try:
+            os.remove(os.path.join(directory, previous[key]["file"]))
+        except (OSError, KeyError):
+            pass
+
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"by": by, "shards": dict(sorted(shards.items()))}, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    logger.info("Shards: %d written, %d unchanged, %d removed", len(stale), len(unchanged), len(removed))
+    return ShardResult([job.key for job in stale], unchanged, removed)
@@ -0,0 +1,402 @@
+"""Automatic day order timetables for many sections at once.
+
+A problem describes, per section, the subjects with their weekly hours (per cycle of
+day orders), optional lab blocks of consecutive hours, and the faculty member and
+room each subject needs:
+
+    {
+      "day_orders": 6,
+      "sections": {
+        "II BCA A": {"subjects": {
+          "CLOUD": {"hours": 5, "faculty": "Dr. Rao", "room": "SFS 101"},
+          "LAB PYTHON": {"hours": 4, "block": 2, "faculty": "Ms. Iyer", "room": "Lab 2"}
+        }}
+      },
+      "faculty": {"Dr. Rao": {"unavailable": [[2], [4, "1st Hour"]]}},
+      "rooms": {"Lab 2": {"unavailable": [[6, "5th Hour"]]}}
+    }
+
+The week is a grid of day orders x teaching hours (the non-break entries of
+TimetableGenerator.class_timings); sections, faculty and rooms each hold an integer
+bitset of the grid cells they are busy in. The search is a randomized depth-first
+search with a node budget per restart, and restarts run in parallel processes until
+one finds a timetable or the time limit passes.
+"""
+
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .errors import SolverError
+from .generator import TimetableGenerator
+from .occupancy import SLOTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAY_ORDERS = 6
+
+
+def hour_groups() -> List[List[int]]:
+    """Teaching hour indexes split at breaks; lab blocks must fit inside one group."""
+    groups, current, index = [], [], 0
+    for name, _, _ in TimetableGenerator().class_timings:
+        if name == "Break":
+            groups.append(current)
+            current = []
+        else:
+            current.append(index)
+            index += 1
+    groups.append(current)
+    return [group for group in groups if group]
+
+
+class Course(NamedTuple):
+    """A subject of one section: count sessions of size consecutive hours each."""
+    section: int
+    subject: str
+    size: int
+    count: int
+    faculty: int
+    room: int
+    max_per_day: int
+
+
+class Problem(NamedTuple):
+    day_orders: int
+    sections: List[str]
+    courses: List[Course]
+    section_busy: List[int]
+    faculty_busy: List[int]
+    room_busy: List[int]
+    rooms: Dict[str, Dict[str, str]]
+    starts: Dict[int, int]
+
+
+class Solution(NamedTuple):
+    timetables: Dict[str, Dict]
+    seconds: float
+    restarts: int
+    nodes: int
+
+
+def _cell_mask(entry, day_orders: int) -> int:
+    """[day_order] blocks the whole day, [day_order, hour] a single hour."""
+    day_order = int(entry[0])
+    if not 1 <= day_order <= day_orders:
+        raise SolverError(f"day order {day_order} is outside 1..{day_orders}")
+    base = (day_order - 1) * len(SLOTS)
+    if len(entry) == 1:
+        return ((1 << len(SLOTS)) - 1) << base
+    if entry[1] not in SLOTS:
+        raise SolverError(f"unknown hour {entry[1]!r}, expected one of {', '.join(SLOTS)}")
+    return 1 << (base + SLOTS.index(entry[1]))
+
+
+def _busy_masks(names: List[str], spec: Dict[str, Dict], day_orders: int) -> List[int]:
+    masks = []
+    for name in names:
+        mask = 0
+        for entry in spec.get(name, {}).get("unavailable", []):
+            mask |= _cell_mask(entry, day_orders)
+        masks.append(mask)
+    return masks
+
+
+def compile_problem(spec: Dict) -> Problem:
+    """Validates a problem description and turns it into bitsets and units."""
+    day_orders = int(spec.get("day_orders", DEFAULT_DAY_ORDERS))
+    sections = sorted(spec.get("sections", {}))
+    if not sections:
+        raise SolverError("the problem has no sections")
+
+    faculty_names, room_names = [], []
+    courses = []
+    rooms: Dict[str, Dict[str, str]] = {}
+    for section_index, section in enumerate(sections):
+        subjects = spec["sections"][section].get("subjects", {})
+        rooms[section] = {}
+        total = 0
+        for subject, details in sorted(subjects.items()):
+            hours = int(details.get("hours", 0))
+            block = int(details.get("block", 1))
+            if hours <= 0:
+                continue
+            if block < 1 or hours % block:
+                raise SolverError(f"{section}: {subject} has {hours} hours, not a multiple of its block of {block}")
+            faculty = details.get("faculty")
+            room = details.get("room")
+            if faculty and faculty not in faculty_names:
+                faculty_names.append(faculty)
+            if room and room not in room_names:
+                room_names.append(room)
+            if room:
+                rooms[section][subject] = room
+            max_per_day = int(details.get("max_per_day", max(block, -(-hours // day_orders))))
+            courses.append(Course(section_index, subject, block, hours // block,
+                                  faculty_names.index(faculty) if faculty else -1,
+                                  room_names.index(room) if room else -1,
+                                  max_per_day))
+            total += hours
+        if total > day_orders * len(SLOTS):
+            raise SolverError(f"{section} needs {total} hours but a cycle only has {day_orders * len(SLOTS)}")
+
+    starts = {}
+    for size in {course.size for course in courses}:
+        mask = 0
+        for group in hour_groups():
+            for first in group[:len(group) - size + 1]:
+                for day in range(day_orders):
+                    mask |= 1 << (day * len(SLOTS) + first)
+        if not mask:
+            raise SolverError(f"no {size} consecutive teaching hours exist for a lab block")
+        starts[size] = mask
+
+    section_busy = [0] * len(sections)
+    faculty_busy = _busy_masks(faculty_names, spec.get("faculty", {}), day_orders)
+    room_busy = _busy_masks(room_names, spec.get("rooms", {}), day_orders)
+
+    cells = day_orders * len(SLOTS)
+    for names, busy, field in ((faculty_names, faculty_busy, "faculty"), (room_names, room_busy, "room")):
+        for index, name in enumerate(names):
+            needed = sum(c.size * c.count for c in courses if getattr(c, field) == index)
+            available = cells - bin(busy[index]).count("1")
+            if needed > available:
+                raise SolverError(f"{name} is needed for {needed} hours but is available for {available}")
+
+    return Problem(day_orders, sections, courses, section_busy, faculty_busy, room_busy, rooms, starts)
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count("1")
+
+
+def search(problem: Problem, seed: int, deadline: float, node_limit: int, stop=None):
+    """One randomized depth-first search over session placements.
+
+    Each step places a session of the course with the fewest feasible start cells
+    left (relative to the sessions it still needs), and backtracks as soon as some
+    course cannot fit its remaining sessions. Sessions of one course are placed in
+    increasing cell order so that their permutations are not searched again.
+
+    Returns (start cells per course or None, nodes, proved infeasible).
+    """
+    rng = random.Random(seed)
+    width = len(SLOTS)
+    day_mask = (1 << width) - 1
+    all_cells = (1 << (problem.day_orders * width)) - 1
+    courses = problem.courses
+    noise = [rng.random() for _ in courses]
+
+    section_busy = list(problem.section_busy)
+    faculty_busy = list(problem.faculty_busy)
+    room_busy = list(problem.room_busy)
+    day_hours = [[0] * problem.day_orders for _ in courses]
+    remaining = [course.count for course in courses]
+    placed: List[List[int]] = [[] for _ in courses]
+
+    # Courses whose start cells change when a course is placed: same section, faculty or room
+    sharing: Dict[Tuple[str, int], List[int]] = {}
+    for index, course in enumerate(courses):
+        sharing.setdefault(("section", course.section), []).append(index)
+        if course.faculty >= 0:
+            sharing.setdefault(("faculty", course.faculty), []).append(index)
+        if course.room >= 0:
+            sharing.setdefault(("room", course.room), []).append(index)
+    neighbours = [
+        sorted(set(sharing[("section", c.section)]
+                   + (sharing[("faculty", c.faculty)] if c.faculty >= 0 else [])
+                   + (sharing[("room", c.room)] if c.room >= 0 else [])))
+        for c in courses
+    ]
+    cached_starts = [0] * len(courses)
+    cached_slack = [0] * len(courses)
+    stale = set(range(len(courses)))
+
+    def apply(index: int, start: int, sign: int):
+        course = courses[index]
+        stale.update(neighbours[index])
+        cells = ((1 << course.size) - 1) << start
+        if sign > 0:
+            section_busy[course.section] |= cells
+            if course.faculty >= 0:
+                faculty_busy[course.faculty] |= cells
+            if course.room >= 0:
+                room_busy[course.room] |= cells
+            placed[index].append(start)
+        else:
+            section_busy[course.section] &= ~cells
+            if course.faculty >= 0:
+                faculty_busy[course.faculty] &= ~cells
+            if course.room >= 0:
+                room_busy[course.room] &= ~cells
+            placed[index].pop()
+        day_hours[index][start // width] += sign * course.size
+        remaining[index] -= sign
+
+    def feasible_starts(index: int) -> int:
+        course = courses[index]
+        busy = section_busy[course.section]
+        if course.faculty >= 0:
+            busy |= faculty_busy[course.faculty]
+        if course.room >= 0:
+            busy |= room_busy[course.room]
+        for day, hours in enumerate(day_hours[index]):
+            if hours + course.size > course.max_per_day:
+                busy |= day_mask << (day * width)
+        free = ~busy & all_cells
+        starts = free & problem.starts[course.size]
+        for offset in range(1, course.size):
+            starts &= free >> offset
+        if placed[index]:
+            starts &= ~((1 << (placed[index][-1] + 1)) - 1)
+        return starts
+
+    def choose():
+        """The most constrained open course and its start cells, or (None, None) on a dead end."""
+        best, best_key, best_starts = None, None, 0
+        for index in stale:
+            if remaining[index]:
+                cached_starts[index] = feasible_starts(index)
+                cached_slack[index] = popcount(cached_starts[index]) - remaining[index]
+        stale.clear()
+        for index, course in enumerate(courses):
+            if not remaining[index]:
+                continue
+            starts, slack = cached_starts[index], cached_slack[index]
+            if slack < 0:
+                return index, None
+            key = (slack, -course.size, noise[index])
+            if best_key is None or key < best_key:
+                best, best_key, best_starts = index, key, starts
+        return best, best_starts
+
+    def ordered(starts: int) -> List[int]:
+        # Mostly earliest day first (later sessions of the course must come after this one),
+        # with jitter so restarts explore different layouts; popped from the end
+        cells = [cell for cell in range(problem.day_orders * width) if starts >> cell & 1]
+        cells.sort(key=lambda cell: -(cell // width + rng.random() * 1.5))
+        return cells
+
+    stack: List[Tuple[int, List[int]]] = []
+    nodes = 0
+    while True:
+        index, starts = choose()
+        if index is None:
+            break
+        if starts is not None:
+            stack.append((index, ordered(starts)))
+        else:
+            # Dead end: undo placements until some decision has another option left
+            while stack:
+                top, options = stack[-1]
+                apply(top, placed[top][-1], -1)
+                if options:
+                    break
+                stack.pop()
+            if not stack:
+                return None, nodes, True
+        top, options = stack[-1]
+        apply(top, options.pop(), 1)
+        nodes += 1
+        if nodes % 256 == 0 and (nodes >= node_limit or time.monotonic() >= deadline
+                                 or (stop is not None and stop.is_set())):
+            return None, nodes, False
+
+    return [list(starts) for starts in placed], nodes, False
+
+
+def _restarts(problem: Problem, seeds: range, time_limit: float, stop=None):
+    """Runs restarts with growing node budgets until one succeeds, one proves infeasibility, or time runs out."""
+    deadline = time.monotonic() + time_limit
+    node_limit = 20 * sum(course.count for course in problem.courses) + 1000
+    restarts = total_nodes = 0
+    for seed in seeds:
+        if time.monotonic() >= deadline or (stop is not None and stop.is_set()):
+            break
+        starts, nodes, infeasible = search(problem, seed, deadline, node_limit, stop)
+        restarts += 1
+        total_nodes += nodes
+        if starts is not None or infeasible:
+            return starts, infeasible, restarts, total_nodes
+        node_limit = int(node_limit * 1.5)
+    return None, False, restarts, total_nodes
+
+
+_stop_event = None
+
+
+def _init_worker(stop):
+    global _stop_event
+    _stop_event = stop
+
+
+def _worker(problem: Problem, first_seed: int, step: int, time_limit: float):
+    result = _restarts(problem, range(first_seed, 1 << 30, step), time_limit, _stop_event)
+    if result[0] is not None or result[1]:
+        _stop_event.set()
+    return result
+
+
+def to_timetables(problem: Problem, starts: List[List[int]]) -> Dict[str, Dict]:
+    """Per section {"timetable": {day_order: [subject per hour]}, "rooms": {subject: room}}.
+
+    Free hours are empty strings and trailing ones are dropped. Every day order is
+    present, with an empty list when the section has no classes, so the generator
+    treats it as a day without classes rather than a holiday.
+    """
+    width = len(SLOTS)
+    grids = {section: [[""] * width for _ in range(problem.day_orders)] for section in problem.sections}
+    for course, course_starts in zip(problem.courses, starts):
+        grid = grids[problem.sections[course.section]]
+        for start in course_starts:
+            for cell in range(start, start + course.size):
+                grid[cell // width][cell % width] = course.subject
+
+    timetables = {}
+    for section, grid in grids.items():
+        timetable = {}
+        for day, hours in enumerate(grid):
+            while hours and not hours[-1]:
+                hours.pop()
+            timetable[str(day + 1)] = hours
+        timetables[section] = {"timetable": timetable, "rooms": problem.rooms[section]}
+    return timetables
+
+
+def solve(spec: Dict, time_limit: float = 10.0, workers: Optional[int] = None, seed: int = 0) -> Solution:
+    """Solves a problem description; raises SolverError if it is infeasible or times out."""
+    started = time.monotonic()
+    problem = compile_problem(spec)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    if workers == 1:
+        starts, infeasible, restarts, nodes = _restarts(problem, range(seed, 1 << 30), time_limit)
+    else:
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        starts, infeasible, restarts, nodes = None, False, 0, 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(stop,)) as executor:
+            pending = {executor.submit(_worker, problem, seed + i, workers, time_limit) for i in range(workers)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    restarts += result[2]
+                    nodes += result[3]
+                    if starts is None and (result[0] is not None or result[1]):
+                        starts, infeasible = result[0], result[1]
+                        stop.set()
+
+    seconds = time.monotonic() - started
+    logger.info("Solver ran %d restarts, %d nodes in %.2f s", restarts, nodes, seconds)
+    if infeasible:
+        raise SolverError("no timetable satisfies the constraints (search space exhausted)")
+    if starts is None:
+        raise SolverError(f"no timetable found within {time_limit:g} s; "
+                          "raise the time limit or relax availability and max_per_day")
+    return Solution(to_timetables(problem, starts), seconds, restarts, nodes)
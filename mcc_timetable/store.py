@@ -0,0 +1,175 @@
+"""Shared state in a local SQLite database, so several app and API processes can share work.
+
+Set MCC_STATE_DB to a file path (on a disk every process can reach) to enable it.
+The database runs in WAL mode: readers never block the single writer, and writes
+are short single-statement transactions. It holds:
+
+    calendars   compressed parsed calendars by parse key (content hash + date range)
+    profiles    saved timetables and room mappings by owner (Google account email)
+    artifacts   metadata of generated files; the files stay in MCC_ARTIFACT_DIR
+    sync_jobs   status checkpoints of Google Calendar sync jobs
+
+Calendars expire MCC_STATE_CALENDAR_TTL seconds after they were stored (default a
+week; an expired one is simply parsed again) and job checkpoints MCC_JOB_TTL seconds
+after their last update (default an hour). Writers sweep expired rows at most once
+per sweep_interval, so the shared file stops growing once traffic is steady.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CALENDAR_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_JOB_TTL_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calendars (
+    key TEXT PRIMARY KEY,
+    blob BLOB NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calendars_created ON calendars (created);
+CREATE TABLE IF NOT EXISTS profiles (
+    owner TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    artifact_id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_expires ON artifacts (expires);
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    job_id TEXT PRIMARY KEY,
+    job TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sync_jobs_updated ON sync_jobs (updated);
+"""
+
+
+class StateStore:
+    """One connection per thread to a WAL-mode SQLite file shared between processes."""
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, calendar_ttl: float = DEFAULT_CALENDAR_TTL_SECONDS,
+                 job_ttl: float = DEFAULT_JOB_TTL_SECONDS, sweep_interval: float = 60.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.calendar_ttl = calendar_ttl
+        self.job_ttl = job_ttl
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> Optional["StateStore"]:
+        """Store at MCC_STATE_DB, or None when the deployment runs a single process."""
+        path = os.getenv("MCC_STATE_DB")
+        if not path:
+            return None
+        return cls(
+            path,
+            calendar_ttl=float(os.getenv("MCC_STATE_CALENDAR_TTL", DEFAULT_CALENDAR_TTL_SECONDS)),
+            job_ttl=float(os.getenv("MCC_JOB_TTL", DEFAULT_JOB_TTL_SECONDS))
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: every statement below is its own short transaction
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _fetch_one(self, sql: str, *params):
+        return self._connection().execute(sql, params).fetchone()
+
+    # Parsed calendars
+
+    def put_calendar(self, key: str, blob: bytes):
+        self.evict_expired()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO calendars (key, blob, created) VALUES (?, ?, ?)",
+            (key, blob, time.time())
+        )
+
+    def get_calendar(self, key: str) -> Optional[bytes]:
+        row = self._fetch_one("SELECT blob FROM calendars WHERE key = ? AND created >= ?", key,
+                              time.time() - self.calendar_ttl)
+        return bytes(row[0]) if row else None
+
+    # Timetable profiles
+
+    def save_profile(self, owner: str, data: Dict):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO profiles (owner, data, updated) VALUES (?, ?, ?)",
+            (owner, json.dumps(data), time.time())
+        )
+
+    def load_profile(self, owner: str) -> Optional[Dict]:
+        row = self._fetch_one("SELECT data FROM profiles WHERE owner = ?", owner)
+        return json.loads(row[0]) if row else None
+
+    # Artifact metadata
+
+    def put_artifact(self, artifact_id: str, meta: Dict):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO artifacts (artifact_id, meta, expires) VALUES (?, ?, ?)",
+            (artifact_id, json.dumps(meta), meta["expires"])
+        )
+
+    def get_artifact(self, artifact_id: str) -> Optional[Dict]:
+        row = self._fetch_one("SELECT meta FROM artifacts WHERE artifact_id = ?", artifact_id)
+        return json.loads(row[0]) if row else None
+
+    def expired_artifacts(self, now: float) -> List[str]:
+        rows = self._connection().execute("SELECT artifact_id FROM artifacts WHERE expires < ?", (now,))
+        return [row[0] for row in rows]
+
+    def delete_artifact(self, artifact_id: str):
+        self._connection().execute("DELETE FROM artifacts WHERE artifact_id = ?", (artifact_id,))
+
+    # Sync job checkpoints
+
+    def save_job(self, job_id: str, job: Dict):
+        self.evict_expired()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sync_jobs (job_id, job, updated) VALUES (?, ?, ?)",
+            (job_id, json.dumps(job), time.time())
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        row = self._fetch_one("SELECT job FROM sync_jobs WHERE job_id = ? AND updated >= ?", job_id,
+                              time.time() - self.job_ttl)
+        return json.loads(row[0]) if row else None
+
+    def evict_expired(self, force: bool = False) -> int:
+        """Deletes expired calendars and job checkpoints; runs at most once per sweep_interval unless forced."""
+        now = time.time()
+        with self._sweep_lock:
+            if not force and now - self._last_sweep < self.sweep_interval:
+                return 0
+            self._last_sweep = now
+
+        conn = self._connection()
+        evicted = conn.execute("DELETE FROM calendars WHERE created < ?", (now - self.calendar_ttl,)).rowcount
+        evicted += conn.execute("DELETE FROM sync_jobs WHERE updated < ?", (now - self.job_ttl,)).rowcount
+        if evicted:
+            logger.info("Evicted %d expired calendars and job checkpoints", evicted)
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connection()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("calendars", "profiles", "artifacts", "sync_jobs")}
@@ -0,0 +1,164 @@
+"""Stage timing spans aggregated into histograms, with Prometheus text exposition.
+
+    with span("extract_text"):
+        text = page.extract_text()
+
+Durations go into the process-wide registry. Set MCC_TRACE_MEMORY=1 (or call
+enable_memory_tracking()) to also record the net memory allocated in each span
+via tracemalloc, which slows everything down noticeably. Work done in worker
+processes can be shipped back with export_and_reset() and merged into the parent.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MEMORY_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 ** 2, 8 * 1024 ** 2, 64 * 1024 ** 2, 512 * 1024 ** 2)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts: List[int], total: float, count: int):
+        for i, bucket_count in enumerate(counts):
+            self.counts[i] += bucket_count
+        self.sum += total
+        self.count += count
+
+
+class Registry:
+    """Histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, LabelSet], Histogram] = {}
+
+    def observe(self, metric: str, value: float, labels: Dict[str, str]):
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        buckets = MEMORY_BUCKETS if metric.endswith("_bytes") else DURATION_BUCKETS
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def export_and_reset(self) -> List:
+        """Plain-data snapshot of every histogram, clearing them (for shipping across processes)."""
+        with self._lock:
+            exported = [(metric, labels, h.counts, h.sum, h.count) for (metric, labels), h in self.histograms.items()]
+            self.histograms = {}
+        return exported
+
+    def merge(self, exported: List):
+        with self._lock:
+            for metric, labels, counts, total, count in exported:
+                key = (metric, tuple(tuple(label) for label in labels))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    buckets = MEMORY_BUCKETS if metric.endswith("_bytes") else DURATION_BUCKETS
+                    histogram = self.histograms[key] = Histogram(buckets)
+                histogram.merge(counts, total, count)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            items = sorted(self.histograms.items())
+            lines = []
+            described = set()
+            for (metric, labels), histogram in items:
+                name = f"mcc_{metric}"
+                if name not in described:
+                    lines.append(f"# HELP {name} {metric.replace('_', ' ')}")
+                    lines.append(f"# TYPE {name} histogram")
+                    described.add(name)
+                cumulative = 0
+                for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+registry = Registry()
+_memory_tracking = os.getenv("MCC_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
+
+
+def enable_memory_tracking():
+    global _memory_tracking
+    _memory_tracking = True
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[None]:
+    """Times a stage into mcc_stage_duration_seconds{stage=...}."""
+    track_memory = _memory_tracking
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0] if track_memory else 0
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        labels["stage"] = stage
+        registry.observe("stage_duration_seconds", elapsed, labels)
+        if track_memory:
+            allocated = max(0, tracemalloc.get_traced_memory()[0] - memory_before)
+            registry.observe("stage_memory_bytes", allocated, labels)
+
+
+def observe(metric: str, value: float, **labels):
+    registry.observe(metric, value, labels)
+
+
+def traced_call(fn, *args):
+    """Runs fn in a worker process and returns (result, exported spans) for Registry.merge()."""
+    registry.export_and_reset()
+    result = fn(*args)
+    return result, registry.export_and_reset()
+
+
+def render_prometheus() -> str:
+    return registry.render_prometheus()
+
+
+def write_prometheus(path: str):
+    """Writes the registry in Prometheus text format (e.g. for a node_exporter textfile collector)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
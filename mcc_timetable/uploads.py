@@ -0,0 +1,215 @@
+"""Bounded-memory ingestion of calendar uploads.
+
+An upload is streamed in fixed-size chunks into a temporary file while its SHA-256
+is computed, so no extra whole-file copy is ever held in memory. Before anything is
+parsed it must start like a PDF, stay under MCC_MAX_UPLOAD_MB and declare at most
+MCC_MAX_PDF_PAGES pages. Parsers then read a read-only memory map of the file,
+which the OS shares between readers and can page out, instead of a private buffer.
+
+MultipartField reads one field of a multipart/form-data body straight from the
+socket, so the API streams form uploads through ingest() the same way as raw bodies.
+"""
+
+import email.message
+import hashlib
+import logging
+import mmap
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+from .errors import UploadRejected
+from .lazy import lazy_import
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_PAGES = 60
+# Allowance for part headers, boundaries and small fields around the file in a form upload
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_PART_HEADER_BYTES = 16 * 1024
+# Page objects in an uncompressed page tree (not /Pages nodes)
+PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+class UploadLimits(NamedTuple):
+    max_bytes: int = DEFAULT_MAX_BYTES
+    max_pages: int = DEFAULT_MAX_PAGES
+
+    @classmethod
+    def from_env(cls) -> "UploadLimits":
+        return cls(
+            max_bytes=int(float(os.getenv("MCC_MAX_UPLOAD_MB", DEFAULT_MAX_BYTES / 1024 ** 2)) * 1024 ** 2),
+            max_pages=int(os.getenv("MCC_MAX_PDF_PAGES", DEFAULT_MAX_PAGES))
+        )
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    digest: str
+    size: int
+    pages: int
+
+
+@contextmanager
+def mapped(path: str) -> Iterator[mmap.mmap]:
+    """Read-only memory map of a stored upload; file-like (read/seek/tell) for PDF readers."""
+    with open(path, "rb") as f:
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        view.close()
+
+
+def count_pages(view) -> int:
+    """Page count from the page tree; falls back to PyPDF2 when it sits in compressed object streams."""
+    pages = sum(1 for _ in PAGE_OBJECT.finditer(view))
+    if pages:
+        return pages
+    view.seek(0)
+    return len(lazy_import("PyPDF2").PdfReader(view).pages)
+
+
+def discard(upload: StoredUpload):
+    try:
+        os.remove(upload.path)
+    except FileNotFoundError:
+        pass
+
+
+class MultipartField:
+    """The content of one field of a multipart/form-data body, read as it is consumed.
+
+    Reads at most length bytes from stream. Other fields are skipped without being
+    kept, and a few bytes are held back at a time in case they start the closing
+    boundary. Malformed bodies, or one without the field, raise UploadRejected.
+    """
+
+    def __init__(self, stream: BinaryIO, content_type: str, length: int, name: str):
+        message = email.message.Message()
+        message["Content-Type"] = content_type
+        boundary = message.get_param("boundary")
+        if not boundary:
+            raise UploadRejected("multipart upload has no boundary")
+        self.stream = stream
+        self.remaining = length
+        self.delimiter = b"\r\n--" + boundary.encode("latin-1")
+        # The first boundary opens the body without a preceding line break
+        self.buffer = b"\r\n"
+        self.done = False
+        self._find_field(name)
+
+    def _fill(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        chunk = self.stream.read(min(CHUNK_SIZE, self.remaining))
+        if not chunk:
+            return False
+        self.remaining -= len(chunk)
+        self.buffer += chunk
+        return True
+
+    def _skip_past_delimiter(self):
+        while True:
+            index = self.buffer.find(self.delimiter)
+            if index >= 0:
+                self.buffer = self.buffer[index + len(self.delimiter):]
+                return
+            self.buffer = self.buffer[-(len(self.delimiter) - 1):]
+            if not self._fill():
+                raise UploadRejected("multipart upload ended before its closing boundary")
+
+    def _read_line(self) -> bytes:
+        while b"\r\n" not in self.buffer:
+            if len(self.buffer) > MAX_PART_HEADER_BYTES or not self._fill():
+                raise UploadRejected("malformed multipart upload")
+        line, self.buffer = self.buffer.split(b"\r\n", 1)
+        return line
+
+    def _find_field(self, name: str):
+        while True:
+            self._skip_past_delimiter()
+            while len(self.buffer) < 2 and self._fill():
+                pass
+            if self.buffer.startswith(b"--"):
+                raise UploadRejected(f'multipart upload must contain a "{name}" field')
+            self._read_line()  # Rest of the boundary line
+            headers = email.message.Message()
+            while True:
+                line = self._read_line()
+                if not line:
+                    break
+                header, _, value = line.decode("latin-1").partition(":")
+                headers[header.strip()] = value.strip()
+            if headers.get_param("name", header="content-disposition") == name:
+                return
+
+    def read(self, size: int = -1) -> bytes:
+        """Up to size bytes of the field (fewer when more must be read first); b"" at its end."""
+        while not self.done:
+            index = self.buffer.find(self.delimiter)
+            safe = index if index >= 0 else max(0, len(self.buffer) - (len(self.delimiter) - 1))
+            if safe or index >= 0:
+                count = safe if size is None or size < 0 else min(size, safe)
+                data, self.buffer = self.buffer[:count], self.buffer[count:]
+                self.done = index >= 0 and count == safe
+                return data
+            if not self._fill():
+                raise UploadRejected("multipart upload ended before its closing boundary")
+        return b""
+
+
+def ingest(stream: BinaryIO, limits: Optional[UploadLimits] = None, expected_size: Optional[int] = None,
+           directory: Optional[str] = None) -> StoredUpload:
+    """Copies stream into a temporary file, hashing as it goes, and enforces the limits.
+
+    With expected_size (e.g. a Content-Length) exactly that many bytes are read, and
+    oversized uploads are refused before reading anything. Raises UploadRejected;
+    the caller owns the returned file and should discard() it when done.
+    """
+    limits = limits or UploadLimits.from_env()
+    if expected_size is not None and expected_size > limits.max_bytes:
+        raise UploadRejected(f"upload of {expected_size} bytes exceeds the {limits.max_bytes} byte limit",
+                             too_large=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    remaining = expected_size
+    fd, path = tempfile.mkstemp(prefix="mcc-upload-", suffix=".pdf", dir=directory)
+    upload = StoredUpload(path, "", 0, 0)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if size == 0 and b"%PDF-" not in chunk[:1024]:
+                    raise UploadRejected("upload is not a PDF file")
+                size += len(chunk)
+                if size > limits.max_bytes:
+                    raise UploadRejected(f"upload exceeds the {limits.max_bytes} byte limit", too_large=True)
+                digest.update(chunk)
+                f.write(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        if size == 0:
+            raise UploadRejected("upload is empty")
+
+        with mapped(path) as view:
+            try:
+                pages = count_pages(view)
+            except Exception as e:
+                raise UploadRejected(f"upload is not a readable PDF: {e}") from e
+        if pages > limits.max_pages:
+            raise UploadRejected(f"PDF has {pages} pages, more than the {limits.max_pages} page limit",
+                                 too_large=True)
+    except BaseException:
+        discard(upload)
+        raise
+
+    logger.debug("Stored upload %s: %d bytes, %d pages", path, size, pages)
+    return StoredUpload(path, digest.hexdigest(), size, pages)